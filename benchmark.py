@@ -0,0 +1,490 @@
+"""
+Benchmark suite for the costing engine and the Streamlit pages.
+
+Measures:
+  1. Throughput (rows/s) of every CostCalculator method, scalar and batch.
+  2. Peak memory per row of each batch method, and memory retained per scalar
+     result object (tracemalloc).
+  3. Part catalog (SQLite): full and incremental reprice, SKU / customer / alloy
+     lookups at --catalog-rows parts.
+  4. Charge-mix optimizer: one heat, and a batch of heats with random prices / stock.
+  5. Process routes: a part book spread over every route, open and closed loop.
+  6. Rate history: a year of 5-minute prices, re-costing one part and a part book per day.
+  7. Costing service: quotes/s over local HTTP with many keep-alive clients (micro-batched).
+  8. Wall time of one headless run of app.py per page (Streamlit AppTest).
+
+Each run is appended to benchmarks/history.json. With a stored baseline
+(benchmarks/baseline.json, written by --update-baseline) the run fails when any
+metric is worse than the baseline by more than --tolerance. Metrics ending in _per_s
+are throughputs (higher is better); all others are times or sizes (lower is better).
+
+Usage:
+    python benchmark.py                         # full suite, compare to baseline
+    python benchmark.py --update-baseline       # store this run as the new baseline
+    python benchmark.py --sizes 1 1000 --no-pages
+    python benchmark.py --catalog-rows 1000000   # catalog at full scale (slow to build)
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(APP_DIR)
+
+import numpy as np
+from utils.calculations import CostCalculator
+
+BENCH_DIR = os.path.join(APP_DIR, 'benchmarks')
+HISTORY_FILE = os.path.join(BENCH_DIR, 'history.json')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+DEFAULT_SIZES = [1, 1_000, 1_000_000, 10_000_000]
+# Scalar methods cost ~1-2 us per call; beyond this the rate is flat, so larger
+# sizes are not worth the wall time
+DEFAULT_SCALAR_MAX = 100_000
+DEFAULT_CATALOG_ROWS = 100_000
+
+PAGES = ["Executive Dashboard", "P1: Ingot", "P2: Sheet", "P3: Parts", "Risk Simulation", "Sensitivity", "Quick Quote", "Target Price", "Capacity Planning"]
+
+
+def _inputs(n, rng):
+    """ Per-row inputs for each method: part-specific values vary, market prices are shared """
+    return {
+        'calculate_ingot_cost': dict(
+            cu_price=1000.0, zn_price=300.0,
+            cu_pct=rng.uniform(58, 100, n), zn_pct=None,
+            burning_loss_pct=rng.uniform(0.5, 3.0, n),
+            elec_cost=8.0, labor_cost=3.0, consumable_cost=2.0, overhead_cost=2.0
+        ),
+        'calculate_sheet_cost': dict(
+            ingot_cost_per_kg=rng.uniform(700, 1100, n), yield_pct=rng.uniform(85, 99, n),
+            scrap_recovery_price=750.0, process_cost_per_kg=12.0
+        ),
+        'calculate_part_cost': dict(
+            sheet_cost_per_kg=rng.uniform(700, 1100, n), part_weight_kg=rng.uniform(0.01, 0.7, n),
+            gross_weight_kg=1.0, scrap_recovery_price=750.0, machining_cost_per_part=rng.uniform(1, 20, n)
+        ),
+        'calculate_financials': dict(
+            base_cost=rng.uniform(700, 1300, n), interest_rate_pa=12.0, holding_days=45, margin_pct=10.0
+        ),
+    }
+
+
+def _with_zn(method, kwargs):
+    if method == 'calculate_ingot_cost':
+        kwargs = dict(kwargs, zn_pct=100.0 - kwargs['cu_pct'])
+    return kwargs
+
+
+def _time(func, min_time=0.2):
+    """ Best-of wall time for func(), repeating short calls until min_time has elapsed """
+    func()  # Warm-up
+    best, spent = float('inf'), 0.0
+    while spent < min_time:
+        t = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t
+        best, spent = min(best, elapsed), spent + elapsed
+    return best
+
+
+def bench_calculator(sizes, scalar_max):
+    metrics = {}
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        for method, kwargs in _inputs(n, rng).items():
+            kwargs = _with_zn(method, kwargs)
+
+            # Batch
+            batch = getattr(CostCalculator, f'{method}_batch')
+            seconds = _time(lambda: batch(**kwargs))
+            metrics[f'calc.{method}.batch.{n}.rows_per_s'] = n / seconds
+
+            # Scalar (a Python loop over rows, as the views do today)
+            if n <= scalar_max:
+                scalar = getattr(CostCalculator, method)
+                rows = [
+                    {k: (float(v[i]) if isinstance(v, np.ndarray) else v) for k, v in kwargs.items()}
+                    for i in range(n)
+                ]
+                seconds = _time(lambda: [scalar(**row) for row in rows])
+                metrics[f'calc.{method}.scalar.{n}.rows_per_s'] = n / seconds
+            scalar_rate = metrics.get(f'calc.{method}.scalar.{n}.rows_per_s')
+            print(f"  {method:<24} n={n:<10,} batch {metrics[f'calc.{method}.batch.{n}.rows_per_s']:>14,.0f} rows/s"
+                  + (f" | scalar {scalar_rate:>12,.0f} rows/s" if scalar_rate else ""))
+    return metrics
+
+
+def bench_memory(n=1_000_000):
+    metrics = {}
+    rng = np.random.default_rng(0)
+    for method, kwargs in _inputs(n, rng).items():
+        kwargs = _with_zn(method, kwargs)
+        batch = getattr(CostCalculator, f'{method}_batch')
+        tracemalloc.start()
+        result = batch(**kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        metrics[f'mem.{method}.batch.bytes_per_row'] = peak / n
+        print(f"  {method:<24} peak {peak / n:,.0f} bytes/row")
+    return metrics
+
+
+def bench_scalar_results(n=100_000):
+    """ Memory retained per scalar result object (e.g. a list of per-part results) """
+    metrics = {}
+    rng = np.random.default_rng(0)
+    for method, kwargs in _inputs(n, rng).items():
+        kwargs = _with_zn(method, kwargs)
+        scalar = getattr(CostCalculator, method)
+        rows = [
+            {k: (float(v[i]) if isinstance(v, np.ndarray) else v) for k, v in kwargs.items()}
+            for i in range(n)
+        ]
+        tracemalloc.start()
+        results = [scalar(**row) for row in rows]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del results
+        metrics[f'mem.{method}.scalar.bytes_per_result'] = current / n
+        print(f"  {method:<24} {current / n:,.0f} bytes/result")
+    return metrics
+
+
+def bench_catalog(n):
+    """ Builds a throwaway catalog of n parts and times repricing and lookups """
+    import pandas as pd
+    from utils.catalog import PartCatalog
+    metrics = {}
+    rng = np.random.default_rng(0)
+    alloys = {'Cu': 100.0, 'Brass63': 63.0, 'Brass70': 70.0}
+    book = pd.DataFrame({
+        'sku': [f'P{i:07d}' for i in range(n)],
+        'customer': rng.choice([f'C{i:03d}' for i in range(500)], n),
+        'alloy': rng.choice(list(alloys), n),
+        'gross_weight_kg': rng.uniform(0.05, 2.0, n),
+        'machining_cost': rng.uniform(1, 20, n),
+    })
+    book['cu_pct'] = book['alloy'].map(alloys)
+    book['net_weight_kg'] = book['gross_weight_kg'] * rng.uniform(0.5, 0.9, n)
+
+    with tempfile.TemporaryDirectory() as tmp, PartCatalog(os.path.join(tmp, 'catalog.db')) as catalog:
+        t = time.perf_counter()
+        catalog.upsert(book)
+        metrics['catalog.upsert.rows_per_s'] = n / (time.perf_counter() - t)
+
+        rates = {'cu_price': 1000.0, 'zn_price': 300.0}
+        t = time.perf_counter()
+        catalog.reprice(rates)
+        metrics['catalog.reprice.full.rows_per_s'] = n / (time.perf_counter() - t)
+
+        # Zn price only moves the brass parts
+        rates['zn_price'] = 310.0
+        t = time.perf_counter()
+        repriced = catalog.reprice(rates)
+        metrics['catalog.reprice.zn_price.wall_s'] = time.perf_counter() - t
+        metrics['catalog.reprice.zn_price.fraction'] = repriced / n
+
+        skus = book['sku'].sample(1000, random_state=0).tolist()
+        metrics['catalog.get.wall_s'] = _time(lambda: [catalog.get(s) for s in skus]) / len(skus)
+        metrics['catalog.find.customer.wall_s'] = _time(lambda: catalog.find(customer='C042'))
+        metrics['catalog.find.customer_alloy.wall_s'] = _time(lambda: catalog.find(customer='C042', alloy='Cu'))
+
+    print(f"  {n:,} parts: upsert {metrics['catalog.upsert.rows_per_s']:,.0f} rows/s"
+          f" | full reprice {metrics['catalog.reprice.full.rows_per_s']:,.0f} rows/s"
+          f" | Zn-only reprice {metrics['catalog.reprice.zn_price.wall_s']:.2f} s"
+          f" ({metrics['catalog.reprice.zn_price.fraction'] * 100:.0f}% of rows)")
+    print(f"  get {metrics['catalog.get.wall_s'] * 1e6:,.0f} us | find customer {metrics['catalog.find.customer.wall_s'] * 1000:.1f} ms"
+          f" | customer + alloy {metrics['catalog.find.customer_alloy.wall_s'] * 1000:.1f} ms")
+    return metrics
+
+
+def bench_charge(heats=10_000):
+    """ One C26000 heat from the default stock, then `heats` of them with prices / stock varied """
+    import numpy as np
+    from utils.charge import charge_materials_from_session, optimize_charge_from_session
+    state = {'process_params': {'alloy_grade': 'C26000'}}
+    materials = charge_materials_from_session(state)
+    rng = np.random.default_rng(0)
+    prices = np.array([m.price for m in materials]) * rng.uniform(0.85, 1.15, (heats, len(materials)))
+    stock = np.array([m.available_kg for m in materials]) * rng.uniform(0.0, 1.5, (heats, len(materials)))
+
+    metrics = {'charge.single.wall_s': _time(lambda: optimize_charge_from_session(state, materials=materials))}
+    t = time.perf_counter()
+    optimize_charge_from_session(state, materials=materials, prices=prices, available=stock)
+    metrics['charge.batch.rows_per_s'] = heats / (time.perf_counter() - t)
+    print(f"  single heat {metrics['charge.single.wall_s'] * 1000:.1f} ms | {heats:,} heats {metrics['charge.batch.rows_per_s']:,.0f} heats/s")
+    return metrics
+
+
+def bench_routes(n=100_000):
+    """ `n` parts on random routes in one batch, scrap sold (forward pass) and remelted (linear solve) """
+    import numpy as np
+    from utils.batch import resolve_inputs, evaluate_routes
+    from utils.routes import ROUTES
+    rng = np.random.default_rng(0)
+    inputs = resolve_inputs({
+        'gross_weight_kg': rng.uniform(0.2, 5.0, n),
+        'parts_yield_pct': rng.uniform(40.0, 95.0, n),
+        'machining_cost': rng.uniform(1.0, 40.0, n),
+    })
+    route = rng.choice(list(ROUTES), n)
+    metrics = {}
+    for name, return_pct in (('open', None), ('closed', {'sheet': 100.0, 'parts': 100.0})):
+        t = time.perf_counter()
+        evaluate_routes(inputs, route=route, return_pct=return_pct)
+        metrics[f'routes.{name}.rows_per_s'] = n / (time.perf_counter() - t)
+    print(f"  {n:,} parts on {len(ROUTES)} routes: scrap sold {metrics['routes.open.rows_per_s']:,.0f} rows/s"
+          f" | closed loop {metrics['routes.closed.rows_per_s']:,.0f} rows/s")
+    return metrics
+
+
+def bench_history(parts=1000):
+    """ A year of 5-minute Cu / Zn prices; one part and a `parts` book re-costed for every day """
+    import numpy as np
+    import pandas as pd
+    from utils.history import RateHistory, recost_history
+    rng = np.random.default_rng(0)
+    n = 365 * 24 * 12
+    times = np.datetime64('2025-01-01T00:00') + np.arange(n) * np.timedelta64(5, 'm')
+    book = pd.DataFrame({'gross_weight_kg': rng.uniform(0.2, 5.0, parts), 'machining_cost': rng.uniform(1.0, 40.0, parts)})
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateHistory(tmp)
+        t = time.perf_counter()
+        store.append_many(times, {'cu_price': 1000 + np.cumsum(rng.normal(0, 1, n)), 'zn_price': 300 + np.cumsum(rng.normal(0, 0.3, n))})
+        metrics['history.append.rows_per_s'] = n / (time.perf_counter() - t)
+        metrics['history.part_year.wall_s'] = _time(lambda: recost_history(None, '2025-01-01', '2025-12-31', store=store))
+        t = time.perf_counter()
+        recost_history(book, '2025-01-01', '2025-12-31', store=store)
+        metrics['history.book_year.rows_per_s'] = parts * 365 / (time.perf_counter() - t)
+    print(f"  {n:,} records: append {metrics['history.append.rows_per_s']:,.0f} rows/s"
+          f" | one part x 365 days {metrics['history.part_year.wall_s'] * 1000:.1f} ms"
+          f" | {parts:,} parts x 365 days {metrics['history.book_year.rows_per_s']:,.0f} part-days/s")
+    return metrics
+
+
+def bench_breaks(parts=5000, breaks=20):
+    """ A `breaks`-quantity price-break sheet for a `parts` book on mixed routes """
+    import numpy as np
+    import pandas as pd
+    from utils.lots import price_breaks
+    from utils.routes import ROUTES
+    rng = np.random.default_rng(0)
+    book = pd.DataFrame({
+        'sku': [f'P{i:05d}' for i in range(parts)],
+        'gross_weight_kg': rng.uniform(0.05, 5.0, parts),
+        'machining_cost': rng.uniform(1.0, 40.0, parts),
+        'route': rng.choice(list(ROUTES), parts),
+    })
+    quantities = np.geomspace(100, 100_000, breaks).round()
+    elapsed = _time(lambda: price_breaks(book, quantities))
+    metrics = {'breaks.sheet.wall_s': elapsed, 'breaks.sheet.rows_per_s': parts * breaks / elapsed}
+    print(f"  {parts:,} parts x {breaks} breaks: {elapsed * 1000:.1f} ms ({metrics['breaks.sheet.rows_per_s']:,.0f} prices/s)")
+    return metrics
+
+
+def bench_capacity(products=5000, levels=201, mixes=50):
+    """ Cost and margin of `mixes` product mixes over `products` parts at `levels` utilization levels """
+    import numpy as np
+    import pandas as pd
+    from utils.capacity import utilization_sweep
+    from utils.routes import ROUTES
+    rng = np.random.default_rng(0)
+    book = pd.DataFrame({'gross_weight_kg': rng.uniform(0.05, 5.0, products), 'route': rng.choice(list(ROUTES), products)})
+    shares = rng.uniform(0.0, 1.0, (mixes, products))
+    expenses = {'exp_power': 400000.0, 'exp_labor': 150000.0, 'exp_cons': 100000.0, 'exp_admin': 100000.0}
+    utilization = np.linspace(20, 120, levels)
+    elapsed = _time(lambda: utilization_sweep(book, shares, utilization, expenses, 50000.0, 40000.0))
+    metrics = {'capacity.sweep.wall_s': elapsed, 'capacity.sweep.rows_per_s': products * levels / elapsed}
+    print(f"  {products:,} products x {levels} levels x {mixes} mixes: {elapsed * 1000:.1f} ms"
+          f" ({metrics['capacity.sweep.rows_per_s']:,.0f} product-levels/s)")
+    return metrics
+
+
+def bench_melt(heats=210, days=7):
+    """ A week of heats on four furnaces scheduled against the default time-of-day tariff """
+    from utils.melt import example_week, schedule_heats
+    week = example_week(heats, days)
+    elapsed = _time(lambda: schedule_heats(week, start='2025-01-06'))
+    metrics = {'melt.week.wall_s': elapsed}
+    print(f"  {heats} heats over {days} days: {elapsed * 1000:.1f} ms")
+    return metrics
+
+
+def bench_inventory(transactions=1_000_000):
+    """ A year of metal receipts and issues: ledger append, FIFO and moving-average replay, monthly report """
+    from utils.inventory import InventoryLedger, example_ledger, value_ledger
+    times, materials, kg, price = example_ledger(transactions)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = InventoryLedger(tmp)
+        t = time.perf_counter()
+        ledger.append_many(times, materials, kg, price)
+        metrics['inventory.append.rows_per_s'] = transactions / (time.perf_counter() - t)
+        _, codes, signed, prices = ledger.transactions()
+        metrics['inventory.fifo.wall_s'] = _time(lambda: value_ledger(codes, signed, prices, 'fifo'))
+        metrics['inventory.moving_average.wall_s'] = _time(lambda: value_ledger(codes, signed, prices, 'moving_average'))
+        ledger.valued('fifo')
+        metrics['inventory.report.wall_s'] = _time(lambda: ledger.book_prices('fifo', '2025-06-01', '2025-06-30T23:59'))
+    print(f"  {transactions:,} transactions: append {metrics['inventory.append.rows_per_s']:,.0f} rows/s"
+          f" | FIFO {metrics['inventory.fifo.wall_s'] * 1000:.0f} ms"
+          f" | moving average {metrics['inventory.moving_average.wall_s'] * 1000:.0f} ms"
+          f" | month book prices {metrics['inventory.report.wall_s'] * 1000:.1f} ms")
+    return metrics
+
+
+def bench_service(clients=100, requests=100):
+    """ `clients` keep-alive connections each sending `requests` single quotes to an in-process service """
+    import asyncio
+    from utils.service import CostService
+
+    async def client(port, body):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        request = f"POST /quote HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        for _ in range(requests):
+            writer.write(request)
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while (line := await reader.readline()) != b'\r\n':
+                if line.lower().startswith(b'content-length'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+        writer.close()
+
+    async def run():
+        service = CostService()
+        port = await service.start('127.0.0.1', 0)
+        bodies = [json.dumps({'gross_weight_kg': 0.1 + i / clients, 'cu_pct': 63.0}).encode() for i in range(clients)]
+        t = time.perf_counter()
+        await asyncio.gather(*(client(port, body) for body in bodies))
+        elapsed = time.perf_counter() - t
+        batches = service.batcher.batches
+        await service.close()
+        return elapsed, batches
+
+    elapsed, batches = asyncio.run(run())
+    quotes = clients * requests
+    metrics = {'service.quotes_per_s': quotes / elapsed}
+    print(f"  {clients} clients x {requests} quotes: {metrics['service.quotes_per_s']:,.0f} quotes/s"
+          f" ({quotes / batches:,.0f} quotes per batch, client in the same process)")
+    return metrics
+
+
+def bench_pages():
+    from streamlit.testing.v1 import AppTest
+    metrics = {}
+    for page in PAGES:
+        at = AppTest.from_file(os.path.join(APP_DIR, 'app.py'), default_timeout=120)
+        at.session_state['password_correct'] = True
+        at.run()
+        t = time.perf_counter()
+        if page == PAGES[0]:
+            at.run()
+        else:
+            at.sidebar.radio[0].set_value(page).run()
+        elapsed = time.perf_counter() - t
+        if at.exception:
+            raise RuntimeError(f"Page '{page}' raised: {at.exception[0].value}")
+        metrics[f'page.{page}.wall_s'] = elapsed
+        print(f"  {page:<24} {elapsed * 1000:,.1f} ms")
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    """ Metrics worse than baseline by more than `tolerance` (fraction) """
+    regressions = []
+    for key, value in metrics.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        higher_is_better = key.endswith('_per_s')      # Throughput; everything else is time or memory
+        change = (base - value) / base if higher_is_better else (value - base) / base
+        if change > tolerance:
+            regressions.append((key, base, value, change))
+    return regressions
+
+
+def _load(path, default):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Costing engine and page benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES, help="Row counts for the calculator benchmarks")
+    parser.add_argument("--scalar-max", type=int, default=DEFAULT_SCALAR_MAX, help="Largest row count timed with the scalar loop")
+    parser.add_argument("--catalog-rows", type=int, default=DEFAULT_CATALOG_ROWS, help="Parts in the catalog benchmark (0 = skip)")
+    parser.add_argument("--no-pages", action="store_true", help="Skip the headless page runs")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the baseline")
+    args = parser.parse_args(argv)
+
+    print("Calculator throughput:")
+    metrics = bench_calculator(args.sizes, args.scalar_max)
+    print("Batch memory:")
+    metrics.update(bench_memory())
+    print("Scalar result memory:")
+    metrics.update(bench_scalar_results())
+    if args.catalog_rows:
+        print("Part catalog:")
+        metrics.update(bench_catalog(args.catalog_rows))
+    print("Charge-mix optimizer:")
+    metrics.update(bench_charge())
+    print("Process routes:")
+    metrics.update(bench_routes())
+    print("Rate history:")
+    metrics.update(bench_history())
+    print("Price breaks:")
+    metrics.update(bench_breaks())
+    print("Capacity planning:")
+    metrics.update(bench_capacity())
+    print("Melt scheduling:")
+    metrics.update(bench_melt())
+    print("Inventory valuation:")
+    metrics.update(bench_inventory())
+    print("Costing service:")
+    metrics.update(bench_service())
+    if not args.no_pages:
+        print("Page runs:")
+        metrics.update(bench_pages())
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    history = _load(HISTORY_FILE, [])
+    history.append({
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'metrics': metrics,
+    })
+    with open(HISTORY_FILE, 'w') as f:
+        json.dump(history, f, indent=1)
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(metrics, f, indent=1, sort_keys=True)
+        print(f"Baseline updated ({len(metrics)} metrics).")
+        return 0
+
+    regressions = compare(metrics, _load(BASELINE_FILE, {}), args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for key, base, value, change in regressions:
+            print(f"  {key}: {base:,.4g} -> {value:,.4g} ({change * 100:.0f}% worse)")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
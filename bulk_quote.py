@@ -0,0 +1,15 @@
+"""
+Nightly / headless repricing of a part book without the Streamlit UI.
+
+Usage:
+    python bulk_quote.py parts.csv priced.csv --set cu_price=1020 --set zn_price=290
+    python bulk_quote.py parts.csv limits.csv --solve cu_price     # break-even Cu rate per target_price
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils.bulk import main
+
+if __name__ == "__main__":
+    sys.exit(main())
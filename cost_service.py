@@ -0,0 +1,18 @@
+"""
+Headless JSON costing service for the ERP / quoting portal (no Streamlit).
+
+Usage:
+    python cost_service.py                      # http://127.0.0.1:8600
+    python cost_service.py --host 0.0.0.0 --port 8600 --workers 4
+
+    curl -X POST localhost:8600/quote -d '{"gross_weight_kg": 0.4, "cu_price": 1020}'
+    curl -X POST localhost:8600/quote -d '{"quotes": [{"id": "A1", "route": "rod_turned"}, {"id": "B2", "alloy_grade": "CW614N"}]}'
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils.service import main
+
+if __name__ == "__main__":
+    sys.exit(main())
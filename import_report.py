@@ -0,0 +1,73 @@
+"""
+Cold-start import report: how long each page's modules take to import on top of
+Streamlit, and which heavy libraries they pull in.
+
+Usage:
+    python import_report.py                 # print the report
+    python import_report.py --max-ms 250    # exit 1 if any page exceeds the budget
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules imported when each page is first shown (see the navigation in app.py)
+PAGE_MODULES = {
+    "Startup (app.py)": ["utils.auth", "utils.assets", "utils.capacity"],
+    "Executive Dashboard": ["views.dashboard"],
+    "P1: Ingot": ["views.ingot"],
+    "P2: Sheet": ["views.sheet"],
+    "P3: Parts": ["views.parts"],
+    "Risk Simulation": ["views.risk"],
+    "Sensitivity": ["views.sensitivity"],
+    "Quick Quote": ["views.quote"],
+    "Target Price": ["views.reverse"],
+    "Capacity Planning": ["views.capacity"],
+}
+
+HEAVY_MODULES = ["numpy", "pandas", "altair", "pyarrow"]
+
+# Runs in a fresh interpreter so every measurement is a true cold import
+_PROBE = """
+import sys, time, json
+import streamlit
+before = set(sys.modules)
+t = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - t
+heavy = [m for m in {heavy!r} if m in sys.modules and m not in before]
+print(json.dumps({{"ms": elapsed * 1000, "heavy": heavy, "modules": len(set(sys.modules) - before)}}))
+"""
+
+
+def measure_page(modules):
+    code = _PROBE.format(modules=modules, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-page cold import time report.")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if any page's imports exceed this (ms)")
+    args = parser.parse_args(argv)
+
+    print(f"{'Page':<22}{'Import (ms)':>12}{'Modules':>10}  Heavy libraries")
+    over_budget = []
+    for page, modules in PAGE_MODULES.items():
+        result = measure_page(modules)
+        print(f"{page:<22}{result['ms']:>12.1f}{result['modules']:>10}  {', '.join(result['heavy']) or '-'}")
+        if args.max_ms is not None and result['ms'] > args.max_ms:
+            over_budget.append(page)
+
+    if over_budget:
+        print(f"\nOver the {args.max_ms:.0f} ms budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""
+Metal inventory ledger from the command line: import receipts and issues, FIFO / moving-average stock report.
+
+Usage:
+    python inventory.py import transactions.csv     # timestamp (or date), material, kg, price
+    python inventory.py report --method fifo --start 2025-01-01 --end 2025-01-31
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils.inventory import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""
+Rate history from the command line: import past rates, re-cost a part book over a date range.
+
+Usage:
+    python rate_history.py import rates.csv       # timestamp (or date) column + cu_price, zn_price, exp_power, ...
+    python rate_history.py recost parts.csv daily.csv --start 2025-01-01 --end 2025-12-31
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from utils.history import main
+
+if __name__ == "__main__":
+    sys.exit(main())
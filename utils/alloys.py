@@ -0,0 +1,147 @@
+from array import array
+
+# Alloy model: any mix of the elements below, with a price and a melting (burning)
+# loss per element. Compositions are stored as compact float arrays in ELEMENTS
+# order, so a set of grades is one (elements x grades) matrix for batch costing.
+#
+# Pure Python on purpose: the sidebar uses it on every rerun, and NumPy is only
+# imported by the batch helpers (grade_matrix / grade_costs).
+
+ELEMENTS = ('Cu', 'Zn', 'Pb', 'Sn', 'P', 'Ni', 'Al', 'Fe')
+
+ELEMENT_NAMES = {
+    'Cu': "Copper", 'Zn': "Zinc", 'Pb': "Lead", 'Sn': "Tin",
+    'P': "Phosphorus", 'Ni': "Nickel", 'Al': "Aluminium", 'Fe': "Iron",
+}
+
+# Indicative ₹/kg; Cu and Zn come from the sidebar rates
+DEFAULT_ELEMENT_PRICES = {
+    'Cu': 1000.0, 'Zn': 300.0, 'Pb': 200.0, 'Sn': 2800.0,
+    'P': 900.0, 'Ni': 1500.0, 'Al': 250.0, 'Fe': 60.0,
+}
+
+# Share of each element lost in melting (%). Zinc and phosphorus oxidise / fume far
+# more than copper, which a single burning-loss % cannot express.
+DEFAULT_ELEMENT_LOSS = {
+    'Cu': 0.5, 'Zn': 4.0, 'Pb': 2.0, 'Sn': 1.0,
+    'P': 25.0, 'Ni': 0.5, 'Al': 3.0, 'Fe': 1.0,
+}
+
+# Nominal (mid-specification) compositions, % by weight
+GRADES = {
+    'C11000': {'Cu': 100.0},                            # ETP copper
+    'C22000': {'Cu': 90.0, 'Zn': 10.0},                 # Commercial bronze 90/10
+    'C26000': {'Cu': 70.0, 'Zn': 30.0},                 # Cartridge brass 70/30
+    'C27200': {'Cu': 63.0, 'Zn': 37.0},                 # Yellow brass 63/37 (CW508L)
+    'C36000': {'Cu': 61.5, 'Zn': 35.5, 'Pb': 3.0},      # Free-cutting brass
+    'CW614N': {'Cu': 58.0, 'Zn': 39.0, 'Pb': 3.0},      # CuZn39Pb3
+    'CW617N': {'Cu': 58.0, 'Zn': 40.0, 'Pb': 2.0},      # CuZn40Pb2 (forging brass)
+    'C46400': {'Cu': 60.0, 'Zn': 39.25, 'Sn': 0.75},    # Naval brass
+    'C51000': {'Cu': 94.8, 'Sn': 5.0, 'P': 0.2},        # Phosphor bronze 5%
+    'C52100': {'Cu': 91.8, 'Sn': 8.0, 'P': 0.2},        # Phosphor bronze 8%
+}
+
+
+class Alloy:
+    """ Named composition over ELEMENTS; `pct` is an array('d') of weight % in ELEMENTS order """
+    __slots__ = ('name', 'pct')
+
+    def __init__(self, name, composition_pct):
+        unknown = set(composition_pct) - set(ELEMENTS)
+        if unknown:
+            raise KeyError(f"Unknown elements: {sorted(unknown)} (known: {', '.join(ELEMENTS)})")
+        total = sum(composition_pct.values())
+        if abs(total - 100.0) > 0.01:
+            raise ValueError(f"Composition of {name} adds up to {total:.3f}%, not 100%")
+        self.name = name
+        self.pct = array('d', (composition_pct.get(e, 0.0) for e in ELEMENTS))
+
+    @classmethod
+    def grade(cls, grade):
+        return cls(grade, GRADES[grade])
+
+    @classmethod
+    def cu_zn(cls, cu_pct):
+        """ Plain two-metal mix, zinc balance """
+        return cls(f"Cu {cu_pct:g}% / Zn {100 - cu_pct:g}%", {'Cu': cu_pct, 'Zn': 100.0 - cu_pct})
+
+    def composition_pct(self):
+        """ (pct, ...) in ELEMENTS order """
+        return tuple(self.pct)
+
+    def elements(self):
+        """ {element: pct} of the elements present """
+        return {e: p for e, p in zip(ELEMENTS, self.pct) if p}
+
+    def metal_value(self, element_prices):
+        """ ₹ per kg of charge: sum of price x share """
+        return sum(element_prices[e] * (p / 100) for e, p in zip(ELEMENTS, self.pct) if p)
+
+    def melt_loss_pct(self, element_loss_pct):
+        """ Charge-weighted burning loss (%) from per-element losses """
+        return sum(p / 100 * element_loss_pct[e] for e, p in zip(ELEMENTS, self.pct) if p)
+
+    def __repr__(self):
+        return f"Alloy({self.name!r}, {self.elements()})"
+
+
+def element_prices_from_session(state, book=True):
+    """
+    {element: ₹/kg}: sidebar Cu/Zn rates, the P1 page's other element prices, then defaults.
+    With a book valuation selected (sidebar, utils/inventory.py) book values win unless `book`
+    is False; they price the raw material only, scrap is valued at market (book=False).
+    """
+    rates = state.get('rm_rates', {})
+    prices = {**DEFAULT_ELEMENT_PRICES, **state.get('element_prices', {})}
+    prices['Cu'] = float(rates.get('cu', prices['Cu']))
+    prices['Zn'] = float(rates.get('zn', prices['Zn']))
+    if book:
+        prices.update({e: float(v) for e, v in state.get('book_prices', {}).items() if e in prices})
+    return prices
+
+
+def alloy_from_session(state):
+    """ The selected grade, or the Cu % / zinc balance mix when no grade is selected """
+    params = state.get('process_params', {})
+    grade = params.get('alloy_grade')
+    if grade:
+        return Alloy.grade(grade)
+    return Alloy.cu_zn(float(params.get('alloy_cu', 100.0)))
+
+
+def element_loss_from_session(state):
+    """ {element: loss %} when per-element burning loss is switched on, else None """
+    if not state.get('process_params', {}).get('per_element_loss'):
+        return None
+    return {**DEFAULT_ELEMENT_LOSS, **state.get('element_loss', {})}
+
+
+def grade_matrix(grades=None):
+    """ (elements x grades) composition matrix in % for batch costing """
+    import numpy as np
+    grades = list(GRADES) if grades is None else list(grades)
+    return np.array([Alloy.grade(g).composition_pct() for g in grades]).T
+
+
+def grade_costs(grades=None, element_prices=None, burning_loss_pct=2.0, element_loss_pct=None, **conversion):
+    """
+    Ingot cost of many grades under many price scenarios in one pass.
+
+    `element_prices` maps elements to scalars or 1-D arrays of scenarios (missing
+    elements use DEFAULT_ELEMENT_PRICES); `element_loss_pct` ({element: %}) replaces the
+    uniform `burning_loss_pct`; `conversion` is elec_cost / labor_cost / ... as for
+    calculate_ingot_cost. Returns an IngotCost of (scenarios x grades) arrays.
+    """
+    import numpy as np
+    from utils.calculations import CostCalculator
+    grades = list(GRADES) if grades is None else list(grades)
+    prices = {**DEFAULT_ELEMENT_PRICES, **(element_prices or {})}
+    composition = grade_matrix(grades)[:, None, :]                                 # (E, 1, G)
+    price_rows = [np.asarray(prices[e], dtype=float).reshape(-1, 1) for e in ELEMENTS]   # E x (S, 1)
+    losses = None
+    if element_loss_pct is not None:
+        losses = [float({**DEFAULT_ELEMENT_LOSS, **element_loss_pct}[e]) for e in ELEMENTS]
+    return CostCalculator.calculate_alloy_ingot_cost_batch(
+        element_prices=price_rows, composition_pct=composition,
+        burning_loss_pct=burning_loss_pct, element_loss_pct=losses, **conversion
+    )
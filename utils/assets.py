@@ -0,0 +1,13 @@
+import functools
+import os
+
+# Static assets are read from disk once per server process, not on every rerun.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@functools.lru_cache(maxsize=None)
+def read_css(file_name):
+    """ Contents of a stylesheet, relative to the app folder """
+    with open(os.path.join(APP_DIR, file_name), encoding='utf-8') as f:
+        return f.read()
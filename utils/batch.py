@@ -0,0 +1,406 @@
+import numpy as np
+from utils.calculations import CostCalculator
+from utils.alloys import ELEMENTS, DEFAULT_ELEMENT_PRICES, alloy_from_session, element_prices_from_session, element_loss_from_session
+from utils.routes import compiled_routes, stage_defaults, stage_definitions, stage_input_keys, stage_names, stage_params, stage_scrap_key
+
+# Default inputs of the full Ingot -> Sheet -> Parts -> Financials chain.
+# These mirror the sidebar / process_params defaults in app.py.
+CHAIN_DEFAULTS = {
+    # P1: Ingot
+    'cu_price': 1000.0,
+    'zn_price': 300.0,
+    'cu_pct': 100.0,
+    'zn_pct': None,             # None => zinc balance (100 - all other elements)
+    'burning_loss_pct': 2.0,
+    'elec_cost': 8.0,
+    'labor_cost': 3.0,
+    'consumable_cost': 2.0,
+    'overhead_cost': 2.0,
+    # P2: Sheet
+    'sheet_yield_pct': 98.0,
+    'sheet_process_cost': 12.0,
+    'scrap_factor': 1.0,
+    'scrap_rate': None,         # None => alloy metal value * scrap_factor
+    # P3: Parts
+    'gross_weight_kg': 1.0,
+    'parts_yield_pct': 70.0,
+    'net_weight_kg': None,      # None => gross_weight_kg * parts_yield_pct
+    'machining_cost': 5.0,
+    # Financials
+    'interest_rate_pa': 12.0,
+    'holding_days': 45.0,
+    'margin_pct': 10.0,
+}
+
+# Alloying elements besides Cu / Zn: 0% unless an alloy grade sets them.
+# Added after the stage inputs so earlier keys keep their position.
+ELEMENT_INPUTS = {e: (f'{e.lower()}_price', f'{e.lower()}_pct') for e in ELEMENTS}
+for _element in ELEMENTS[2:]:
+    CHAIN_DEFAULTS[ELEMENT_INPUTS[_element][0]] = DEFAULT_ELEMENT_PRICES[_element]
+    CHAIN_DEFAULTS[ELEMENT_INPUTS[_element][1]] = 0.0
+
+# Yield / conversion cost of the route stages other than the sheet (utils/routes.py)
+for _key, _value in stage_defaults().items():
+    CHAIN_DEFAULTS.setdefault(_key, _value)
+
+# Scrap rate of each yield stage and of the part stage (None => scrap_rate),
+# e.g. the P2 / P3 page scrap rate overrides
+SCRAP_INPUTS = tuple(stage_scrap_key(name) for name in stage_names() + ('parts',))
+for _key in SCRAP_INPUTS:
+    CHAIN_DEFAULTS.setdefault(_key, None)
+
+# Inputs computed from others when left as None (in this order)
+DERIVED_INPUTS = ('zn_pct', 'scrap_rate') + SCRAP_INPUTS + ('net_weight_kg',)
+
+
+def _present(inputs, element):
+    """
+    False only for a scalar 0% share at a scalar price, so absent elements cost nothing
+    in a batch; an element whose price is swept keeps its axis in the output
+    """
+    price, pct = (inputs[key] for key in ELEMENT_INPUTS[element])
+    return np.ndim(pct) > 0 or np.ndim(price) > 0 or pct != 0
+
+
+def metal_value(inputs):
+    """ ₹ per kg of charge: sum of element price x share (resolved inputs) """
+    total = 0.0
+    for e in ELEMENTS:
+        price_key, pct_key = ELEMENT_INPUTS[e]
+        if _present(inputs, e):
+            total = total + np.asarray(inputs[price_key]) * np.asarray(inputs[pct_key]) / 100
+    return total
+
+
+def resolve_inputs(book=None, **overrides):
+    """
+    Merges a part book (DataFrame / dict of columns) with scalar overrides and defaults.
+    Column values win over overrides, overrides win over CHAIN_DEFAULTS; blank (NaN)
+    cells fall back to the override / default for that row only.
+    Derived inputs (zn_pct, scrap_rate, the stage scrap rates, net_weight_kg) are
+    filled in when missing.
+    """
+    unknown = set(overrides) - set(CHAIN_DEFAULTS)
+    if unknown:
+        raise KeyError(f"Unknown chain inputs: {sorted(unknown)}")
+
+    inputs = dict(CHAIN_DEFAULTS)
+    inputs.update(overrides)
+    partial = {}    # Columns with blanks, merged once the fallback value is known
+    if book is not None:
+        for key in CHAIN_DEFAULTS:
+            if key in book:
+                column = np.asarray(book[key], dtype=float)
+                if np.isnan(column).any():
+                    partial[key] = column
+                else:
+                    inputs[key] = column
+
+    def fill(key):
+        if key in partial:
+            inputs[key] = np.where(np.isnan(partial[key]), inputs[key], partial[key])
+
+    for key in partial:
+        if key not in DERIVED_INPUTS:
+            fill(key)
+
+    if inputs['zn_pct'] is None:
+        zn_pct = 100.0 - np.asarray(inputs['cu_pct'], dtype=float)
+        for e in ELEMENTS[2:]:
+            if _present(inputs, e):
+                zn_pct = zn_pct - np.asarray(inputs[ELEMENT_INPUTS[e][1]], dtype=float)
+        inputs['zn_pct'] = zn_pct
+    fill('zn_pct')
+    if inputs['scrap_rate'] is None:
+        inputs['scrap_rate'] = metal_value(inputs) * np.asarray(inputs['scrap_factor'])
+    fill('scrap_rate')
+    for key in SCRAP_INPUTS:
+        if inputs[key] is None:
+            inputs[key] = inputs['scrap_rate']
+        fill(key)
+    if inputs['net_weight_kg'] is None:
+        inputs['net_weight_kg'] = np.asarray(inputs['gross_weight_kg']) * (np.asarray(inputs['parts_yield_pct']) / 100.0)
+    fill('net_weight_kg')
+    return inputs
+
+
+def chain_inputs_from_session(state):
+    """
+    Maps the Streamlit session (sidebar rates, process_params, financial targets)
+    to CHAIN_DEFAULTS overrides, so headless engines price what the dashboard shows.
+    P2 / P3 page scrap rate overrides set sheet_scrap_rate / parts_scrap_rate.
+    Under book valuation the metal prices are book values and scrap_rate is set to the
+    sidebar's market scrap rate (for the session alloy), as on the dashboard.
+    """
+    params = state.get('process_params', {})
+    prices = element_prices_from_session(state)
+    derived = state.get('derived_rates', {})
+    fin = state.get('financial_targets', {})
+    inputs = {
+        'cu_price': prices['Cu'],
+        'zn_price': prices['Zn'],
+        'cu_pct': params.get('alloy_cu'),
+        'burning_loss_pct': params.get('burning_loss'),
+        'elec_cost': derived.get('elec'),
+        'labor_cost': derived.get('labor'),
+        'consumable_cost': derived.get('cons'),
+        'overhead_cost': derived.get('overhead'),
+        'scrap_factor': state.get('scrap_factor'),
+        'parts_yield_pct': params.get('p3_yield_pct'),
+        'machining_cost': params.get('machining_cost'),
+        'interest_rate_pa': fin.get('interest_rate_pa'),
+        'holding_days': fin.get('holding_days'),
+        'margin_pct': fin.get('margin_pct'),
+    }
+    for name, stage in stage_definitions().items():
+        for key, param in zip(stage_input_keys(name), stage_params(stage)):
+            inputs[key] = params.get(param)
+    # Scrap rates set on the P2 / P3 pages (as utils.pipeline.pipeline_inputs_from_session)
+    inputs['sheet_scrap_rate'] = params.get('p2_scrap_rate')
+    inputs['parts_scrap_rate'] = params.get('p3_scrap_rate')
+
+    # Book valuation prices the raw material only: scrap is sold at the market rate
+    if state.get('book_prices'):
+        inputs['scrap_rate'] = state.get('indicative_scrap_rate')
+
+    # Alloy grade: explicit shares for every element it contains (and their prices)
+    if params.get('alloy_grade'):
+        for e, pct in alloy_from_session(state).elements().items():
+            price_key, pct_key = ELEMENT_INPUTS[e]
+            inputs[price_key] = prices[e] if e not in ('Cu', 'Zn') else inputs[price_key]
+            inputs[pct_key] = pct
+        inputs.setdefault('zn_pct', 0.0)
+    element_loss = element_loss_from_session(state)
+    if element_loss is not None:
+        inputs['burning_loss_pct'] = alloy_from_session(state).melt_loss_pct(element_loss)
+    return {k: float(v) for k, v in inputs.items() if v is not None}
+
+
+def evaluate_chain(inputs):
+    """
+    Runs the full costing chain on resolved inputs (scalars and/or arrays).
+    Returns a flat dict of broadcast arrays, one entry per output column.
+    """
+    elements = [e for e in ELEMENTS if _present(inputs, e)]
+    ingot = CostCalculator.calculate_alloy_ingot_cost_batch(
+        element_prices=[inputs[ELEMENT_INPUTS[e][0]] for e in elements],
+        composition_pct=[inputs[ELEMENT_INPUTS[e][1]] for e in elements],
+        burning_loss_pct=inputs['burning_loss_pct'],
+        elec_cost=inputs['elec_cost'],
+        labor_cost=inputs['labor_cost'],
+        consumable_cost=inputs['consumable_cost'],
+        overhead_cost=inputs['overhead_cost']
+    )
+    sheet = CostCalculator.calculate_sheet_cost_batch(
+        ingot_cost_per_kg=ingot['final_cost_per_kg'],
+        yield_pct=inputs['sheet_yield_pct'],
+        scrap_recovery_price=inputs['sheet_scrap_rate'],
+        process_cost_per_kg=inputs['sheet_process_cost']
+    )
+    part = CostCalculator.calculate_part_cost_batch(
+        sheet_cost_per_kg=sheet['final_cost_per_kg'],
+        part_weight_kg=inputs['net_weight_kg'],
+        gross_weight_kg=inputs['gross_weight_kg'],
+        scrap_recovery_price=inputs['parts_scrap_rate'],
+        machining_cost_per_part=inputs['machining_cost']
+    )
+    fin = CostCalculator.calculate_financials_batch(
+        base_cost=part['effective_cost_per_kg_finished'],
+        interest_rate_pa=inputs['interest_rate_pa'],
+        holding_days=inputs['holding_days'],
+        margin_pct=inputs['margin_pct']
+    )
+
+    columns = {
+        'ingot_cost_per_kg': ingot['final_cost_per_kg'],
+        'sheet_cost_per_kg': sheet['final_cost_per_kg'],
+        'part_cost_per_piece': part['total_cost_per_part'],
+        'part_cost_per_kg': part['effective_cost_per_kg_finished'],
+        'interest_cost': fin['interest_cost'],
+        'total_cost': fin['total_cost'],
+        'profit_margin': fin['profit_margin'],
+        'selling_price': fin['selling_price'],
+        'selling_price_per_piece': fin['selling_price'] * np.asarray(inputs['net_weight_kg'], dtype=float),
+    }
+    return dict(zip(columns, np.broadcast_arrays(*columns.values())))
+
+
+def _route_slots(inputs, plan, routes, return_pct):
+    """ Per stage slot of each row's route: (stage index, yield %, conversion cost, scrap rate, return share) """
+    slot_stage = plan.stage_index[routes]
+    slot_return = plan.return_pct[routes] / 100
+    slots = []
+    for k in range(slot_stage.shape[-1]):
+        stage = slot_stage[..., k]
+        y, cost, scrap, ret = 100.0, 0.0, 0.0, slot_return[..., k]
+        for s, name in enumerate(plan.stages):
+            here = stage == s
+            if not here.any():
+                continue
+            yield_key, cost_key = stage_input_keys(name)
+            y = np.where(here, inputs[yield_key], y)
+            cost = np.where(here, inputs[cost_key], cost)
+            scrap = np.where(here, inputs[stage_scrap_key(name)], scrap)
+            if name in return_pct:
+                ret = np.where(here, np.asarray(return_pct[name], dtype=float) / 100, ret)
+        slots.append((stage, y, cost, scrap, ret))
+    return slots
+
+
+def evaluate_routes(inputs, route=None, return_pct=None, plan=None):
+    """
+    The costing chain along process routes (utils/routes.py) for resolved inputs.
+
+    `route` is a route name or one per row (None / blank => DEFAULT_ROUTE).
+    `return_pct` ({stage name or 'parts': % of its scrap remelted}, scalars or per-row
+    arrays) overrides the routes' scrap destinations. Without returned scrap the stages
+    are chained forward (the sheet route gives exactly evaluate_chain); with it the
+    steady state is solved directly, one (stages + 2) square system per row.
+    Returns evaluate_chain's columns with a '<stage>_cost_per_kg' column for every
+    stage (NaN where the row's route has none) and the mass balance per kg finished.
+    """
+    plan = plan or compiled_routes()
+    return_pct = return_pct or {}
+    routes = plan.route_index(route)
+    slots = _route_slots(inputs, plan, routes, return_pct)
+    part_return = plan.part_return_pct[routes] / 100
+    if 'parts' in return_pct:
+        part_return = np.asarray(return_pct['parts'], dtype=float) / 100
+
+    elements = [e for e in ELEMENTS if _present(inputs, e)]
+    ingot = CostCalculator.calculate_alloy_ingot_cost_batch(
+        element_prices=[inputs[ELEMENT_INPUTS[e][0]] for e in elements],
+        composition_pct=[inputs[ELEMENT_INPUTS[e][1]] for e in elements],
+        burning_loss_pct=inputs['burning_loss_pct'],
+        elec_cost=inputs['elec_cost'],
+        labor_cost=inputs['labor_cost'],
+        consumable_cost=inputs['consumable_cost'],
+        overhead_cost=inputs['overhead_cost']
+    )
+    net = np.asarray(inputs['net_weight_kg'], dtype=float)
+    gross = np.asarray(inputs['gross_weight_kg'], dtype=float)
+    parts_scrap = inputs['parts_scrap_rate']
+
+    # Mass balance per kg of finished parts, from the part stage back to the charge
+    keep = 1 - np.asarray(inputs['burning_loss_pct'], dtype=float) / 100
+    part_yield = net / gross
+    valid = (keep > 0) & (part_yield > 0)
+    for _, y, _, _, _ in slots:
+        valid = valid & (np.asarray(y) > 0)
+    out = 1 / np.where(valid, part_yield, 1.0)                 # Stage output feeding the part stage
+    part_returned = part_return * (out - 1)
+    masses = []                                                 # (output, input, returned) per slot
+    for _, y, _, _, ret in reversed(slots):
+        slot_in = out / np.where(valid, np.asarray(y) / 100, 1.0)
+        masses.insert(0, (out, slot_in, ret * (slot_in - out)))
+        out = slot_in
+    ingot_kg = out
+    charge = ingot_kg / np.where(valid, keep, 1.0)
+    returned = part_returned + sum(r for _, _, r in masses)
+    scrap = (1 / np.where(valid, part_yield, 1.0) - 1) + sum(i - o for o, i, _ in masses)
+
+    if not (np.any(part_return) or any(np.any(ret) for _, _, _, _, ret in slots)):
+        cost = ingot['final_cost_per_kg']
+        slot_costs = []
+        for _, y, conversion, stage_scrap, _ in slots:
+            cost = CostCalculator.calculate_sheet_cost_batch(
+                ingot_cost_per_kg=cost,
+                yield_pct=y,
+                scrap_recovery_price=stage_scrap,
+                process_cost_per_kg=conversion
+            )['final_cost_per_kg']
+            slot_costs.append(cost)
+        part = CostCalculator.calculate_part_cost_batch(
+            sheet_cost_per_kg=cost,
+            part_weight_kg=net,
+            gross_weight_kg=gross,
+            scrap_recovery_price=parts_scrap,
+            machining_cost_per_part=inputs['machining_cost']
+        )
+        ingot_cost, part_cost = ingot['final_cost_per_kg'], part['effective_cost_per_kg_finished']
+        part_cost_per_piece = part['total_cost_per_part']
+    else:
+        # Unknowns: ingot, each slot's output, part (per kg finished). Returned scrap is
+        # valued at the cost of its own stage's output:
+        #   ingot:  I c0 - sum(R_k c_k) - R_P c_P = V metal + C conversion
+        #   slot k: -in_k c_(k-1) + (out_k + R_k) c_k = in_k cost_k - (scrap_k - R_k) scrap_rate_k
+        #   part:   -G c_K + (1 + R_P) c_P = G machining / gross - (G - 1 - R_P) parts_scrap_rate
+        K = len(slots)
+        conversion = (np.asarray(inputs['elec_cost']) + inputs['labor_cost'] + inputs['consumable_cost']
+                      + inputs['overhead_cost'])
+        terms = [ingot_kg, charge, returned, parts_scrap, conversion, gross, inputs['machining_cost']]
+        terms += [v for (o, i, r), (_, _, cost, s, _) in zip(masses, slots) for v in (o, i, r, cost, s)]
+        shape = np.broadcast_shapes(*(np.shape(v) for v in terms))
+        A = np.zeros(shape + (K + 2, K + 2))
+        b = np.zeros(shape + (K + 2,))
+        A[..., 0, 0] = ingot_kg
+        b[..., 0] = (charge - returned) * metal_value(inputs) + charge * conversion
+        for k, ((o, i, r), (_, _, cost, stage_scrap, _)) in enumerate(zip(masses, slots), start=1):
+            A[..., 0, k] = -r
+            A[..., k, k - 1] = -i
+            A[..., k, k] = o + r
+            b[..., k] = i * cost - (i - o - r) * stage_scrap
+        G = 1 / np.where(valid, part_yield, 1.0)
+        A[..., 0, K + 1] = -part_returned
+        A[..., K + 1, K] = -G
+        A[..., K + 1, K + 1] = 1 + part_returned
+        b[..., K + 1] = G * inputs['machining_cost'] / gross - (G - 1 - part_returned) * parts_scrap
+        costs = np.linalg.solve(A, b[..., None])[..., 0]
+        costs = np.where(np.asarray(valid)[..., None], costs, 0.0)
+        ingot_cost, part_cost = costs[..., 0], costs[..., K + 1]
+        slot_costs = [costs[..., k] for k in range(1, K + 1)]
+        part_cost_per_piece = part_cost * net
+
+    fin = CostCalculator.calculate_financials_batch(
+        base_cost=part_cost,
+        interest_rate_pa=inputs['interest_rate_pa'],
+        holding_days=inputs['holding_days'],
+        margin_pct=inputs['margin_pct']
+    )
+
+    # Slots back to named stages (NaN where a row's route does not pass the stage)
+    stage_cost = {name: np.nan for name in plan.stages}
+    stage_kg = {name: np.nan for name in plan.stages}
+    for (stage, _, _, _, _), cost, (o, _, _) in zip(slots, slot_costs, masses):
+        for s, name in enumerate(plan.stages):
+            stage_cost[name] = np.where(stage == s, cost, stage_cost[name])
+            stage_kg[name] = np.where(stage == s, o, stage_kg[name])
+
+    columns = {
+        'ingot_cost_per_kg': ingot_cost,
+        **{f'{name}_cost_per_kg': stage_cost[name] for name in plan.stages},
+        'part_cost_per_piece': part_cost_per_piece,
+        'part_cost_per_kg': part_cost,
+        'interest_cost': fin['interest_cost'],
+        'total_cost': fin['total_cost'],
+        'profit_margin': fin['profit_margin'],
+        'selling_price': fin['selling_price'],
+        'selling_price_per_piece': fin['selling_price'] * net,
+        'charge_kg': charge,
+        'virgin_metal_kg': charge - returned,
+        'returned_scrap_kg': returned,
+        'sold_scrap_kg': scrap - returned,
+        'melt_loss_kg': charge - ingot_kg,
+        'ingot_kg': ingot_kg,
+        **{f'{name}_kg': stage_kg[name] for name in plan.stages},
+    }
+    return dict(zip(columns, np.broadcast_arrays(*columns.values())))
+
+
+def calculate_chain_batch(book=None, **overrides):
+    """
+    Prices a whole part book in one vectorized pass.
+
+    `book` is a DataFrame (or dict of arrays) whose columns are any of the
+    CHAIN_DEFAULTS keys; anything missing comes from `overrides` or the defaults.
+    A 'route' column (utils/routes.py names) prices each row along its own route.
+    Returns a DataFrame with one priced row per input row.
+    """
+    import pandas as pd  # Only the DataFrame API needs pandas
+    inputs = resolve_inputs(book, **overrides)
+    if book is not None and 'route' in book:
+        result = evaluate_routes(inputs, route=np.asarray(book['route'], dtype=object))
+    else:
+        result = evaluate_chain(inputs)
+    index = book.index if isinstance(book, pd.DataFrame) else None
+    return pd.DataFrame({k: np.atleast_1d(v) for k, v in result.items()}, index=index)
@@ -0,0 +1,141 @@
+import argparse
+import os
+import pandas as pd
+from utils.batch import CHAIN_DEFAULTS, calculate_chain_batch
+
+# Streams a part book through the costing chain chunk by chunk, so memory use
+# is bounded by `chunksize` rows regardless of the size of the input file.
+
+DEFAULT_CHUNKSIZE = 100_000
+TARGET_COLUMN = 'target_price'     # Per-row target for --solve
+
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.csv', '.txt', '.gz'):
+        return 'csv'
+    raise ValueError(f"Unsupported file type: {path} (use .csv or .parquet)")
+
+
+def _csv_dtypes(path):
+    """
+    Column types of a CSV part book: inputs and targets are floats, every other column is
+    text, so a chunk with a blank column reads the same as the others (one Parquet schema)
+    """
+    numeric = set(CHAIN_DEFAULTS) | {TARGET_COLUMN}
+    return {c: float if c in numeric else str for c in pd.read_csv(path, nrows=0).columns}
+
+
+def iter_book_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """ Yields DataFrames of at most `chunksize` rows from a CSV or Parquet part book """
+    if _file_format(path) == 'csv':
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=_csv_dtypes(path))
+    else:
+        import pyarrow.parquet as pq  # Optional: only needed for Parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+class PricedWriter:
+    """ Appends priced chunks to a CSV or Parquet file """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._parquet = None
+        self._header = True
+
+    def write(self, frame):
+        if self.format == 'csv':
+            frame.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False)
+            self._header = False
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            else:
+                # Later chunks take the file's schema (e.g. a column that is all blank in this chunk)
+                table = pa.Table.from_pandas(frame, schema=self._parquet.schema, preserve_index=False)
+            self._parquet.write_table(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def price_book_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, **overrides):
+    """
+    Prices every row of `input_path` and writes input columns + priced columns
+    to `output_path`. Per-row columns (any CHAIN_DEFAULTS key) override `overrides`.
+    Returns the number of rows written.
+    """
+    rows = 0
+    with PricedWriter(output_path) as writer:
+        for chunk in iter_book_chunks(input_path, chunksize):
+            priced = calculate_chain_batch(chunk, **overrides)
+            writer.write(pd.concat([chunk, priced], axis=1))
+            rows += len(chunk)
+    return rows
+
+
+def solve_book_file(input_path, output_path, key, target=None, chunksize=DEFAULT_CHUNKSIZE, **overrides):
+    """
+    Reverse costing of a part book: for every row, the value of input `key` at which
+    the selling price meets that row's `target_price` column (or `target` for all rows).
+    Writes input columns + solved columns to `output_path`. Returns the number of rows.
+    """
+    from utils.reverse import reverse_quote
+    rows = 0
+    with PricedWriter(output_path) as writer:
+        for chunk in iter_book_chunks(input_path, chunksize):
+            if TARGET_COLUMN in chunk:
+                row_target = chunk[TARGET_COLUMN].to_numpy(dtype=float)
+            elif target is not None:
+                row_target = target
+            else:
+                raise ValueError(f"No '{TARGET_COLUMN}' column in {input_path}; pass --target")
+            solved = reverse_quote(key, row_target, book=chunk, **overrides)
+            writer.write(pd.concat([chunk, solved], axis=1))
+            rows += len(chunk)
+    return rows
+
+
+def _parse_override(text):
+    key, sep, value = text.partition('=')
+    if not sep or key not in CHAIN_DEFAULTS:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE with KEY in {sorted(CHAIN_DEFAULTS)}, got '{text}'")
+    return key, float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless bulk quote: prices a CSV/Parquet part book.")
+    parser.add_argument("input", help="Part book (.csv or .parquet)")
+    parser.add_argument("output", help="Priced output (.csv or .parquet)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk (bounds memory)")
+    parser.add_argument("--set", dest="overrides", type=_parse_override, action="append", default=[],
+                        metavar="KEY=VALUE", help="Global input, e.g. --set cu_price=1020 (per-row columns take priority)")
+    parser.add_argument("--solve", choices=sorted(CHAIN_DEFAULTS), metavar="KEY",
+                        help=f"Reverse costing: solve each row for this input (e.g. cu_price) so the selling price meets '{TARGET_COLUMN}'")
+    parser.add_argument("--target", type=float, default=None, help=f"Target selling price for rows without a '{TARGET_COLUMN}' column")
+    args = parser.parse_args(argv)
+
+    if args.solve:
+        rows = solve_book_file(args.input, args.output, args.solve, target=args.target,
+                               chunksize=args.chunksize, **dict(args.overrides))
+        print(f"Solved {args.solve} for {rows} rows -> {args.output}")
+        return 0
+
+    rows = price_book_file(args.input, args.output, chunksize=args.chunksize, **dict(args.overrides))
+    print(f"Priced {rows} rows -> {args.output}")
+    return 0
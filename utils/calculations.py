@@ -1,3 +1,91 @@
+from collections.abc import Mapping
+
+_new = tuple.__new__
+
+
+class CostResult(Mapping, tuple):
+    """
+    Fixed-field result record: a tuple underneath (no per-instance dict, one allocation),
+    but it reads like the dict the methods used to return - result['rm_cost'], .get(),
+    .keys(), .items(), dict(result) and == against a dict all work, as does result.rm_cost.
+    Batch methods return the same types with NumPy arrays as fields (struct-of-arrays).
+
+    A record is a Mapping, not a dict: isinstance(result, dict) is False, and json.dumps
+    treats it as a tuple and writes only the field names. Convert with result.to_dict()
+    wherever results leave Python (JSON, APIs, files) or meet code that checks for dicts.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._index = {name: i for i, name in enumerate(cls._fields)}
+        for i, name in enumerate(cls._fields):
+            setattr(cls, name, property(lambda self, i=i: tuple.__getitem__(self, i)))
+
+    def __new__(cls, **fields):
+        if fields.keys() != cls._index.keys():
+            raise TypeError(f"{cls.__name__} takes exactly the fields: {', '.join(cls._fields)}")
+        return _new(cls, [fields[name] for name in cls._fields])
+
+    @classmethod
+    def _make(cls, values):
+        """ Record from values in field order (the scalar hot path uses _new directly) """
+        return _new(cls, values)
+
+    def __reduce__(self):
+        return type(self)._make, (tuple.__getitem__(self, slice(None)),)
+
+    def __getitem__(self, key):
+        try:
+            return tuple.__getitem__(self, self._index[key])
+        except (KeyError, TypeError):
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+    def to_dict(self):
+        """ Plain nested dict of Python values, ready for json.dumps (batch arrays become lists) """
+        return {k: (v.to_dict() if isinstance(v, CostResult) else v.tolist() if hasattr(v, 'tolist') else v)
+                for k, v in self.items()}
+
+
+class ConversionBreakdown(CostResult):
+    __slots__ = ()
+    _fields = ('electricity', 'labor', 'consumables', 'overhead')
+
+
+class IngotCost(CostResult):
+    __slots__ = ()
+    _fields = ('rm_cost', 'conversion_cost_total', 'breakdown', 'burning_loss_weight',
+               'burning_loss_value', 'output_weight', 'final_cost_per_kg')
+
+
+class SheetCost(CostResult):
+    __slots__ = ()
+    _fields = ('input_cost', 'processing_cost', 'scrap_weight', 'scrap_credit',
+               'good_output_weight', 'final_cost_per_kg')
+
+
+class PartCost(CostResult):
+    __slots__ = ()
+    _fields = ('material_cost', 'scrap_credit', 'machining_cost', 'total_cost_per_part',
+               'effective_cost_per_kg_finished')
+
+
+class Financials(CostResult):
+    __slots__ = ()
+    _fields = ('base_cost', 'interest_cost', 'total_cost', 'profit_margin', 'selling_price')
+
+
 class CostCalculator:
     @staticmethod
     def calculate_ingot_cost(
@@ -32,20 +120,69 @@ class CostCalculator:
         else:
             final_cost_per_kg = 0
             
-        return {
-            "rm_cost": rm_cost,
-            "conversion_cost_total": conversion_cost_input,
-            "breakdown": {
-                "electricity": elec_cost,
-                "labor": labor_cost,
-                "consumables": consumable_cost,
-                "overhead": overhead_cost
-            },
-            "burning_loss_weight": total_input_weight - output_weight,
-            "burning_loss_value": (total_input_weight - output_weight) * rm_cost,
-            "output_weight": output_weight,
-            "final_cost_per_kg": final_cost_per_kg
-        }
+        # Records are built positionally (in _fields order): ~2x cheaper than keywords
+        return _new(IngotCost, (
+            rm_cost,
+            conversion_cost_input,
+            _new(ConversionBreakdown, (elec_cost, labor_cost, consumable_cost, overhead_cost)),
+            total_input_weight - output_weight,
+            (total_input_weight - output_weight) * rm_cost,
+            output_weight,
+            final_cost_per_kg
+        ))
+
+    @staticmethod
+    def calculate_alloy_ingot_cost(
+        element_prices, composition_pct,
+        burning_loss_pct=0,
+        element_loss_pct=None,
+        elec_cost=0,
+        labor_cost=0,
+        consumable_cost=0,
+        overhead_cost=0
+    ):
+        """
+        Calculates the cost of 1 kg of Ingot for an alloy of any number of elements.
+        element_prices, composition_pct and element_loss_pct hold one value per element
+        (same order, e.g. utils.alloys.ELEMENTS). With element_loss_pct each element
+        burns at its own rate; otherwise burning_loss_pct applies to the whole charge.
+        """
+        total_input_weight = 1.0
+        
+        # Raw Material Cost (weighted element prices)
+        rm_cost = 0.0
+        for price, pct in zip(element_prices, composition_pct):
+            rm_cost += price * (pct/100)
+        
+        conversion_cost_input = elec_cost + labor_cost + consumable_cost + overhead_cost
+        total_cost_input = rm_cost + conversion_cost_input
+        
+        # Output Weight after Burning Loss
+        if element_loss_pct is None:
+            output_weight = total_input_weight * (1 - (burning_loss_pct/100))
+            burning_loss_value = (total_input_weight - output_weight) * rm_cost
+        else:
+            lost_weight = burning_loss_value = 0.0
+            for price, pct, loss in zip(element_prices, composition_pct, element_loss_pct):
+                lost = (pct/100) * (loss/100)
+                lost_weight += lost
+                burning_loss_value += lost * price
+            output_weight = total_input_weight - lost_weight
+        
+        if output_weight > 0:
+            final_cost_per_kg = total_cost_input / output_weight
+        else:
+            final_cost_per_kg = 0
+        
+        return _new(IngotCost, (
+            rm_cost,
+            conversion_cost_input,
+            _new(ConversionBreakdown, (elec_cost, labor_cost, consumable_cost, overhead_cost)),
+            total_input_weight - output_weight,
+            burning_loss_value,
+            output_weight,
+            final_cost_per_kg
+        ))
 
     @staticmethod
     def calculate_sheet_cost(ingot_cost_per_kg, yield_pct, scrap_recovery_price, process_cost_per_kg):
@@ -66,14 +203,9 @@ class CostCalculator:
         else:
             final_cost_per_kg = 0
             
-        return {
-            "input_cost": input_cost,
-            "processing_cost": process_cost_per_kg,
-            "scrap_weight": scrap_weight,
-            "scrap_credit": scrap_credit,
-            "good_output_weight": good_output_weight,
-            "final_cost_per_kg": final_cost_per_kg
-        }
+        return _new(SheetCost, (
+            input_cost, process_cost_per_kg, scrap_weight, scrap_credit, good_output_weight, final_cost_per_kg
+        ))
 
     @staticmethod
     def calculate_part_cost(sheet_cost_per_kg, part_weight_kg, gross_weight_kg, scrap_recovery_price, machining_cost_per_part):
@@ -85,13 +217,10 @@ class CostCalculator:
         net_material_cost = material_cost - scrap_credit
         total_cost = net_material_cost + machining_cost_per_part
         
-        return {
-            "material_cost": material_cost,
-            "scrap_credit": scrap_credit,
-            "machining_cost": machining_cost_per_part,
-            "total_cost_per_part": total_cost,
-            "effective_cost_per_kg_finished": (total_cost / part_weight_kg) if part_weight_kg > 0 else 0
-        }
+        return _new(PartCost, (
+            material_cost, scrap_credit, machining_cost_per_part, total_cost,
+            (total_cost / part_weight_kg) if part_weight_kg > 0 else 0
+        ))
 
     @staticmethod
     def calculate_financials(base_cost, interest_rate_pa, holding_days, margin_pct):
@@ -109,13 +238,7 @@ class CostCalculator:
         
         selling_price = cost_with_interest + profit_amount
         
-        return {
-            "base_cost": base_cost,
-            "interest_cost": interest_cost,
-            "total_cost": cost_with_interest,
-            "profit_margin": profit_amount,
-            "selling_price": selling_price
-        }
+        return _new(Financials, (base_cost, interest_cost, cost_with_interest, profit_amount, selling_price))
 
     @staticmethod
     def estimate_scrap_rate(metal_price, purity_pct=100, recovery_factor=0.9):
@@ -123,3 +246,186 @@ class CostCalculator:
         Auto-estimates scrap value typically lower than virgin metal.
         """
         return metal_price * (purity_pct/100) * recovery_factor
+
+
+    # --- BATCH (VECTORIZED) VERSIONS ---
+    # Same formulas as the scalar methods above, but every argument may be a
+    # scalar, a NumPy array or a DataFrame column. Inputs are broadcast against
+    # each other, so one metal price can be applied to many parts in one pass.
+    # Results are columnar: the same record types as the scalar versions, with arrays as fields.
+    # NumPy is imported inside each method so the scalar (dashboard) path never loads it.
+
+    @staticmethod
+    def _safe_divide(num, den):
+        """ num / den, with 0 wherever den <= 0 (matches the scalar fallbacks) """
+        import numpy as np
+        num, den = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+        out = np.zeros(num.shape)
+        np.divide(num, den, out=out, where=den > 0)
+        return out
+
+    @staticmethod
+    def calculate_ingot_cost_batch(
+        cu_price, zn_price,
+        cu_pct, zn_pct,
+        burning_loss_pct,
+        elec_cost=0,
+        labor_cost=0,
+        consumable_cost=0,
+        overhead_cost=0
+    ):
+        """
+        Vectorized calculate_ingot_cost. Returns an IngotCost of arrays.
+        """
+        import numpy as np
+        cu_price, zn_price, cu_pct, zn_pct, burning_loss_pct, elec_cost, labor_cost, consumable_cost, overhead_cost = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (
+                cu_price, zn_price, cu_pct, zn_pct, burning_loss_pct,
+                elec_cost, labor_cost, consumable_cost, overhead_cost
+            ))
+        )
+        total_input_weight = 1.0
+
+        rm_cost = (cu_price * (cu_pct/100)) + (zn_price * (zn_pct/100))
+        conversion_cost_input = elec_cost + labor_cost + consumable_cost + overhead_cost
+        total_cost_input = rm_cost + conversion_cost_input
+
+        output_weight = total_input_weight * (1 - (burning_loss_pct/100))
+        final_cost_per_kg = CostCalculator._safe_divide(total_cost_input, output_weight)
+
+        return IngotCost(
+            rm_cost=rm_cost,
+            conversion_cost_total=conversion_cost_input,
+            breakdown=ConversionBreakdown(
+                electricity=elec_cost,
+                labor=labor_cost,
+                consumables=consumable_cost,
+                overhead=overhead_cost
+            ),
+            burning_loss_weight=total_input_weight - output_weight,
+            burning_loss_value=(total_input_weight - output_weight) * rm_cost,
+            output_weight=output_weight,
+            final_cost_per_kg=final_cost_per_kg
+        )
+
+    @staticmethod
+    def calculate_alloy_ingot_cost_batch(
+        element_prices, composition_pct,
+        burning_loss_pct=0,
+        element_loss_pct=None,
+        elec_cost=0,
+        labor_cost=0,
+        consumable_cost=0,
+        overhead_cost=0
+    ):
+        """
+        Vectorized calculate_alloy_ingot_cost. The element axis comes first: pass one
+        entry per element (a list, or an array with elements on axis 0), and every
+        entry broadcasts - e.g. prices of shape (scenarios, 1) against compositions
+        of shape (1, grades) give (scenarios x grades) results. Returns an IngotCost of arrays.
+        """
+        import numpy as np
+        rm_cost = 0.0
+        for price, pct in zip(element_prices, composition_pct):
+            rm_cost = rm_cost + np.asarray(price, dtype=float) * (np.asarray(pct, dtype=float)/100)
+
+        total_input_weight = 1.0
+        if element_loss_pct is None:
+            output_weight = total_input_weight * (1 - (np.asarray(burning_loss_pct, dtype=float)/100))
+            burning_loss_value = (total_input_weight - output_weight) * rm_cost
+        else:
+            lost_weight = burning_loss_value = 0.0
+            for price, pct, loss in zip(element_prices, composition_pct, element_loss_pct):
+                lost = (np.asarray(pct, dtype=float)/100) * (np.asarray(loss, dtype=float)/100)
+                lost_weight = lost_weight + lost
+                burning_loss_value = burning_loss_value + lost * np.asarray(price, dtype=float)
+            output_weight = total_input_weight - lost_weight
+
+        rm_cost, output_weight, burning_loss_value, elec_cost, labor_cost, consumable_cost, overhead_cost = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (
+                rm_cost, output_weight, burning_loss_value, elec_cost, labor_cost, consumable_cost, overhead_cost
+            ))
+        )
+        conversion_cost_input = elec_cost + labor_cost + consumable_cost + overhead_cost
+        total_cost_input = rm_cost + conversion_cost_input
+
+        return IngotCost(
+            rm_cost=rm_cost,
+            conversion_cost_total=conversion_cost_input,
+            breakdown=ConversionBreakdown(
+                electricity=elec_cost,
+                labor=labor_cost,
+                consumables=consumable_cost,
+                overhead=overhead_cost
+            ),
+            burning_loss_weight=total_input_weight - output_weight,
+            burning_loss_value=burning_loss_value,
+            output_weight=output_weight,
+            final_cost_per_kg=CostCalculator._safe_divide(total_cost_input, output_weight)
+        )
+
+    @staticmethod
+    def calculate_sheet_cost_batch(ingot_cost_per_kg, yield_pct, scrap_recovery_price, process_cost_per_kg):
+        """ Vectorized calculate_sheet_cost """
+        import numpy as np
+        ingot_cost_per_kg, yield_pct, scrap_recovery_price, process_cost_per_kg = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (ingot_cost_per_kg, yield_pct, scrap_recovery_price, process_cost_per_kg))
+        )
+        input_weight = 1.0
+
+        total_input_cost = ingot_cost_per_kg + process_cost_per_kg
+        good_output_weight = input_weight * (yield_pct / 100)
+        scrap_weight = input_weight - good_output_weight
+
+        scrap_credit = scrap_weight * scrap_recovery_price
+        net_cost = total_input_cost - scrap_credit
+
+        return SheetCost(
+            input_cost=ingot_cost_per_kg,
+            processing_cost=process_cost_per_kg,
+            scrap_weight=scrap_weight,
+            scrap_credit=scrap_credit,
+            good_output_weight=good_output_weight,
+            final_cost_per_kg=CostCalculator._safe_divide(net_cost, good_output_weight)
+        )
+
+    @staticmethod
+    def calculate_part_cost_batch(sheet_cost_per_kg, part_weight_kg, gross_weight_kg, scrap_recovery_price, machining_cost_per_part):
+        """ Vectorized calculate_part_cost (KG units) """
+        import numpy as np
+        sheet_cost_per_kg, part_weight_kg, gross_weight_kg, scrap_recovery_price, machining_cost_per_part = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (sheet_cost_per_kg, part_weight_kg, gross_weight_kg, scrap_recovery_price, machining_cost_per_part))
+        )
+        material_cost = gross_weight_kg * sheet_cost_per_kg
+        scrap_weight_kg = gross_weight_kg - part_weight_kg
+        scrap_credit = scrap_weight_kg * scrap_recovery_price
+
+        net_material_cost = material_cost - scrap_credit
+        total_cost = net_material_cost + machining_cost_per_part
+
+        return PartCost(
+            material_cost=material_cost,
+            scrap_credit=scrap_credit,
+            machining_cost=machining_cost_per_part,
+            total_cost_per_part=total_cost,
+            effective_cost_per_kg_finished=CostCalculator._safe_divide(total_cost, part_weight_kg)
+        )
+
+    @staticmethod
+    def calculate_financials_batch(base_cost, interest_rate_pa, holding_days, margin_pct):
+        """ Vectorized calculate_financials """
+        import numpy as np
+        base_cost, interest_rate_pa, holding_days, margin_pct = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (base_cost, interest_rate_pa, holding_days, margin_pct))
+        )
+        interest_cost = base_cost * (interest_rate_pa / 100) * (holding_days / 365)
+        cost_with_interest = base_cost + interest_cost
+        profit_amount = cost_with_interest * (margin_pct / 100)
+
+        return Financials(
+            base_cost=base_cost,
+            interest_cost=interest_cost,
+            total_cost=cost_with_interest,
+            profit_margin=profit_amount,
+            selling_price=cost_with_interest + profit_amount
+        )
@@ -0,0 +1,126 @@
+# Capacity utilization: conversion rates (₹/kg) from the monthly expense budget and the
+# volume actually planned, instead of always dividing by installed capacity.
+#
+# The monthly expenses are the budget at installed capacity. Each line is split into a
+# fixed part (paid whatever is melted: salaried staff, furnace holding power, rent)
+# and a variable part that scales with kilos melted:
+#   rate = expense x fixed % / planned kg + expense x (1 - fixed %) / capacity kg
+# At full capacity this is the old expense / capacity; below it the fixed part is spread
+# over fewer kilos, so the rate goes up and margin on a fixed quote comes down.
+#
+# The scalar path runs in the sidebar on every rerun and stays free of NumPy; the
+# planning sweep (utilization x product mixes) imports it when called.
+
+# Monthly expense input -> conversion rate chain input (utils.batch.CHAIN_DEFAULTS)
+EXPENSE_RATES = {
+    'exp_power': 'elec_cost',
+    'exp_labor': 'labor_cost',
+    'exp_cons': 'consumable_cost',
+    'exp_admin': 'overhead_cost',
+}
+
+EXPENSE_LABELS = {
+    'exp_power': "Electricity",
+    'exp_labor': "Labour",
+    'exp_cons': "Consumables",
+    'exp_admin': "General/Admin",
+}
+
+# Share of each line that does not fall with volume (%)
+FIXED_PCT_DEFAULTS = {
+    'exp_power': 30.0,      # Furnace holding, lighting, demand charges
+    'exp_labor': 80.0,      # Salaried; overtime / contract labour is the variable part
+    'exp_cons': 10.0,
+    'exp_admin': 100.0,
+}
+
+
+def conversion_rates(expenses, capacity_kg, volume_kg=None, fixed_pct=None, variable=None):
+    """
+    {rate input: ₹/kg} for monthly `expenses` ({expense: ₹}) budgeted at `capacity_kg`
+    when `volume_kg` is melted (default: at capacity). `variable` ({expense: ₹/kg})
+    replaces the budget's variable part of a line, e.g. power from the melt schedule
+    (utils/melt.py). Scalars or arrays; both volumes must be positive.
+    """
+    variable = variable or {}
+    volume_kg = capacity_kg if volume_kg is None else volume_kg
+    fixed_pct = {**FIXED_PCT_DEFAULTS, **(fixed_pct or {})}
+    rates = {}
+    for expense, rate in EXPENSE_RATES.items():
+        fixed = expenses[expense] * fixed_pct[expense] / 100
+        per_kg = variable[expense] if expense in variable else (expenses[expense] - fixed) / capacity_kg
+        rates[rate] = fixed / volume_kg + per_kg
+    return rates
+
+
+def capacity_from_session(state):
+    """
+    The sidebar's capacity plan: (expenses, capacity kg, planned kg, fixed %, variable),
+    `variable` holding the P1 melt schedule's power cost when it is used in costing
+    """
+    plan = state.get('capacity_plan', {})
+    capacity = plan.get('capacity_kg', 50000.0)
+    scheduled = state.get('scheduled_elec_cost')
+    return (plan.get('expenses', {}), capacity, plan.get('volume_kg', capacity),
+            {**FIXED_PCT_DEFAULTS, **plan.get('fixed_pct', {})},
+            {} if scheduled is None else {'exp_power': float(scheduled)})
+
+
+def utilization_sweep(book, mixes, utilization_pct, expenses, capacity_kg, volume_kg=None, fixed_pct=None, variable=None,
+                      **overrides):
+    """
+    Cost and margin of product mixes over utilization levels, in one vectorized pass.
+
+    `book` lists the products (as calculate_chain_batch, optional route column), `mixes`
+    is (mixes x products) shares of finished kg, `utilization_pct` the melt volume as %
+    of capacity. Products are quoted at the planned `volume_kg` with the chain's margin;
+    the sweep re-costs them at every utilization against those fixed prices. `variable`
+    replaces budget variable rates as in conversion_rates (e.g. scheduled power).
+    Returns {name: (utilization x mixes) array}: volume_kg, finished_kg, cost_per_kg,
+    price_per_kg, margin_pct (on cost, like margin_pct), profit (₹/month), and
+    'product_cost' (utilization x products).
+    """
+    import numpy as np
+    from utils.batch import resolve_inputs, evaluate_routes
+
+    route = np.asarray(book['route'], dtype=object) if 'route' in book else None
+    volume_kg = capacity_kg if volume_kg is None else volume_kg
+    quoted = evaluate_routes(resolve_inputs(book, **{**overrides, **conversion_rates(expenses, capacity_kg, volume_kg, fixed_pct, variable)}),
+                             route=route)
+
+    volumes = np.asarray(utilization_pct, dtype=float) / 100 * capacity_kg
+    rates = conversion_rates(expenses, capacity_kg, volumes[:, None], fixed_pct, variable)
+    swept = evaluate_routes(resolve_inputs(book, **{**overrides, **rates}), route=route)
+    shares = np.atleast_2d(np.asarray(mixes, dtype=float))
+    shares = shares / shares.sum(axis=1, keepdims=True)
+    products = shares.shape[1]
+    cost = np.broadcast_to(swept['total_cost'], (len(volumes), products))
+    price = np.broadcast_to(quoted['selling_price'], (products,))
+    charge = np.broadcast_to(quoted['charge_kg'], (products,))
+    mix_cost = cost @ shares.T
+    mix_price = shares @ price
+    finished = volumes[:, None] / (shares @ charge)
+    return {
+        'volume_kg': np.broadcast_to(volumes[:, None], mix_cost.shape),
+        'finished_kg': finished,
+        'cost_per_kg': mix_cost,
+        'price_per_kg': np.broadcast_to(mix_price, mix_cost.shape),
+        'margin_pct': (mix_price / mix_cost - 1) * 100,
+        'profit': (mix_price - mix_cost) * finished,
+        'product_cost': cost,
+    }
+
+
+def break_even_utilization(utilization_pct, margin_pct):
+    """ Utilization % at which each mix's margin first reaches 0, interpolated between sweep points (NaN if never) """
+    import numpy as np
+    utilization_pct = np.asarray(utilization_pct, dtype=float)
+    profitable = margin_pct >= 0
+    first = profitable.argmax(axis=0)
+    before = np.maximum(first - 1, 0)
+    mixes = np.arange(margin_pct.shape[1])
+    u0, u1 = utilization_pct[before], utilization_pct[first]
+    m0, m1 = margin_pct[before, mixes], margin_pct[first, mixes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = np.where(first > 0, u0 + (u1 - u0) * -m0 / (m1 - m0), u1)
+    return np.where(profitable.any(axis=0), crossing, np.nan)
@@ -0,0 +1,370 @@
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from utils.alloys import ELEMENTS, GRADES
+from utils.batch import CHAIN_DEFAULTS, ELEMENT_INPUTS, resolve_inputs, evaluate_routes
+from utils.routes import compiled_routes, stage_input_keys, stage_names, stage_scrap_key
+
+# Persistent part catalog (SQLite) with incremental repricing.
+#
+# Each part row stores its own chain inputs (gross/net weight, machining cost, alloy,
+# yields, ...). A NULL input means "use the global value" (sidebar rates, process
+# params). When a row is priced we also store `deps`, a bitmask of the global inputs
+# that price actually depends on: only the NULL inputs, minus the ones with no effect
+# on that row (e.g. Zn price for a pure copper part, parts yield when the net weight
+# is given). On the next reprice only rows that are new/edited (dirty) or whose deps
+# intersect the changed globals are read, priced in batch and written back in one
+# transaction per chunk. The route column (utils/routes.py name) sets the process
+# route a part is priced on; blanks and labels that are not a route name price on
+# the default route. An alloy that names a grade (utils.alloys.GRADES) fills the
+# part's blank element shares on upsert; other alloy labels are only labels.
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'part_catalog.db')
+DEFAULT_CHUNKSIZE = 100_000
+ANALYZE_ROWS = 10_000          # Upserts at least this large refresh the planner statistics
+
+INPUTS = list(CHAIN_DEFAULTS)
+INPUT_BITS = {key: 1 << i for i, key in enumerate(INPUTS)}
+OUTPUTS = [
+    'ingot_cost_per_kg', 'sheet_cost_per_kg', 'part_cost_per_piece', 'part_cost_per_kg',
+    'interest_cost', 'total_cost', 'profit_margin', 'selling_price', 'selling_price_per_piece',
+] + [f'{name}_cost_per_kg' for name in stage_names() if name != 'sheet']     # NULL off the part's route
+TEXT_COLUMNS = ['sku', 'customer', 'alloy', 'route']
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS parts (
+    sku TEXT NOT NULL UNIQUE,
+    customer TEXT,
+    alloy TEXT,
+    route TEXT,
+    {', '.join(f'{k} REAL' for k in INPUTS)},
+    {', '.join(f'{k} REAL' for k in OUTPUTS)},
+    deps INTEGER NOT NULL DEFAULT 0,
+    dirty INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS parts_customer ON parts (customer);
+CREATE INDEX IF NOT EXISTS parts_alloy ON parts (alloy);
+CREATE INDEX IF NOT EXISTS parts_deps ON parts (deps);
+CREATE INDEX IF NOT EXISTS parts_dirty ON parts (dirty) WHERE dirty = 1;
+CREATE TABLE IF NOT EXISTS priced_globals (key TEXT PRIMARY KEY, value REAL);
+"""
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_catalog():
+    """ The app's catalog at CATALOG_PATH (one connection per server process) """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PartCatalog(CATALOG_PATH)
+        return _shared
+
+
+def row_dependencies(columns, global_inputs, routes=None):
+    """
+    Bitmask (per row) of the global inputs a row's price depends on.
+    `columns` maps each input to a float array with NaN where the row has no value;
+    `routes` (route index per row, see catalog_routes) drops the stages a route skips.
+    """
+    g = {**CHAIN_DEFAULTS, **global_inputs}
+    n = len(next(iter(columns.values())))
+    uses_global = {k: np.isnan(columns[k]) if k in columns else np.ones(n, dtype=bool) for k in INPUTS}
+
+    deps = np.zeros(n, dtype=np.int64)
+    for key in INPUTS:
+        deps |= np.where(uses_global[key], INPUT_BITS[key], 0)
+
+    # Effective alloy shares: a metal with a 0% share does not move the price
+    zn_default = np.full(n, 100.0)
+    for element, (price_key, pct_key) in ELEMENT_INPUTS.items():
+        if element == 'Zn':
+            continue
+        pct = np.where(uses_global[pct_key], g[pct_key], columns.get(pct_key, np.nan))
+        zn_default -= pct
+        deps &= ~np.where(pct == 0, INPUT_BITS[price_key], 0)
+    if g['zn_pct'] is not None:
+        zn_default = np.full(n, float(g['zn_pct']))
+    zn_pct = np.where(uses_global['zn_pct'], zn_default, columns.get('zn_pct', np.nan))
+    deps &= ~np.where(zn_pct == 0, INPUT_BITS['zn_price'], 0)
+
+    # Yield / cost / scrap rate of stages the row's route does not pass
+    plan = compiled_routes()
+    if routes is None:
+        routes = np.full(n, plan.route_index(None))
+    scrap_used = np.zeros(n, dtype=bool)      # Some stage on the route sells scrap at scrap_rate
+
+    def given(key):
+        return ~uses_global[key] | (g[key] is not None)
+
+    for s, name in enumerate(plan.stages):
+        skipped = ~(plan.stage_index[routes] == s).any(axis=-1)
+        for key in stage_input_keys(name) + (stage_scrap_key(name),):
+            deps &= ~np.where(skipped, INPUT_BITS[key], 0)
+        scrap_used |= ~skipped & ~given(stage_scrap_key(name))
+    scrap_used |= ~given(stage_scrap_key('parts'))
+
+    # Derived inputs given per row (or globally) cut the inputs they would be derived from
+    deps &= ~np.where(scrap_used, 0, INPUT_BITS['scrap_rate'])
+    deps &= ~np.where(~scrap_used | given('scrap_rate'), INPUT_BITS['scrap_factor'], 0)
+    deps &= ~np.where(given('net_weight_kg'), INPUT_BITS['parts_yield_pct'], 0)
+    return deps
+
+
+def catalog_routes(labels):
+    """ Route index per row for the catalog's route labels (anything unknown => default route) """
+    plan = compiled_routes()
+    labels = np.asarray(labels, dtype=object)
+    known = np.isin(labels.astype(str), plan.routes)
+    return plan.route_index(np.where(known, labels, None))
+
+
+def dependency_names(mask):
+    return [key for key in INPUTS if mask & INPUT_BITS[key]]
+
+
+class PartCatalog:
+    """
+    Indexed part store. Lookups by SKU (unique), customer and alloy use indexes;
+    reprice() only touches rows affected by what changed since the last reprice.
+    One connection is shared by all sessions, so calls are serialized by a lock.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA cache_size=-65536")     # 64 MB page cache for bulk index updates
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """ Adds input / output columns introduced since the file was created; its rows are repriced """
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(parts)")}
+        missing = [k for k in INPUTS + OUTPUTS if k not in existing]
+        if not missing:
+            return
+        with self._conn:
+            for key in missing:
+                self._conn.execute(f"ALTER TABLE parts ADD COLUMN {key} REAL")
+            self._conn.execute("UPDATE parts SET dirty = 1")
+            self._conn.execute("DELETE FROM priced_globals")
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Editing ---
+
+    def upsert(self, parts):
+        """
+        Adds or replaces parts (DataFrame or iterable of dicts with a 'sku' key).
+        Unknown columns are ignored; missing inputs are stored as NULL (= global).
+        A grade name in 'alloy' sets the blank element shares (*_pct) to the grade's.
+        Written rows are marked dirty so the next reprice() prices them.
+        Returns the number of rows written.
+        """
+        columns = TEXT_COLUMNS + INPUTS
+        if hasattr(parts, 'columns'):
+            parts = _with_grade_shares(parts)
+            rows = zip(*(_column_values(parts[c], c) if c in parts.columns else [None] * len(parts) for c in columns))
+        else:
+            rows = (tuple(_cell(_grade_part(part).get(c), c) for c in columns) for part in parts)
+        update = ', '.join(f'{c} = excluded.{c}' for c in columns[1:])
+        with self._lock:
+            with self._conn:
+                written = self._conn.executemany(
+                    f"INSERT INTO parts ({', '.join(columns)}, dirty) VALUES ({', '.join('?' * len(columns))}, 1) "
+                    f"ON CONFLICT(sku) DO UPDATE SET {update}, dirty = 1",
+                    rows
+                ).rowcount
+            if written >= ANALYZE_ROWS:
+                # Refresh index statistics so customer + alloy lookups pick the selective index
+                self._conn.execute("ANALYZE")
+        return written
+
+    def delete(self, skus):
+        with self._lock, self._conn:
+            return self._conn.executemany("DELETE FROM parts WHERE sku = ?", ((s,) for s in skus)).rowcount
+
+    # --- Lookups ---
+
+    def get(self, sku):
+        """ One part as a dict (inputs, priced outputs, dependency list), or None """
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM parts WHERE sku = ?", (sku,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            part = dict(zip((d[0] for d in cur.description), row))
+        part['depends_on'] = dependency_names(part['deps'])
+        return part
+
+    def find(self, sku_prefix=None, customer=None, alloy=None, limit=500):
+        """ Parts matching every given filter, as a DataFrame (SKU order) """
+        import pandas as pd
+        where, args = [], []
+        if sku_prefix:
+            # Range scan on the SKU index (LIKE would not use it)
+            where.append("sku >= ? AND sku < ?")
+            args += [sku_prefix, sku_prefix + '\U0010ffff']
+        if customer:
+            where.append("customer = ?")
+            args.append(customer)
+        if alloy:
+            where.append("alloy = ?")
+            args.append(alloy)
+        sql = f"SELECT {', '.join(TEXT_COLUMNS + INPUTS + OUTPUTS)}, dirty FROM parts"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY sku LIMIT ?"
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=args + [int(limit)])
+
+    def distinct(self, column):
+        """ Distinct customers / alloys / routes (index scan) """
+        if column not in TEXT_COLUMNS[1:]:
+            raise ValueError(f"Expected one of {TEXT_COLUMNS[1:]}, got '{column}'")
+        with self._lock:
+            return [v for (v,) in self._conn.execute(f"SELECT DISTINCT {column} FROM parts WHERE {column} IS NOT NULL ORDER BY 1")]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+
+    # --- Repricing ---
+
+    def priced_globals(self):
+        """ Global inputs used by the last reprice(), or None if never priced """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM priced_globals").fetchall()
+        return dict(rows) if rows else None
+
+    def changed_inputs(self, global_inputs):
+        """ Global inputs that differ from the last reprice() """
+        current = {**CHAIN_DEFAULTS, **global_inputs}
+        previous = self.priced_globals()
+        if previous is None:
+            return list(INPUTS)
+        return [k for k in INPUTS if previous.get(k) != (None if current[k] is None else float(current[k]))]
+
+    def _stale_where(self, changed):
+        """ WHERE clause selecting dirty rows plus rows that depend on `changed` """
+        mask = sum(INPUT_BITS[k] for k in changed)
+        if not mask:
+            return "dirty = 1", []
+        # Few distinct masks exist; match them through the deps index instead of a bitwise scan
+        masks = [m for (m,) in self._conn.execute("SELECT DISTINCT deps FROM parts") if m & mask]
+        if not masks:
+            return "dirty = 1", []
+        return f"dirty = 1 OR deps IN ({', '.join('?' * len(masks))})", masks
+
+    def pending(self, global_inputs):
+        """ Number of rows the next reprice(global_inputs) would price """
+        changed = self.changed_inputs(global_inputs)
+        with self._lock:
+            where, args = self._stale_where(changed)
+            return self._conn.execute(f"SELECT COUNT(*) FROM parts WHERE {where}", args).fetchone()[0]
+
+    def reprice(self, global_inputs, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Prices every row that is dirty or depends on a global input that changed
+        since the last call, in chunks of `chunksize` rows, one transaction each.
+        `global_inputs` are CHAIN_DEFAULTS overrides (e.g. chain_inputs_from_session).
+        Returns the number of rows repriced.
+        """
+        unknown = set(global_inputs) - set(CHAIN_DEFAULTS)
+        if unknown:
+            raise KeyError(f"Unknown chain inputs: {sorted(unknown)}")
+        changed = self.changed_inputs(global_inputs)
+        set_outputs = ', '.join(f'{k} = ?' for k in OUTPUTS)
+        repriced = 0
+        with self._lock:
+            where, args = self._stale_where(changed)
+            # Read the stale rowids first: the updates below change the rows being selected
+            rowids = np.sort(np.fromiter(
+                (r for (r,) in self._conn.execute(f"SELECT rowid FROM parts WHERE {where}", args)), dtype=np.int64
+            ))
+            for start in range(0, len(rowids), chunksize):
+                chunk = rowids[start:start + chunksize]
+                columns, labels = self._read_inputs(chunk)
+                routes = catalog_routes(labels)
+                priced = evaluate_routes(resolve_inputs(columns, **global_inputs), route=routes)
+                deps = row_dependencies(columns, global_inputs, routes)
+                out = np.column_stack([np.broadcast_to(priced[k], chunk.shape) for k in OUTPUTS])
+                with self._conn:
+                    self._conn.executemany(
+                        f"UPDATE parts SET {set_outputs}, deps = ?, dirty = 0 WHERE rowid = ?",
+                        zip(*(out[:, i].tolist() for i in range(len(OUTPUTS))), deps.tolist(), chunk.tolist())
+                    )
+                repriced += len(chunk)
+
+            current = {**CHAIN_DEFAULTS, **global_inputs}
+            with self._conn:
+                self._conn.execute("DELETE FROM priced_globals")
+                self._conn.executemany(
+                    "INSERT INTO priced_globals (key, value) VALUES (?, ?)",
+                    ((k, None if v is None else float(v)) for k, v in current.items())
+                )
+        return repriced
+
+    def _read_inputs(self, rowids):
+        """ Input columns of the given (sorted) rows as float arrays (NULL -> NaN), and their route labels """
+        rows = self._conn.execute(
+            f"SELECT route, {', '.join(INPUTS)} FROM parts WHERE rowid IN (SELECT value FROM json_each(?)) ORDER BY rowid",
+            (json.dumps(rowids.tolist()),)
+        ).fetchall()
+        labels = [row[0] for row in rows]
+        values = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(INPUTS))   # None -> NaN
+        return {key: values[:, i] for i, key in enumerate(INPUTS)}, labels
+
+def _with_grade_shares(book):
+    """ The book with blank element shares of rows whose alloy is a grade name taken from GRADES """
+    if 'alloy' not in book.columns or not book['alloy'].isin(list(GRADES)).any():
+        return book
+    book = book.copy()
+    for e in ELEMENTS:
+        pct_key = ELEMENT_INPUTS[e][1]
+        shares = book['alloy'].map({grade: composition.get(e, 0.0) for grade, composition in GRADES.items()})
+        book[pct_key] = shares if pct_key not in book.columns else book[pct_key].astype(float).fillna(shares)
+    return book
+
+
+def _grade_part(part):
+    """ A part dict with its blank element shares taken from its alloy grade (if it names one) """
+    composition = GRADES.get(part.get('alloy'))
+    if composition is None:
+        return part
+    shares = {ELEMENT_INPUTS[e][1]: composition.get(e, 0.0) for e in ELEMENTS}
+    return {**shares, **{k: v for k, v in part.items() if not (v is None or (isinstance(v, float) and v != v))}}
+
+
+def _column_values(series, column):
+    """ A DataFrame column as SQLite values (see _cell), converted in one pass """
+    if column in TEXT_COLUMNS:
+        return [None if v is None or v != v else str(v) for v in series.tolist()]
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def _cell(value, column):
+    """ Python value for SQLite: blanks / NaN -> NULL, inputs -> float, labels -> str """
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if column in TEXT_COLUMNS:
+        return str(value)
+    return float(value)
+
@@ -0,0 +1,147 @@
+import math
+from utils.alloys import ELEMENTS, ELEMENT_NAMES, GRADES, Alloy, alloy_from_session, element_prices_from_session, element_loss_from_session
+from utils.calculations import CostResult
+
+# Charge-mix optimization: the least-cost furnace charge (virgin metal, own P2/P3
+# return scrap, bought-in scrap) whose melt lands inside the target alloy's
+# composition band, within what is in stock. Elements burn at their own loss %, so
+# the optimizer over-charges zinc rather than assuming the charge equals the melt.
+#
+# One linear program per heat (utils/lp.py), per kg of melt:
+#   minimize   sum(price_m * x_m)
+#   subject to sum_m melt_em * x_m = 1                    (1 kg of melt)
+#              lo_e <= sum_m melt_em * x_m <= hi_e       (composition band)
+#              0 <= x_m <= stock_m / heat_kg
+# where melt_em is the kg of element e left in the melt per kg of material m charged.
+# A batch of heats (price scenarios, stock levels) is solved in one call.
+
+DEFAULT_TOLERANCE_PCT = 0.5      # ± percentage points around each element of the target
+DEFAULT_IMPURITY_MAX_PCT = 0.1   # Ceiling for elements the target does not contain
+
+# Bought-in scrap offered on the P1 page (₹/kg, kg in stock)
+DEFAULT_BOUGHT_SCRAP = (
+    {'name': "Bought brass scrap (CuZn39Pb3)", 'composition_pct': GRADES['CW614N'], 'price': 560.0, 'available_kg': 500.0},
+    {'name': "Bought copper scrap", 'composition_pct': {'Cu': 100.0}, 'price': 940.0, 'available_kg': 300.0},
+)
+
+
+class ChargeMaterial:
+    """ Something the furnace can be charged with: a composition, a price (₹/kg) and a stock limit (kg) """
+    __slots__ = ('name', 'alloy', 'price', 'available_kg')
+
+    def __init__(self, name, composition_pct, price, available_kg=math.inf):
+        self.name = name
+        self.alloy = composition_pct if isinstance(composition_pct, Alloy) else Alloy(name, composition_pct)
+        self.price = float(price)
+        self.available_kg = float(available_kg)
+
+    def __repr__(self):
+        return f"ChargeMaterial({self.name!r}, {self.alloy.elements()}, price={self.price:g}, available_kg={self.available_kg:g})"
+
+
+class ChargeMix(CostResult):
+    """ Optimized charge per heat; `charge_kg` is (heats x materials), `melt_composition` (heats x ELEMENTS) """
+    __slots__ = ()
+    _fields = (
+        'charge_kg', 'total_charge_kg', 'melt_kg', 'melt_composition',
+        'material_cost', 'cost_per_kg_melt', 'burning_loss_pct', 'status',
+    )
+
+
+def composition_band(target, tolerance_pct=DEFAULT_TOLERANCE_PCT, impurity_max_pct=DEFAULT_IMPURITY_MAX_PCT):
+    """ (lo, hi) % per element in ELEMENTS order; `tolerance_pct` may be a number or {element: pct} """
+    lo, hi = [], []
+    for e, pct in zip(ELEMENTS, target.composition_pct()):
+        if pct:
+            tol = tolerance_pct.get(e, DEFAULT_TOLERANCE_PCT) if isinstance(tolerance_pct, dict) else tolerance_pct
+            lo.append(max(pct - tol, 0.0))
+            hi.append(min(pct + tol, 100.0))
+        else:
+            lo.append(0.0)
+            hi.append(impurity_max_pct)
+    return lo, hi
+
+
+def optimize_charge(target, materials, heat_kg=1000.0, prices=None, available=None,
+                    element_loss_pct=None, burning_loss_pct=0.0,
+                    tolerance_pct=DEFAULT_TOLERANCE_PCT, impurity_max_pct=DEFAULT_IMPURITY_MAX_PCT,
+                    conversion_cost=0.0):
+    """
+    Least-cost charge for `heat_kg` of melt of the `target` Alloy from `materials`.
+
+    `prices` / `available` ((heats, materials) or (materials,)) replace the materials'
+    own price / stock to solve many heats at once. Losses are per element
+    ({element: %}) or a uniform `burning_loss_pct`; `conversion_cost` (₹ per kg charged)
+    is included in cost_per_kg_melt. Returns a ChargeMix of arrays with one row per
+    heat; heats that cannot be met from stock have status 'infeasible' and NaN values.
+    """
+    import numpy as np
+    from utils.lp import linprog_batch, STATUS
+
+    composition = np.array([m.alloy.composition_pct() for m in materials]).T / 100     # (E, M)
+    if element_loss_pct is None:
+        keep = np.full(len(ELEMENTS), 1 - burning_loss_pct / 100)
+    else:
+        keep = 1 - np.array([element_loss_pct[e] for e in ELEMENTS], dtype=float) / 100
+    melt = composition * keep[:, None]
+
+    lo, hi = (np.array(v) / 100 for v in composition_band(target, tolerance_pct, impurity_max_pct))
+    rows = composition.any(axis=1) | (lo > 0)        # Elements nobody charges and nobody needs are 0 anyway
+    prices = np.array([m.price for m in materials]) if prices is None else np.asarray(prices, dtype=float)
+    available = np.array([m.available_kg for m in materials]) if available is None else np.asarray(available, dtype=float)
+
+    x, _, status = linprog_batch(
+        c=prices + conversion_cost,
+        A_ub=np.concatenate([melt[rows], -melt[rows]]),
+        b_ub=np.concatenate([hi[rows], -lo[rows]]),
+        A_eq=melt.sum(axis=0)[None, :],
+        b_eq=np.ones(1),
+        upper=np.atleast_2d(available) / heat_kg,
+    )
+
+    charge_kg = x * heat_kg
+    total_charge_kg = charge_kg.sum(axis=1)
+    material_cost = (charge_kg * prices).sum(axis=1)
+    return ChargeMix(
+        charge_kg=charge_kg,
+        total_charge_kg=total_charge_kg,
+        melt_kg=np.where(np.isnan(total_charge_kg), np.nan, heat_kg),
+        melt_composition=x @ melt.T * 100,
+        material_cost=material_cost,
+        cost_per_kg_melt=(material_cost + conversion_cost * total_charge_kg) / heat_kg,
+        burning_loss_pct=(total_charge_kg - heat_kg) / total_charge_kg * 100,
+        status=np.array(STATUS)[status],
+    )
+
+
+def charge_materials_from_session(state, heat_kg=1000.0, bought_scrap=DEFAULT_BOUGHT_SCRAP):
+    """
+    Virgin metal for every element of the current alloy (sidebar / P1 prices, no stock
+    limit), the P2 / P3 scrap that `heat_kg` of this alloy returns (valued at the auto
+    scrap rate) and the bought-in scrap lots.
+    """
+    alloy = alloy_from_session(state)
+    prices = element_prices_from_session(state)
+    params = state.get('process_params', {})
+    sheet_yield = params.get('rolling_yield', 98.0) / 100
+    parts_yield = params.get('p3_yield_pct', 70.0) / 100
+    scrap_rate = state.get('indicative_scrap_rate', alloy.metal_value(prices))
+
+    materials = [ChargeMaterial(f"{ELEMENT_NAMES[e]} (virgin)", {e: 100.0}, prices[e]) for e in alloy.elements()]
+    materials.append(ChargeMaterial("Own P2 sheet scrap", alloy, scrap_rate, heat_kg * (1 - sheet_yield)))
+    materials.append(ChargeMaterial("Own P3 parts scrap", alloy, scrap_rate, heat_kg * sheet_yield * (1 - parts_yield)))
+    materials.extend(ChargeMaterial(**lot) for lot in bought_scrap)
+    return materials
+
+
+def optimize_charge_from_session(state, heat_kg=1000.0, materials=None, **kwargs):
+    """ optimize_charge for the current alloy and losses (per element when switched on) """
+    params = state.get('process_params', {})
+    if materials is None:
+        materials = charge_materials_from_session(state, heat_kg)
+    return optimize_charge(
+        alloy_from_session(state), materials, heat_kg=heat_kg,
+        element_loss_pct=element_loss_from_session(state),
+        burning_loss_pct=params.get('burning_loss', 2.0),
+        **kwargs
+    )
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from utils.batch import CHAIN_DEFAULTS, DERIVED_INPUTS, ELEMENT_INPUTS, evaluate_routes, resolve_inputs
+from utils.routes import compiled_routes, stage_input_keys, stage_scrap_key
+
+# Exact marginal sensitivities of the selling price (₹/kg finished) with respect to
+# every chain input, by forward-mode differentiation of the closed-form chain:
+#
+#   rm    = sum(price * share) over the alloy elements    (raw material, ₹/kg input)
+#   I     = (rm + conversion) / (1 - loss%)              (ingot ₹/kg)
+#   S_k   = (S_k-1 + cost_k - (1 - y_k) * scrap_k) / y_k  (each stage on the route, S_0 = I)
+#   C     = (g * S_K - (g - n) * scrap_P + machining) / n  (part ₹/kg finished)
+#   price = C * (1 + r * days / 365) * (1 + margin)
+#
+# Each input is seeded with tangent 1 in turn and the tangents are pushed through the
+# same formulas, so a whole part book costs one vectorized pass per input instead of
+# 2 x N finite-difference evaluations. Stages follow each row's route (utils/routes.py,
+# open chain only: scrap remelted in closed loop is not differentiated).
+
+
+def _merge(book, overrides):
+    """
+    Inputs as utils.batch.resolve_inputs merges them (blank cells fall back per row),
+    except that derived inputs stay None when not given and keep their blanks (NaN)
+    otherwise, so _jvp can differentiate through the derivation row by row.
+    """
+    unknown = set(overrides) - set(CHAIN_DEFAULTS)
+    if unknown:
+        raise KeyError(f"Unknown chain inputs: {sorted(unknown)}")
+    inputs = {**CHAIN_DEFAULTS, **overrides}
+    v = {k: (None if x is None else np.asarray(x, dtype=float)) for k, x in inputs.items()}
+    if book is not None:
+        for key in CHAIN_DEFAULTS:
+            if key in book:
+                column = np.asarray(book[key], dtype=float)
+                if v[key] is not None:
+                    column = np.where(np.isnan(column), v[key], column)
+                v[key] = column
+    return v
+
+
+def _given(value, derived, dderived, tangent):
+    """ A derived input and its tangent: the given value where there is one, else the derivation """
+    if value is None:
+        return derived, dderived
+    blank = np.isnan(value)
+    return np.where(blank, derived, value), np.where(blank, dderived, tangent)
+
+
+def _jvp(v, t, plan, routes):
+    """
+    Evaluates the chain (`v` = input values) together with its directional derivative
+    along tangent `t` (same keys, 0/1 seeds), each row along its route (`routes`, plan
+    indexes). Returns (price, d_price).
+    """
+    # P1: Ingot
+    rm = drm = 0.0
+    balance, dbalance = 1.0, 0.0        # zinc balance when zn_pct is derived
+    for element, (price_key, pct_key) in ELEMENT_INPUTS.items():
+        if element == 'Zn':
+            continue
+        a, da = v[pct_key] / 100, t[pct_key] / 100
+        rm, drm = rm + v[price_key] * a, drm + t[price_key] * a + v[price_key] * da
+        balance, dbalance = balance - a, dbalance - da
+    zn, dzn = _given(v['zn_pct'], balance * 100, dbalance * 100, t['zn_pct'])
+    b, db = zn / 100, dzn / 100
+    rm = rm + v['zn_price'] * b
+    drm = drm + t['zn_price'] * b + v['zn_price'] * db
+
+    conv = v['elec_cost'] + v['labor_cost'] + v['consumable_cost'] + v['overhead_cost']
+    dconv = t['elec_cost'] + t['labor_cost'] + t['consumable_cost'] + t['overhead_cost']
+
+    w1, dw1 = 1 - v['burning_loss_pct'] / 100, -t['burning_loss_pct'] / 100
+    ok = w1 > 0
+    w1 = np.where(ok, w1, 1.0)
+    ingot = (rm + conv) / w1
+    dingot = (drm + dconv - ingot * dw1) / w1
+
+    # Scrap rate (auto = alloy metal value x recovery factor); stage scrap rates fall back to it
+    s, ds = _given(v['scrap_rate'], rm * v['scrap_factor'],
+                   drm * v['scrap_factor'] + rm * t['scrap_factor'], t['scrap_rate'])
+
+    # P2: the route's yield stages (a padding slot passes the cost through)
+    cost, dcost = ingot, dingot
+    slot_stage = plan.stage_index[routes]
+    for k in range(slot_stage.shape[-1]):
+        y, dy, conversion, dconversion, sk, dsk = 1.0, 0.0, 0.0, 0.0, 0.0, 0.0
+        for index, name in enumerate(plan.stages):
+            here = slot_stage[..., k] == index
+            if not np.any(here):
+                continue
+            yield_key, cost_key = stage_input_keys(name)
+            y = np.where(here, v[yield_key] / 100, y)
+            dy = np.where(here, t[yield_key] / 100, dy)
+            conversion = np.where(here, v[cost_key], conversion)
+            dconversion = np.where(here, t[cost_key], dconversion)
+            scrap_key = stage_scrap_key(name)
+            stage_s, stage_ds = _given(v[scrap_key], s, ds, t[scrap_key])
+            sk, dsk = np.where(here, stage_s, sk), np.where(here, stage_ds, dsk)
+        ok = ok & (y > 0)
+        y = np.where(y > 0, y, 1.0)
+        out = (cost + conversion - (1 - y) * sk) / y
+        dcost = (dcost + dconversion - (1 - y) * dsk + (sk - out) * dy) / y
+        cost = out
+
+    # P3: Parts
+    g, dg = v['gross_weight_kg'], t['gross_weight_kg']
+    n, dn = _given(v['net_weight_kg'], g * v['parts_yield_pct'] / 100,
+                   (dg * v['parts_yield_pct'] + g * t['parts_yield_pct']) / 100, t['net_weight_kg'])
+    sp, dsp = _given(v['parts_scrap_rate'], s, ds, t['parts_scrap_rate'])
+    ok = ok & (n > 0)
+    n = np.where(n > 0, n, 1.0)
+    total = g * cost - (g - n) * sp + v['machining_cost']
+    dtotal = dg * cost + g * dcost - (dg - dn) * sp - (g - n) * dsp + t['machining_cost']
+    part = total / n
+    dpart = (dtotal - part * dn) / n
+
+    # Financials
+    hold = 1 + (v['interest_rate_pa'] / 100) * (v['holding_days'] / 365)
+    dhold = (t['interest_rate_pa'] * v['holding_days'] + v['interest_rate_pa'] * t['holding_days']) / 36500
+    mark = 1 + v['margin_pct'] / 100
+    dmark = t['margin_pct'] / 100
+
+    price = part * hold * mark
+    dprice = dpart * hold * mark + part * dhold * mark + part * hold * dmark
+    return np.where(ok, price, 0.0), np.where(ok, dprice, 0.0)
+
+
+def price_gradient(book=None, **overrides):
+    """
+    Selling price and its exact derivative with respect to every independent input.
+
+    Accepts the same part book / overrides as utils.batch.calculate_chain_batch,
+    including a 'route' column. Returns a DataFrame with 'selling_price' and one
+    'd_<input>' column per input (₹/kg per unit of that input: per ₹1 of metal, per
+    1 percentage point of yield, per day of cycle time, ...). Derived inputs that were
+    not given are omitted, as are stages on no row's route; a cell is NaN where the
+    row's route has no such stage or the derived input is blank (derived) in that row.
+    Routes that remelt their scrap raise ValueError.
+    """
+    plan = compiled_routes()
+    route = np.asarray(book['route'], dtype=object) if book is not None and 'route' in book else None
+    routes = plan.route_index(route)
+    if np.any(plan.return_pct[routes]) or np.any(plan.part_return_pct[routes]):
+        raise ValueError("Gradients cover the open chain only; a route remelts its scrap")
+
+    v = _merge(book, overrides)
+    on_route = {}                       # stage input -> rows whose route has the stage
+    for index, name in enumerate(plan.stages):
+        here = (plan.stage_index[routes] == index).any(axis=-1)
+        for key in stage_input_keys(name) + (stage_scrap_key(name),):
+            on_route[key] = here
+    wrt = [k for k in CHAIN_DEFAULTS if v[k] is not None and np.any(on_route.get(k, True))]
+    zero = {k: 0.0 for k in CHAIN_DEFAULTS}
+
+    columns = {}
+    for key in wrt:
+        _, d = _jvp(v, {**zero, key: 1.0}, plan, routes)
+        if key in on_route:
+            d = np.where(on_route[key], d, np.nan)
+        if key in DERIVED_INPUTS:
+            d = np.where(np.isnan(v[key]), np.nan, d)
+        columns[f'd_{key}'] = d
+    price = evaluate_routes(resolve_inputs(book, **overrides), route=route, plan=plan)['selling_price']
+
+    shape = np.broadcast_shapes(*(np.shape(c) for c in columns.values()), np.shape(price))
+    index = book.index if isinstance(book, pd.DataFrame) else None
+    frame = {'selling_price': np.atleast_1d(np.broadcast_to(price, shape))}
+    frame.update({k: np.atleast_1d(np.broadcast_to(c, shape)) for k, c in columns.items()})
+    return pd.DataFrame(frame, index=index)
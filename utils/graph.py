@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict
+from utils.calculations import CostCalculator
+from utils.timing import timed
+from utils.routes import DEFAULT_ROUTE, ROUTES
+
+_MISSING = object()
+
+
+class CostGraph:
+    """
+    Dependency graph of memoized costing nodes.
+
+    Each node declares the plain inputs it reads and the upstream nodes it depends on.
+    A node's cache key is its input values plus the keys of its upstream nodes, so a
+    node is recomputed only when something it depends on changed; otherwise the cached
+    result is reused. The cache is a bounded LRU and is safe to share between sessions.
+    Cached results are shared objects - callers must not mutate them.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.nodes = {}         # name -> (func, params, deps), in insertion (topological) order
+        self.max_entries = max_entries
+        self._cache = OrderedDict()     # key -> result, least recently used first
+        self._lock = threading.Lock()
+
+    def add(self, name, func, params=(), deps=()):
+        """ func(inp, up) receives {param: value} and {dep_name: dep_result} """
+        for dep in deps:
+            if dep not in self.nodes:
+                raise KeyError(f"Node '{name}' depends on unknown node '{dep}'")
+        self.nodes[name] = (func, tuple(params), tuple(deps))
+        return self
+
+    def evaluate(self, inputs):
+        """
+        Evaluates every node, recomputing only stale ones.
+        Returns ({node: result}, [names of nodes recomputed by this call]).
+        """
+        results, keys, recomputed = {}, {}, []
+        for name, (func, params, deps) in self.nodes.items():
+            inp = {p: inputs[p] for p in params}
+            key = (name, tuple(inp.values()), tuple(keys[d] for d in deps))
+            keys[name] = key
+            with self._lock:
+                result = self._cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    self._cache.move_to_end(key)
+            if result is _MISSING:
+                with timed(f'calc.{name}'):
+                    result = func(inp, {d: results[d] for d in deps})
+                recomputed.append(name)
+                with self._lock:
+                    self._cache[key] = result
+                    while len(self._cache) > self.max_entries:
+                        self._cache.popitem(last=False)
+            results[name] = result
+        return results, recomputed
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _financials(stage):
+    def func(inp, up):
+        return CostCalculator.calculate_financials(
+            base_cost=up[stage]['effective_cost_per_kg_finished' if stage == 'parts' else 'final_cost_per_kg'],
+            interest_rate_pa=inp['interest_rate'],
+            holding_days=inp['holding_period'],
+            margin_pct=inp['margin_pct']
+        )
+    return func
+
+
+def _stage(name, upstream):
+    return lambda inp, up: CostCalculator.calculate_sheet_cost(
+        ingot_cost_per_kg=up[upstream]['final_cost_per_kg'],
+        yield_pct=inp[f'{name}_yield'],
+        scrap_recovery_price=inp[f'{name}_scrap_rate'],
+        process_cost_per_kg=inp[f'{name}_process_cost']
+    )
+
+
+def build_dashboard_graph(max_entries=1024, route=DEFAULT_ROUTE):
+    """ The Executive Dashboard chain along `route`: ingot -> stages -> parts, each with its financials """
+    graph = CostGraph(max_entries)
+    graph.add('ingot', lambda inp, up: CostCalculator.calculate_alloy_ingot_cost(
+        element_prices=inp['element_prices'],
+        composition_pct=inp['composition'],
+        burning_loss_pct=inp['burn_loss'],
+        element_loss_pct=inp['element_loss'],
+        elec_cost=inp['rate_elec'],
+        labor_cost=inp['rate_labor'],
+        consumable_cost=inp['rate_cons'],
+        overhead_cost=inp['rate_admin']
+    ), params=('element_prices', 'composition', 'burn_loss', 'element_loss', 'rate_elec', 'rate_labor', 'rate_cons', 'rate_admin'))
+
+    # Yield stages (sheet, rod, strip, ...), each fed by the one before
+    upstream = 'ingot'
+    for stage in ROUTES[route]['stages']:
+        name = stage['name']
+        graph.add(name, _stage(name, upstream),
+                  params=(f'{name}_yield', f'{name}_scrap_rate', f'{name}_process_cost'), deps=(upstream,))
+        upstream = name
+
+    # Parts: default 1.0 kg gross input => cost per kg of finished output (effective rate)
+    def parts(inp, up):
+        net = inp['parts_net_kg']
+        if net is None:
+            net = inp['parts_gross_kg'] * (inp['parts_yield'] / 100.0)
+        return CostCalculator.calculate_part_cost(
+            sheet_cost_per_kg=up[upstream]['final_cost_per_kg'],
+            part_weight_kg=net,
+            gross_weight_kg=inp['parts_gross_kg'],
+            scrap_recovery_price=inp['parts_scrap_rate'],
+            machining_cost_per_part=inp['p3_machining_cost']
+        )
+    graph.add('parts', parts, params=('parts_gross_kg', 'parts_net_kg', 'parts_yield', 'parts_scrap_rate', 'p3_machining_cost'), deps=(upstream,))
+
+    fin_params = ('interest_rate', 'holding_period', 'margin_pct')
+    for node in list(graph.nodes):
+        graph.add(f'{node}_fin', _financials(node), params=fin_params, deps=(node,))
+    return graph
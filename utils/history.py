@@ -0,0 +1,281 @@
+import argparse
+import os
+import threading
+import numpy as np
+from utils.alloys import ELEMENTS
+from utils.batch import CHAIN_DEFAULTS, ELEMENT_INPUTS, resolve_inputs, evaluate_routes
+from utils.capacity import EXPENSE_RATES, FIXED_PCT_DEFAULTS, conversion_rates
+
+# Rate history: an append-only, columnar store of dated rates (metal prices, monthly
+# expenses, capacity). Every series is one raw float64 file and the timestamps one
+# int64 file (seconds, datetime64[s]), all in the same row order. Reads memory-map
+# the files; a date range is two binary searches on the timestamp column, so looking
+# up a year of daily rates does not depend on how much intraday history is stored.
+#
+# A record only needs the series it sets: blanks (NaN) keep the last recorded value
+# ("as of" semantics). The timestamp file is written last, so its length is the
+# committed row count; series files left longer by an interrupted append are trimmed
+# when the store is opened.
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'rate_history')
+TIME_FILE = 'timestamp.i8'
+SECONDS_PER_DAY = 86_400
+
+# Series: every element price (chain input names) plus the sidebar's monthly expenses,
+# capacity, planned volume and the fixed share of each expense (utils/capacity.py)
+HISTORY_SERIES = tuple(ELEMENT_INPUTS[e][0] for e in ELEMENTS) + (
+    'exp_power', 'exp_labor', 'exp_cons', 'exp_admin', 'capacity_kg',
+    'volume_kg', *(f'{expense}_fixed_pct' for expense in EXPENSE_RATES),
+)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_history():
+    """ The app's rate history at HISTORY_DIR (one per server process) """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateHistory(HISTORY_DIR)
+        return _shared
+
+
+def _seconds(when):
+    """ Anything datetime64 accepts (str, date, datetime, array) -> int64 seconds """
+    return np.asarray(when, dtype='datetime64[s]').astype(np.int64)
+
+
+def _ffill(values):
+    """ NaN replaced by the last non-NaN value before it (leading NaN stay) """
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+
+class RateHistory:
+    """
+    Append-only rate store in `path` (one file per series). Appends are serialized by
+    a lock; reads map the files and are re-mapped only after the store has grown.
+    """
+
+    def __init__(self, path=HISTORY_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapped = (-1, None, None)     # (rows, timestamps, {series: values})
+        self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, TIME_FILE if name is None else f'{name}.f8')
+
+    def __len__(self):
+        path = self._file(None)
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _repair(self):
+        """ Trims series written past the last committed row, pads series added since (NaN) """
+        rows = len(self)
+        for name in HISTORY_SERIES:
+            path = self._file(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size > rows * 8:
+                os.truncate(path, rows * 8)
+            elif size < rows * 8:
+                with open(path, 'ab') as f:
+                    f.write(np.full(rows - size // 8, np.nan, dtype='<f8').tobytes())
+
+    # --- Writing ---
+
+    def append(self, timestamp, **values):
+        """ One record; only the series given are set. Returns the row count. """
+        return self.append_many([timestamp], {k: [v] for k, v in values.items()})
+
+    def append_many(self, timestamps, columns):
+        """
+        Many records at once: `timestamps` in time order, `columns` {series: values}
+        (scalars broadcast, NaN / None = not recorded). Timestamps may not go back
+        before the last record. Returns the row count.
+        """
+        unknown = set(columns) - set(HISTORY_SERIES)
+        if unknown:
+            raise KeyError(f"Unknown rate series: {sorted(unknown)} (known: {', '.join(HISTORY_SERIES)})")
+        times = _seconds(timestamps).reshape(-1)
+        if not times.size:
+            return len(self)
+        with self._lock:
+            last = self.timestamps()[-1:].astype(np.int64)
+            if np.any(np.diff(times) < 0) or (last.size and times[0] < last[0]):
+                raise ValueError("Rate history is append-only: timestamps must not go back in time")
+            for name in HISTORY_SERIES:
+                value = columns.get(name)
+                value = np.nan if value is None else np.asarray(value, dtype=float)
+                with open(self._file(name), 'ab') as f:
+                    f.write(np.broadcast_to(value, times.shape).astype('<f8').tobytes())
+            with open(self._file(None), 'ab') as f:
+                f.write(times.astype('<i8').tobytes())
+            return len(self)
+
+    # --- Reading ---
+
+    def _columns(self):
+        rows = len(self)
+        if self._mapped[0] != rows:
+            if rows:
+                times = np.memmap(self._file(None), dtype='<i8', mode='r', shape=(rows,))
+                series = {name: np.memmap(self._file(name), dtype='<f8', mode='r', shape=(rows,)) for name in HISTORY_SERIES}
+            else:
+                times, series = np.zeros(0, dtype=np.int64), {name: np.zeros(0) for name in HISTORY_SERIES}
+            self._mapped = (rows, times, series)
+        return self._mapped[1], self._mapped[2]
+
+    def timestamps(self):
+        """ Every record time (datetime64[s], read-only map) """
+        return self._columns()[0].view('datetime64[s]')
+
+    def span(self):
+        """ (first, last) record time, or None when empty """
+        times = self.timestamps()
+        return (times[0], times[-1]) if len(times) else None
+
+    def window(self, start=None, end=None):
+        """ Raw records with start <= time <= end: (times, {series: values}), views on the files """
+        times, series = self._columns()
+        lo = 0 if start is None else np.searchsorted(times, _seconds(start), 'left')
+        hi = len(times) if end is None else np.searchsorted(times, _seconds(end), 'right')
+        return times[lo:hi].view('datetime64[s]'), {name: values[lo:hi] for name, values in series.items()}
+
+    def as_of(self, when, series=HISTORY_SERIES):
+        """
+        The value of each series in force at each time in `when` (the last recorded at
+        or before it); NaN before a series' first record. Returns {series: array}.
+        """
+        times, columns = self._columns()
+        query = _seconds(when)
+        if not len(times):
+            return {name: np.full(query.shape, np.nan) for name in series}
+        # Only the records up to the last query time are read, plus the value in force
+        # before the first query time
+        lo = np.searchsorted(times, query.min(), 'right')
+        hi = np.searchsorted(times, query.max(), 'right')
+        position = np.searchsorted(times[lo:hi], query, 'right')     # 0 => the value before `lo`
+        result = {}
+        for name in series:
+            values = columns[name]
+            seed = _last_valid(values, lo)
+            result[name] = _ffill(np.concatenate([[seed], values[lo:hi]]))[position]
+        return result
+
+    def daily(self, start, end, series=HISTORY_SERIES):
+        """ One value per day from `start` to `end` (inclusive): as of the end of the day. Returns (days, {series: array}) """
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        ends = (days + 1).astype('datetime64[s]') - np.timedelta64(1, 's')
+        return days, self.as_of(ends, series)
+
+
+def _last_valid(values, stop, block=4096):
+    """ Last non-NaN value in values[:stop] (NaN if none), scanning back block by block """
+    while stop > 0:
+        start = max(stop - block, 0)
+        chunk = np.asarray(values[start:stop])
+        valid = np.flatnonzero(~np.isnan(chunk))
+        if valid.size:
+            return chunk[valid[-1]]
+        stop, block = start, block * 4
+    return np.nan
+
+
+def history_chain_inputs(rates, fallback=None):
+    """
+    Chain inputs (element prices, conversion ₹/kg) from as-of rates. Where nothing was
+    recorded yet the value comes from `fallback` (CHAIN_DEFAULTS overrides) or the defaults.
+    """
+    fallback = {**CHAIN_DEFAULTS, **(fallback or {})}
+    inputs = {}
+    for e in ELEMENTS:
+        key = ELEMENT_INPUTS[e][0]
+        inputs[key] = np.where(np.isnan(rates[key]), fallback[key], rates[key])
+    # Conversion rates as in the sidebar; no planned volume recorded => at capacity
+    capacity = rates['capacity_kg']
+    volume = np.where(np.isnan(rates['volume_kg']), capacity, rates['volume_kg'])
+    fixed_pct = {}
+    for expense in EXPENSE_RATES:
+        recorded = rates[f'{expense}_fixed_pct']
+        fixed_pct[expense] = np.where(np.isnan(recorded), FIXED_PCT_DEFAULTS[expense], recorded)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        derived = conversion_rates({e: rates[e] for e in EXPENSE_RATES}, capacity, volume, fixed_pct)
+    for expense, key in EXPENSE_RATES.items():
+        rate = np.where((capacity > 0) & (volume > 0), derived[key], 0.0)
+        rate = np.where(np.isnan(rates[expense]) | np.isnan(capacity), np.nan, rate)
+        inputs[key] = np.where(np.isnan(rate), fallback[key], rate)
+    return inputs
+
+
+def recost_history(book=None, start=None, end=None, output='selling_price', route=None, store=None, **overrides):
+    """
+    Re-costs over every day from `start` to `end` with the rates then in force, in one
+    vectorized pass.
+
+    Without a book: the single part described by `overrides` (on `route`); returns a
+    DataFrame indexed by day with every output column. With a part book (as
+    calculate_chain_batch, optional sku / route columns): one `output` column per part.
+    Recorded rates win over `overrides`, which only fill days before the first record;
+    book columns win over both.
+    """
+    import pandas as pd
+    store = store or shared_history()
+    days, rates = store.daily(start, end)
+    recorded = history_chain_inputs(rates, overrides)
+    index = pd.DatetimeIndex(days, name='date')
+
+    if book is None:
+        result = evaluate_routes(resolve_inputs(None, **{**overrides, **recorded}), route=route)
+        return pd.DataFrame({k: np.broadcast_to(v, days.shape) for k, v in result.items()}, index=index)
+
+    # Days down, parts across
+    recorded = {k: v[:, None] for k, v in recorded.items()}
+    inputs = resolve_inputs(book, **{**overrides, **recorded})
+    if 'route' in book:
+        route = np.asarray(book['route'], dtype=object)
+    values = evaluate_routes(inputs, route=route)[output]
+    parts = book['sku'] if 'sku' in book else getattr(book, 'index', range(values.shape[-1]))
+    return pd.DataFrame(np.broadcast_to(values, (len(days), len(parts))), index=index, columns=list(parts))
+
+
+# --- Command line: import rates, re-cost a book ---
+
+def import_rates(path, store=None):
+    """ Appends a CSV / Parquet file with a timestamp (or date) column and any HISTORY_SERIES columns """
+    import pandas as pd
+    frame = pd.read_parquet(path) if path.endswith(('.parquet', '.pq')) else pd.read_csv(path)
+    time_column = 'timestamp' if 'timestamp' in frame else 'date'
+    frame = frame.sort_values(time_column, kind='stable')
+    store = store or shared_history()
+    columns = {k: frame[k].to_numpy(dtype=float) for k in HISTORY_SERIES if k in frame}
+    return store.append_many(pd.to_datetime(frame[time_column]).to_numpy(dtype='datetime64[s]'), columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rate history: import dated rates, re-cost a part book over a date range.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="Append a CSV/Parquet of rates (timestamp or date column + series columns)")
+    load.add_argument("input")
+    recost = commands.add_parser("recost", help="Selling price of every part in a book for each day of a range")
+    recost.add_argument("book", help="Part book (.csv)")
+    recost.add_argument("output", help="Daily prices (.csv), one column per part")
+    recost.add_argument("--start", required=True, help="First day (YYYY-MM-DD)")
+    recost.add_argument("--end", required=True, help="Last day (YYYY-MM-DD)")
+    recost.add_argument("--output-column", default='selling_price', help="Chain output to report (default selling_price)")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        rows = import_rates(args.input)
+        print(f"Rate history: {rows} records in {HISTORY_DIR}")
+        return 0
+
+    import pandas as pd
+    priced = recost_history(pd.read_csv(args.book), args.start, args.end, output=args.output_column)
+    priced.to_csv(args.output)
+    print(f"Re-costed {priced.shape[1]} parts over {priced.shape[0]} days -> {args.output}")
+    return 0
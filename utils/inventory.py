@@ -0,0 +1,349 @@
+import argparse
+import os
+import threading
+import numpy as np
+from utils.alloys import ELEMENTS
+
+# Metal inventory ledger: purchase lots (receipts, kg > 0 at a ₹/kg price) and
+# consumptions (issues, kg < 0) of each element and of bought scrap, valued FIFO or at
+# moving average so ingot costing can use book value instead of today's market price.
+#
+# Stored like the rate history (utils/history.py): append-only, one raw file per column
+# (timestamp, material code, signed kg, price), memory-mapped for reads; the timestamp
+# file is written last and its length is the committed row count.
+#
+# Valuation replays the whole ledger per material without a per-transaction loop:
+#   FIFO: the receipts form a queue along the cumulative-kg axis. With receipt prefix
+#         sums CR (kg) and CV (₹), the value of the first x kg ever received is
+#         F(x) = CV[j] - (CR[j] - x) price[j], j = the lot holding kg x (binary search);
+#         an issue that takes cumulative issued kg from a to b costs F(b) - F(a).
+#   Moving average: the average only changes at a receipt,
+#         avg = (kg on hand before x avg + kg x price) / kg on hand after,
+#         where kg on hand is a prefix sum, so only receipts are stepped through.
+
+INVENTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'inventory')
+MATERIALS = tuple(ELEMENTS) + ('Scrap',)
+METHODS = ('fifo', 'moving_average')
+COLUMNS = {'material': '<i2', 'kg': '<f8', 'price': '<f8'}
+TIME_FILE = 'timestamp.i8'
+TOLERANCE_KG = 1e-6
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_ledger():
+    """ The app's inventory ledger at INVENTORY_DIR (one per server process) """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = InventoryLedger(INVENTORY_DIR)
+        return _shared
+
+
+def material_codes(materials):
+    """ Material names -> int codes (MATERIALS order); raises KeyError for unknown names """
+    names = np.asarray(materials, dtype=object).astype(str)
+    unique, inverse = np.unique(names, return_inverse=True)
+    unknown = [u for u in unique if u not in MATERIALS]
+    if unknown:
+        raise KeyError(f"Unknown materials: {unknown} (known: {', '.join(MATERIALS)})")
+    return np.array([MATERIALS.index(u) for u in unique], dtype=np.int16)[inverse].reshape(names.shape)
+
+
+def value_fifo(kg, price):
+    """
+    FIFO valuation of one material's transactions in time order (kg signed, price per
+    receipt). Returns (issue cost ₹ per row, 0 for receipts; kg on hand; stock value ₹).
+    """
+    kg = np.asarray(kg, dtype=float)
+    received = np.where(kg > 0, kg, 0.0)
+    issued = np.where(kg < 0, -kg, 0.0)
+    lots = kg > 0
+    lot_kg, lot_price = kg[lots], np.asarray(price, dtype=float)[lots]
+    cum_kg = np.cumsum(lot_kg)
+    cum_value = np.cumsum(lot_kg * lot_price)
+
+    issued_to_date = np.cumsum(issued)
+    _check_stock(np.cumsum(received), issued_to_date)
+    if not lot_kg.size:
+        zeros = np.zeros_like(kg)
+        return zeros, zeros, zeros
+
+    def consumed_value(x):
+        """ F(x): value of the first x kg received """
+        j = np.minimum(np.searchsorted(cum_kg, x, 'left'), len(cum_kg) - 1)
+        return np.where(x > 0, cum_value[j] - (cum_kg[j] - x) * lot_price[j], 0.0)
+
+    value_out = consumed_value(issued_to_date)
+    issue_cost = np.diff(value_out, prepend=0.0)
+    on_hand = np.cumsum(kg)
+    stock_value = np.cumsum(received * np.where(lots, price, 0.0)) - value_out
+    return np.where(kg < 0, issue_cost, 0.0), on_hand, stock_value
+
+
+def value_moving_average(kg, price):
+    """ Moving-average valuation, same arguments and results as value_fifo """
+    kg = np.asarray(kg, dtype=float)
+    price = np.asarray(price, dtype=float)
+    on_hand = np.cumsum(kg)
+    _check_stock(np.cumsum(np.where(kg > 0, kg, 0.0)), np.cumsum(np.where(kg < 0, -kg, 0.0)))
+
+    receipts = np.flatnonzero(kg > 0)
+    averages = np.empty(len(receipts))
+    avg = 0.0
+    for n, (before, q, p) in enumerate(zip((on_hand[receipts] - kg[receipts]).tolist(), kg[receipts].tolist(), price[receipts].tolist())):
+        avg = p if before <= TOLERANCE_KG else (before * avg + q * p) / (before + q)
+        averages[n] = avg
+
+    # Average in force at each row: that of the last receipt at or before it
+    last = np.full(len(kg), -1)
+    last[receipts] = np.arange(len(receipts))
+    np.maximum.accumulate(last, out=last)
+    current = np.where(last >= 0, averages[np.maximum(last, 0)] if len(receipts) else 0.0, 0.0)
+    issue_cost = np.where(kg < 0, -kg * current, 0.0)
+    return issue_cost, on_hand, on_hand * current
+
+
+def _check_stock(received_to_date, issued_to_date):
+    short = np.flatnonzero(issued_to_date > received_to_date + TOLERANCE_KG)
+    if short.size:
+        raise ValueError(f"Issue at row {short[0]} takes more than is in stock "
+                         f"({issued_to_date[short[0]]:,.3f} kg issued, {received_to_date[short[0]]:,.3f} kg received)")
+
+
+_VALUERS = {'fifo': value_fifo, 'moving_average': value_moving_average}
+
+
+def value_ledger(materials, kg, price, method='fifo'):
+    """
+    Values a whole ledger (rows in time order, material codes) by `method`.
+    Returns (issue cost ₹, kg on hand, stock value ₹) per row, each for the row's material.
+    """
+    if method not in _VALUERS:
+        raise ValueError(f"Unknown valuation method '{method}' (known: {', '.join(METHODS)})")
+    materials = np.asarray(materials)
+    kg = np.asarray(kg, dtype=float)
+    price = np.asarray(price, dtype=float)
+    issue_cost, on_hand, stock_value = np.zeros(len(kg)), np.zeros(len(kg)), np.zeros(len(kg))
+    for code in np.unique(materials):
+        rows = np.flatnonzero(materials == code)
+        issue_cost[rows], on_hand[rows], stock_value[rows] = _VALUERS[method](kg[rows], price[rows])
+    return issue_cost, on_hand, stock_value
+
+
+class InventoryLedger:
+    """ Append-only transaction store in `path`; valuations are cached until the ledger grows """
+
+    def __init__(self, path=INVENTORY_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapped = (-1, None, None)     # (rows, timestamps, {column: values})
+        self._valued = {}                   # method -> (rows, issue cost, on hand, stock value)
+        self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, TIME_FILE if name is None else f'{name}.{COLUMNS[name][1:]}')
+
+    def __len__(self):
+        path = self._file(None)
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _repair(self):
+        """ Trims columns written past the last committed row """
+        rows = len(self)
+        for name, dtype in COLUMNS.items():
+            path = self._file(name)
+            size = np.dtype(dtype).itemsize * rows
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    # --- Writing ---
+
+    def receive(self, timestamp, material, kg, price):
+        """ A purchase lot of `kg` at `price` ₹/kg """
+        if kg <= 0:
+            raise ValueError("A receipt needs a positive quantity")
+        return self.append_many([timestamp], [material], [kg], [price])
+
+    def issue(self, timestamp, material, kg):
+        """ A consumption of `kg`, valued from the lots in stock """
+        if kg <= 0:
+            raise ValueError("An issue needs a positive quantity")
+        return self.append_many([timestamp], [material], [-kg])
+
+    def append_many(self, timestamps, materials, kg, prices=None):
+        """
+        Transactions in time order: `kg` > 0 receipts at `prices` (₹/kg), < 0 issues
+        (price ignored). Timestamps may not go back before the last transaction, and no
+        issue may take more than is in stock. Returns the row count.
+        """
+        times = np.asarray(timestamps, dtype='datetime64[s]').astype(np.int64).reshape(-1)
+        codes = material_codes(materials).reshape(-1)
+        kg = np.asarray(kg, dtype=float).reshape(-1)
+        prices = np.full(kg.shape, np.nan) if prices is None else np.asarray(prices, dtype=float).reshape(-1)
+        prices = np.where(kg > 0, prices, np.nan)
+        if np.any((kg > 0) & ~(prices >= 0)):
+            raise ValueError("Every receipt needs a price")
+        if not times.size:
+            return len(self)
+        with self._lock:
+            old_times, old = self._columns()
+            if np.any(np.diff(times) < 0) or (len(old_times) and times[0] < old_times[-1]):
+                raise ValueError("The ledger is append-only: timestamps must not go back in time")
+            for code in np.unique(codes):
+                balance = float(np.asarray(old['kg'])[np.asarray(old['material']) == code].sum())
+                if np.any(balance + np.cumsum(kg[codes == code]) < -TOLERANCE_KG):
+                    raise ValueError(f"Issues of {MATERIALS[code]} take more than is in stock")
+            for name, values in (('material', codes), ('kg', kg), ('price', prices)):
+                with open(self._file(name), 'ab') as f:
+                    f.write(values.astype(COLUMNS[name]).tobytes())
+            with open(self._file(None), 'ab') as f:
+                f.write(times.astype('<i8').tobytes())
+            return len(self)
+
+    # --- Reading ---
+
+    def _columns(self):
+        rows = len(self)
+        if self._mapped[0] != rows:
+            if rows:
+                times = np.memmap(self._file(None), dtype='<i8', mode='r', shape=(rows,))
+                columns = {name: np.memmap(self._file(name), dtype=dtype, mode='r', shape=(rows,)) for name, dtype in COLUMNS.items()}
+            else:
+                times, columns = np.zeros(0, dtype=np.int64), {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+            self._mapped = (rows, times, columns)
+        return self._mapped[1], self._mapped[2]
+
+    def transactions(self):
+        """ (timestamps datetime64[s], material codes, kg, price), read-only maps """
+        times, columns = self._columns()
+        return times.view('datetime64[s]'), columns['material'], columns['kg'], columns['price']
+
+    def valued(self, method='fifo'):
+        """ value_ledger over every transaction, cached until the ledger grows """
+        rows = len(self)
+        cached = self._valued.get(method)
+        if cached is None or cached[0] != rows:
+            _, materials, kg, price = self.transactions()
+            cached = (rows,) + value_ledger(materials, kg, price, method)
+            self._valued[method] = cached
+        return cached[1:]
+
+    def valuation(self, method='fifo', start=None, end=None):
+        """
+        Stock report per material for start <= time <= end (defaults: everything):
+        opening / closing kg and value, receipts, issues and their cost. Returns a DataFrame.
+        """
+        import pandas as pd
+        times, materials, kg, price = self.transactions()
+        issue_cost, on_hand, stock_value = self.valued(method)
+        lo = 0 if start is None else np.searchsorted(times, np.datetime64(start, 's'), 'left')
+        hi = len(times) if end is None else np.searchsorted(times, np.datetime64(end, 's'), 'right')
+        report = []
+        for code in np.unique(np.asarray(materials)):
+            rows = np.flatnonzero(np.asarray(materials) == code)
+            before, window = rows[rows < lo], rows[(rows >= lo) & (rows < hi)]
+            closing = np.concatenate([before, window])[-1:] if before.size or window.size else rows[:0]
+            w_kg = np.asarray(kg)[window]
+            issued_kg = -w_kg[w_kg < 0].sum()
+            issued_cost = issue_cost[window].sum()
+            report.append({
+                'material': MATERIALS[code],
+                'opening_kg': on_hand[before[-1]] if before.size else 0.0,
+                'opening_value': stock_value[before[-1]] if before.size else 0.0,
+                'received_kg': w_kg[w_kg > 0].sum(),
+                'received_value': (w_kg[w_kg > 0] * np.asarray(price)[window][w_kg > 0]).sum(),
+                'issued_kg': issued_kg,
+                'issued_cost': issued_cost,
+                'issue_cost_per_kg': issued_cost / issued_kg if issued_kg > 0 else np.nan,
+                'closing_kg': on_hand[closing[0]] if closing.size else 0.0,
+                'closing_value': stock_value[closing[0]] if closing.size else 0.0,
+            })
+        frame = pd.DataFrame(report, columns=['material', 'opening_kg', 'opening_value', 'received_kg', 'received_value',
+                                              'issued_kg', 'issued_cost', 'issue_cost_per_kg', 'closing_kg', 'closing_value'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['closing_cost_per_kg'] = np.where(frame['closing_kg'] > TOLERANCE_KG, frame['closing_value'] / frame['closing_kg'], np.nan)
+        return frame.set_index('material')
+
+    def book_prices(self, method='fifo', start=None, end=None):
+        """
+        Book value (₹/kg) of each material for costing: the cost of the lots consumed in
+        the period, or, with no consumption in it, of the stock on hand. Materials
+        without either are left out (they stay at the market price).
+        """
+        report = self.valuation(method, start, end)
+        book = report['issue_cost_per_kg'].fillna(report['closing_cost_per_kg']).dropna()
+        return {material: float(value) for material, value in book.items()}
+
+
+def book_prices_from_session(state):
+    """ Book prices for the sidebar's metal valuation (this month's consumption), or {} at market """
+    method = state.get('metal_valuation')
+    if method not in METHODS:
+        return {}
+    month = np.datetime64('today', 'M')
+    return shared_ledger().book_prices(method, start=month, end=np.datetime64('now', 's'))
+
+
+def example_ledger(transactions=1_000_000, seed=0, start='2025-01-01'):
+    """ A random year of receipts and issues (Cu, Zn, scrap), about one receipt per ten issues """
+    rng = np.random.default_rng(seed)
+    materials = rng.choice(['Cu', 'Zn', 'Scrap'], transactions, p=[0.6, 0.3, 0.1])
+    receipt = rng.random(transactions) < 0.1
+    kg = np.where(receipt, rng.uniform(2000.0, 10000.0, transactions), -rng.uniform(100.0, 900.0, transactions))
+    base = np.select([materials == 'Cu', materials == 'Zn'], [1000.0, 300.0], 550.0)
+    price = np.where(receipt, base * rng.uniform(0.9, 1.1, transactions), np.nan)
+    # Opening stock so early issues are covered
+    kg[:3], receipt[:3], materials[:3], price[:3] = 200_000.0, True, ['Cu', 'Zn', 'Scrap'], [1000.0, 300.0, 550.0]
+    times = np.datetime64(start, 's') + np.sort(rng.integers(0, 365 * 86_400, transactions))
+    return times, materials, kg, price
+
+
+# --- Command line: import transactions, stock report ---
+
+def import_ledger(path, ledger=None):
+    """
+    Appends a CSV / Parquet file with timestamp (or date), material, kg and price columns.
+    Issues are negative kg, or positive kg with a 'type' column of 'issue'. `path` may be
+    an uploaded file object.
+    """
+    import pandas as pd
+    name = str(getattr(path, 'name', path))
+    frame = pd.read_parquet(path) if name.endswith(('.parquet', '.pq')) else pd.read_csv(path)
+    time_column = 'timestamp' if 'timestamp' in frame else 'date'
+    frame = frame.sort_values(time_column, kind='stable')
+    kg = frame['kg'].to_numpy(dtype=float)
+    if 'type' in frame:
+        kg = np.where(frame['type'].astype(str).str.lower().str.startswith('issue'), -np.abs(kg), kg)
+    price = frame['price'].to_numpy(dtype=float) if 'price' in frame else None
+    ledger = ledger or shared_ledger()
+    return ledger.append_many(pd.to_datetime(frame[time_column]).to_numpy(dtype='datetime64[s]'), frame['material'], kg, price)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Metal inventory ledger: import transactions, FIFO / moving-average stock report.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="Append a CSV/Parquet of receipts and issues (timestamp, material, kg, price)")
+    load.add_argument("input")
+    report = commands.add_parser("report", help="Opening, receipts, issues and closing stock per material")
+    report.add_argument("--method", choices=METHODS, default='fifo')
+    report.add_argument("--start", help="First day (YYYY-MM-DD)")
+    report.add_argument("--end", help="Last moment (YYYY-MM-DD or YYYY-MM-DDTHH:MM)")
+    report.add_argument("--output", help="Write the report to this .csv instead of printing it")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        rows = import_ledger(args.input)
+        print(f"Inventory ledger: {rows} transactions in {INVENTORY_DIR}")
+        return 0
+
+    frame = shared_ledger().valuation(args.method, args.start, args.end)
+    if args.output:
+        frame.to_csv(args.output)
+        print(f"Stock report ({args.method}) for {len(frame)} materials -> {args.output}")
+    else:
+        print(frame.round(2).to_string())
+    return 0
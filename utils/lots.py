@@ -0,0 +1,138 @@
+import numpy as np
+from utils.batch import resolve_inputs, evaluate_routes
+from utils.calculations import CostCalculator
+from utils.routes import ROUTES, compiled_routes, route_from_session, stage_definitions
+
+# Lot-size costing. The chain's conversion and machining rates are run costs: they
+# scale with the kilos and pieces made. Furnace heat-up, coil / die changeover and tool
+# setup are paid once per production lot whatever its size, so a piece costs
+#   run cost per piece + (melt + route stage + part setups) / lot quantity
+# Interest and margin apply to the sum, as for the chain's base cost.
+#
+# A price-break table is every part at every quantity: parts run down one axis and
+# quantities across the other, so the whole sheet is one broadcast evaluation.
+
+# ₹ per lot. part_setup_cost None => the part stage's setup on the row's route.
+SETUP_DEFAULTS = {
+    'melt_setup_cost': 4000.0,      # Furnace heat-up
+    **{f'{name}_setup_cost': stage['setup_cost'] for name, stage in stage_definitions().items()},
+    'part_setup_cost': None,        # Tool / die setup
+}
+
+DEFAULT_BREAKS = (100, 200, 250, 500, 750, 1000, 1500, 2000, 2500, 5000,
+                  7500, 10_000, 15_000, 20_000, 25_000, 30_000, 40_000, 50_000, 75_000, 100_000)
+
+BREAK_COLUMNS = ('setup_cost_per_piece', 'run_cost_per_piece', 'cost_per_piece', 'cost_per_kg',
+                 'selling_price', 'selling_price_per_piece')
+
+
+def resolve_setup(book=None, route=None, **overrides):
+    """
+    Setup cost per lot (₹) of every stage for a part book, like utils.batch.resolve_inputs:
+    book columns win over overrides, overrides over SETUP_DEFAULTS, blank cells fall back
+    per row. Returns {setup input: scalar or array}.
+    """
+    unknown = set(overrides) - set(SETUP_DEFAULTS)
+    if unknown:
+        raise KeyError(f"Unknown setup inputs: {sorted(unknown)}")
+    plan = compiled_routes()
+    setup = {**SETUP_DEFAULTS, **overrides}
+    if setup['part_setup_cost'] is None:
+        setup['part_setup_cost'] = np.array([ROUTES[r]['part']['setup_cost'] for r in plan.routes])[plan.route_index(route)]
+    if book is not None:
+        for key in SETUP_DEFAULTS:
+            if key in book:
+                column = np.asarray(book[key], dtype=float)
+                setup[key] = np.where(np.isnan(column), setup[key], column)
+    return setup
+
+
+def setup_per_lot(setup, route=None):
+    """ ₹ of setup per lot: the melt, the stages on each row's route and the part stage """
+    plan = compiled_routes()
+    stage_index = plan.stage_index[plan.route_index(route)]
+    total = np.asarray(setup['melt_setup_cost'], dtype=float) + setup['part_setup_cost']
+    for s, name in enumerate(plan.stages):
+        on_route = (stage_index == s).any(axis=-1)
+        total = total + np.where(on_route, setup[f'{name}_setup_cost'], 0.0)
+    return total
+
+
+def evaluate_breaks(inputs, setup, quantities=DEFAULT_BREAKS, route=None):
+    """
+    Lot-size costing for resolved chain inputs and setups (resolve_setup) at every lot
+    quantity (pieces). Part axes come first, quantities last: a book of P parts gives
+    (P, Q) arrays. Returns {BREAK_COLUMNS: array}, costs per piece unless named per kg.
+    """
+    run = evaluate_routes(inputs, route=route)
+    lots = np.asarray(quantities, dtype=float)
+    net = np.asarray(inputs['net_weight_kg'], dtype=float)[..., None]
+    run_per_piece = run['part_cost_per_piece'][..., None]
+    setup_per_piece = np.asarray(setup_per_lot(setup, route))[..., None] / lots
+    cost_per_piece = run_per_piece + setup_per_piece
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost_per_kg = np.where(net > 0, cost_per_piece / net, 0.0)
+    fin = CostCalculator.calculate_financials_batch(
+        base_cost=cost_per_kg,
+        interest_rate_pa=np.asarray(inputs['interest_rate_pa'], dtype=float)[..., None],
+        holding_days=np.asarray(inputs['holding_days'], dtype=float)[..., None],
+        margin_pct=np.asarray(inputs['margin_pct'], dtype=float)[..., None]
+    )
+    columns = {
+        'setup_cost_per_piece': setup_per_piece,
+        'run_cost_per_piece': run_per_piece,
+        'cost_per_piece': cost_per_piece,
+        'cost_per_kg': cost_per_kg,
+        'selling_price': fin['selling_price'],
+        'selling_price_per_piece': fin['selling_price'] * net,
+    }
+    return dict(zip(columns, np.broadcast_arrays(*columns.values())))
+
+
+def price_breaks(book=None, quantities=DEFAULT_BREAKS, output='selling_price_per_piece', route=None, **overrides):
+    """
+    Price-break table in one vectorized pass.
+
+    Without a book: the single part described by `overrides` (on `route`); returns a
+    DataFrame indexed by lot quantity with every BREAK_COLUMNS column. With a part book
+    (as calculate_chain_batch, optional sku / route / setup columns): one row per part
+    and one `output` column per quantity. `overrides` may hold chain and setup inputs.
+    """
+    import pandas as pd
+    setup_overrides = {k: v for k, v in overrides.items() if k in SETUP_DEFAULTS}
+    chain_overrides = {k: v for k, v in overrides.items() if k not in SETUP_DEFAULTS}
+    if book is not None and route is None and 'route' in book:
+        route = np.asarray(book['route'], dtype=object)
+    inputs = resolve_inputs(book, **chain_overrides)
+    setup = resolve_setup(book, route, **setup_overrides)
+    result = evaluate_breaks(inputs, setup, quantities, route)
+    quantities = pd.Index(np.asarray(quantities, dtype=np.int64), name='quantity')
+
+    if book is None:
+        return pd.DataFrame({k: np.broadcast_to(v, (len(quantities),)) for k, v in result.items()}, index=quantities)
+    parts = book['sku'] if 'sku' in book else getattr(book, 'index', range(result[output].shape[0]))
+    values = np.broadcast_to(result[output], (len(parts), len(quantities)))
+    return pd.DataFrame(values, index=pd.Index(list(parts), name='sku' if 'sku' in book else None), columns=quantities)
+
+
+def setup_from_session(state, route=None):
+    """
+    Setup overrides set on the P3 page for `route` (default: the session's route), as
+    SETUP_DEFAULTS keys. They are kept per route (process_params['setup_costs']), so one
+    route's die setup never prices another route's parts.
+    """
+    overrides = state.get('process_params', {}).get('setup_costs', {}).get(route or route_from_session(state), {})
+    return {k: float(v) for k, v in overrides.items() if k in SETUP_DEFAULTS and v is not None}
+
+
+def setup_columns_from_session(state, route):
+    """
+    The P3 page's setup overrides for a mixed-route book (`route` per row, as
+    evaluate_routes): {setup input: column}, NaN where the row's route keeps its default.
+    Merge into the book so resolve_setup applies them row by row.
+    """
+    plan = compiled_routes()
+    per_route = [setup_from_session(state, name) for name in plan.routes]
+    index = plan.route_index(route)
+    keys = sorted({k for overrides in per_route for k in overrides})
+    return {k: np.array([overrides.get(k, np.nan) for overrides in per_route])[index] for k in keys}
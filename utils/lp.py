@@ -0,0 +1,128 @@
+import numpy as np
+
+# Dense two-phase simplex for many small linear programs at once (the charge-mix
+# optimizer solves one per heat). Every problem has the same shape but its own data;
+# each iteration pivots all unfinished problems together on one (H x rows x cols)
+# tableau. Bland's rule (lowest-index entering column and leaving row) rules out
+# cycling on the degenerate vertices that composition bands produce.
+#
+# Meant for tens of variables and constraints; not a general-purpose LP solver.
+
+OPTIMAL, INFEASIBLE, UNBOUNDED, ITERATION_LIMIT = 0, 1, 2, 3
+STATUS = ('optimal', 'infeasible', 'unbounded', 'iteration limit')
+TOL = 1e-9
+
+
+def _pivot(T, basis, heats, rows, cols):
+    pivot_rows = T[heats, rows, :] / T[heats, rows, cols][:, None]
+    T[heats] -= T[heats, :, cols][:, :, None] * pivot_rows[:, None, :]
+    T[heats, rows, :] = pivot_rows
+    basis[heats, rows] = cols
+
+
+def _simplex(T, basis, allowed, active, max_iter):
+    """ Minimizes the objective row of every active tableau in place; returns the status per problem """
+    status = np.full(T.shape[0], ITERATION_LIMIT)
+    active = active.copy()
+    for _ in range(max_iter):
+        heats = np.flatnonzero(active)
+        if not heats.size:
+            break
+        candidates = (T[heats, -1, :-1] < -TOL) & allowed
+        done = ~candidates.any(axis=1)
+        status[heats[done]] = OPTIMAL
+        active[heats[done]] = False
+        heats, candidates = heats[~done], candidates[~done]
+        if not heats.size:
+            break
+
+        cols = candidates.argmax(axis=1)
+        column, rhs = T[heats, :-1, cols], T[heats, :-1, -1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(column > TOL, rhs / column, np.inf)
+        best = ratio.min(axis=1)
+        unbounded = np.isinf(best)
+        status[heats[unbounded]] = UNBOUNDED
+        active[heats[unbounded]] = False
+
+        tied = ratio <= best[:, None] + TOL * (1 + np.abs(best[:, None]))
+        rows = np.where(tied, basis[heats], np.iinfo(basis.dtype).max).argmin(axis=1)
+        bounded = ~unbounded
+        _pivot(T, basis, heats[bounded], rows[bounded], cols[bounded])
+    return status
+
+
+def _batched(a, tail_ndim):
+    """ `a` with a leading batch axis (length 1 when shared by all problems) """
+    a = np.asarray(a, dtype=float)
+    return a.reshape((1,) + a.shape) if a.ndim == tail_ndim else a
+
+
+def linprog_batch(c, A_ub=None, b_ub=None, A_eq=None, b_eq=None, upper=None, max_iter=None):
+    """
+    Minimizes c @ x subject to A_ub @ x <= b_ub, A_eq @ x == b_eq and 0 <= x <= upper,
+    for a batch of problems. Each argument either has a leading batch axis
+    (c: (H, n), A_*: (H, rows, n), b_*: (H, rows), upper: (H, n)) or is shared by all
+    problems; `upper` may hold inf. Returns (x, objective, status) with x of shape
+    (H, n); x and objective are NaN where status is not OPTIMAL.
+    """
+    c = _batched(c, 1)
+    n = c.shape[-1]
+    blocks = []                                     # (A, b, has_slack)
+    if A_ub is not None:
+        blocks.append((_batched(A_ub, 2), _batched(b_ub, 1), True))
+    if upper is not None:
+        upper = _batched(upper, 1)
+        bounded = np.isfinite(upper).any(axis=0)
+        finite = np.where(np.isfinite(upper), upper, 0.0)[:, bounded]
+        rows = np.eye(n)[bounded][None] * np.isfinite(upper)[:, bounded][:, :, None]
+        blocks.append((rows, finite, True))
+    if A_eq is not None:
+        blocks.append((_batched(A_eq, 2), _batched(b_eq, 1), False))
+
+    H = np.broadcast_shapes(c.shape[:1], *(A.shape[:1] for A, _, _ in blocks), *(b.shape[:1] for _, b, _ in blocks))[0]
+    A = np.concatenate([np.broadcast_to(A, (H,) + A.shape[1:]) for A, _, _ in blocks], axis=1) if blocks else np.zeros((H, 0, n))
+    b = np.concatenate([np.broadcast_to(b, (H,) + b.shape[1:]) for _, b, _ in blocks], axis=1) if blocks else np.zeros((H, 0))
+    has_slack = np.concatenate([np.full(rhs.shape[1], s) for _, rhs, s in blocks]) if blocks else np.zeros(0, dtype=bool)
+    m, n_slack = b.shape[1], int(has_slack.sum())
+    N = n + n_slack + m
+
+    # Tableau: [A | slacks | artificials | b], objective in the last row; rows with b < 0 are negated
+    sign = np.where(b < 0, -1.0, 1.0)
+    T = np.zeros((H, m + 1, N + 1))
+    T[:, :m, :n] = A * sign[:, :, None]
+    T[:, :m, n:n + n_slack] = np.eye(m)[:, has_slack] * sign[:, :, None]
+    T[:, :m, n + n_slack:N] = np.eye(m)
+    T[:, :m, -1] = b * sign
+    basis = np.broadcast_to(np.arange(n + n_slack, N), (H, m)).copy()
+    max_iter = max_iter or 50 * (m + N)
+
+    # Phase 1: minimize the sum of artificials
+    T[:, -1, :n + n_slack] = -T[:, :m, :n + n_slack].sum(axis=1)
+    T[:, -1, -1] = -T[:, :m, -1].sum(axis=1)
+    everyone = np.ones(H, dtype=bool)
+    status = _simplex(T, basis, np.ones(N, dtype=bool), everyone, max_iter)
+    infeasible = -T[:, -1, -1] > TOL * (1 + np.abs(b).sum(axis=1))
+
+    # Pivot artificials left in the basis at zero level out, where the row allows it
+    for r in range(m):
+        heats = np.flatnonzero(basis[:, r] >= n + n_slack)
+        if heats.size:
+            nonzero = np.abs(T[heats, r, :n + n_slack]) > TOL
+            ok = nonzero.any(axis=1)
+            _pivot(T, basis, heats[ok], np.full(ok.sum(), r), nonzero[ok].argmax(axis=1))
+
+    # Phase 2: the real objective, artificials barred from re-entering
+    cost = np.zeros((H, N))
+    cost[:, :n] = c
+    cb = np.take_along_axis(cost, basis, axis=1)
+    T[:, -1, :-1] = cost - np.einsum('hr,hrj->hj', cb, T[:, :m, :-1])
+    T[:, -1, -1] = -np.einsum('hr,hr->h', cb, T[:, :m, -1])
+    feasible = ~infeasible & (status == OPTIMAL)
+    phase2 = _simplex(T, basis, np.arange(N) < n + n_slack, feasible, max_iter)
+    status = np.where(infeasible, INFEASIBLE, np.where(status == OPTIMAL, phase2, status))
+
+    x = np.zeros((H, N))
+    np.put_along_axis(x, basis, T[:, :m, -1], axis=1)
+    x = np.where((status == OPTIMAL)[:, None], np.maximum(x[:, :n], 0.0), np.nan)
+    return x, (c * x).sum(axis=1), status
@@ -0,0 +1,236 @@
+import numpy as np
+
+# Melt scheduling against a time-of-use power tariff. A heat takes kg / melt rate hours
+# on its furnace and draws kg x kWh/kg over that time; between heats an idle furnace
+# draws its holding power, and a change of alloy needs a changeover (wash heat,
+# cleaning) of at least CHANGEOVER_H before the next heat starts.
+#
+# Per furnace the heats are put in a sequence (by the window they must be melted in,
+# alloys grouped into campaigns so changeovers are as few as the windows allow), then
+# the start times are found by dynamic programming over time slots: for every heat and
+# slot, the cheapest way to have melted everything before it,
+#   best_i(s) = melt_i(s) + hold x P(s) + min over e <= s - gap_i of (best_(i-1) ending at e - hold x P(e))
+# where P is the cumulative tariff. The inner minimum is a running minimum, so each heat
+# costs one pass over the slots: exact timing for the sequence, a week of hundreds of
+# heats in well under a second, no external solver.
+#
+# The schedule is judged on its whole power cost (melting + holding). In the ingot cost
+# only the melting energy per kg replaces the variable part of the electricity bill
+# (app.py sidebar, "Use scheduled power cost"): holding power is already in the bill's
+# fixed share (utils/capacity.py), so it is not charged twice.
+
+SLOT_MINUTES = 15
+CHANGEOVER_H = 1.0
+
+# Induction furnaces: largest heat (kg), melt rate (kg/h), energy (kWh/kg melted), idle holding power (kW)
+DEFAULT_FURNACES = {
+    'F1': {'capacity_kg': 1000.0, 'melt_rate_kg_h': 500.0, 'kwh_per_kg': 0.55, 'holding_kw': 60.0},
+    'F2': {'capacity_kg': 1000.0, 'melt_rate_kg_h': 500.0, 'kwh_per_kg': 0.55, 'holding_kw': 60.0},
+    'F3': {'capacity_kg': 500.0, 'melt_rate_kg_h': 300.0, 'kwh_per_kg': 0.60, 'holding_kw': 35.0},
+    'F4': {'capacity_kg': 500.0, 'melt_rate_kg_h': 300.0, 'kwh_per_kg': 0.60, 'holding_kw': 35.0},
+}
+
+# ₹/kWh for each hour of the day (industrial time-of-day tariff): off-peak nights,
+# morning and evening peaks
+DEFAULT_TARIFF = (6.0,) * 6 + (9.0,) * 4 + (8.0,) * 8 + (10.0,) * 4 + (6.0,) * 2
+
+_NEVER = np.inf
+
+
+def tariff_slots(tariff, days, slot_minutes=SLOT_MINUTES):
+    """
+    ₹/kWh per slot over `days` days. `tariff` is 24 hourly rates (every day alike) or
+    24 x 7 (one row per day of the week, repeating).
+    """
+    hourly = np.asarray(tariff, dtype=float)
+    hourly = np.tile(hourly.reshape(-1), -(-days * 24 // hourly.size))[:days * 24]
+    if hourly.size != days * 24 or np.asarray(tariff).size % 24:
+        raise ValueError("The tariff needs 24 hourly rates (or 24 per day of the week)")
+    return np.repeat(hourly, 60 // slot_minutes)
+
+
+def _sequence(alloy, release, due):
+    """ Heat order on one furnace: by window, alloys of a window in campaigns that continue the last alloy """
+    order = []
+    last = None
+    windows = sorted(set(zip(release.tolist(), due.tolist())))
+    for window in windows:
+        heats = [i for i in range(len(alloy)) if (release[i], due[i]) == window]
+        alloys = sorted({alloy[i] for i in heats}, key=lambda a: (a != last, a))
+        for a in alloys:
+            order += [i for i in heats if alloy[i] == a]
+        last = alloys[-1]
+    return order
+
+
+def _schedule_furnace(duration, power_kw, gap, release, due, hold_kw, cum_price):
+    """
+    Cheapest start slot of each heat (in the given order) on one furnace, and its cost.
+    duration / gap / release / due in slots, cum_price: cumulative ₹ per kW over slots
+    (length T + 1). Returns (starts, cost); cost is inf when the heats do not fit.
+    """
+    T = len(cum_price) - 1
+    slots = np.arange(T + 1)
+    ends = None                                     # Cost of the heats so far, by end slot of the last one
+    pointers = []
+    for i in range(len(duration)):
+        d = duration[i]
+        best = np.full(T + 1, _NEVER)               # By start slot
+        starts = slots[:T - d + 1]
+        best[:T - d + 1] = power_kw[i] * (cum_price[starts + d] - cum_price[starts])
+        window = (slots < release[i]) | (slots + d > due[i])
+        best[window] = _NEVER
+        if ends is None:
+            pointer = np.zeros(T + 1, dtype=np.int64)
+        else:
+            # Idle between the previous end e and this start s costs hold x (P(s) - P(e))
+            before = ends - hold_kw * cum_price
+            running = np.minimum.accumulate(before)
+            arg = np.maximum.accumulate(np.where(before == running, slots, 0))
+            latest = slots - gap[i]
+            ok = latest >= 0
+            best = np.where(ok, best + hold_kw * cum_price + running[np.maximum(latest, 0)], _NEVER)
+            pointer = arg[np.maximum(latest, 0)]
+        pointers.append(pointer)
+        ends = np.full(T + 1, _NEVER)
+        ends[d:] = best[:T + 1 - d]
+
+    last_end = int(np.argmin(ends))
+    cost = ends[last_end]
+    if not np.isfinite(cost):
+        return None, _NEVER
+    starts = np.zeros(len(duration), dtype=np.int64)
+    end = last_end
+    for i in range(len(duration) - 1, -1, -1):
+        starts[i] = end - duration[i]
+        end = pointers[i][starts[i]]
+    return starts, cost
+
+
+def schedule_heats(heats, tariff=DEFAULT_TARIFF, furnaces=None, days=None, changeover_h=CHANGEOVER_H,
+                   slot_minutes=SLOT_MINUTES, start=None):
+    """
+    Schedules `heats` (DataFrame / dict of columns: furnace, alloy, kg, optional heat, day
+    = the day it must be melted in, release_h / due_h = hours from the start) on `furnaces`
+    ({name: DEFAULT_FURNACES fields}) to minimize power cost under `tariff` (tariff_slots).
+    Returns (schedule DataFrame in start order, summary dict); the summary's
+    'asap_cost' is the same sequence started back to back for comparison, and
+    'melt_cost_per_kg' the melting energy alone (no holding), for costing.
+    Raises ValueError for unknown furnaces, heats over capacity or heats that do not fit.
+    """
+    import pandas as pd
+    furnaces = furnaces or DEFAULT_FURNACES
+    heats = pd.DataFrame(heats).reset_index(drop=True)
+    if 'heat' not in heats:
+        heats['heat'] = [f"H{i + 1:03d}" for i in range(len(heats))]
+    unknown = sorted(set(heats['furnace']) - set(furnaces))
+    if unknown:
+        raise ValueError(f"Unknown furnaces: {unknown} (known: {', '.join(furnaces)})")
+    capacity = heats['furnace'].map(lambda f: furnaces[f]['capacity_kg'])
+    over = heats.loc[heats['kg'] > capacity, 'heat'].tolist()
+    if over:
+        raise ValueError(f"Heats over their furnace's capacity: {over}")
+
+    per_hour = 60 // slot_minutes
+    if days is None:
+        days = int(heats['day'].max()) + 1 if 'day' in heats and len(heats) else 1
+    T = days * 24 * per_hour
+    price = tariff_slots(tariff, days, slot_minutes)
+    cum_price = np.concatenate([[0.0], np.cumsum(price / per_hour)])     # ₹ per kW
+
+    release = np.zeros(len(heats), dtype=np.int64)
+    due = np.full(len(heats), T, dtype=np.int64)
+    if 'day' in heats:
+        release = heats['day'].to_numpy(dtype=np.int64) * 24 * per_hour
+        due = release + 24 * per_hour
+    if 'release_h' in heats:
+        release = np.maximum(release, np.ceil(heats['release_h'].fillna(0).to_numpy(dtype=float) * per_hour).astype(np.int64))
+    if 'due_h' in heats:
+        due = np.minimum(due, np.floor(heats['due_h'].fillna(days * 24).to_numpy(dtype=float) * per_hour).astype(np.int64))
+
+    rate = heats['furnace'].map(lambda f: furnaces[f]['melt_rate_kg_h']).to_numpy(dtype=float)
+    kwh = heats['kg'].to_numpy(dtype=float) * heats['furnace'].map(lambda f: furnaces[f]['kwh_per_kg']).to_numpy(dtype=float)
+    duration = np.maximum(np.ceil(heats['kg'].to_numpy(dtype=float) / rate * per_hour - 1e-9), 1).astype(np.int64)
+    power_kw = kwh / (duration / per_hour)
+    changeover = int(np.ceil(changeover_h * per_hour - 1e-9))
+
+    starts = np.zeros(len(heats), dtype=np.int64)
+    asap = np.zeros(len(heats), dtype=np.int64)
+    cost = asap_cost = holding = 0.0
+    changeovers = 0
+    alloy = heats['alloy'].astype(str).to_numpy()
+    for name, spec in furnaces.items():
+        index = np.flatnonzero(heats['furnace'].to_numpy() == name)
+        if not index.size:
+            continue
+        index = index[_sequence(alloy[index], release[index], due[index])]
+        gap = np.concatenate([[0], np.where(alloy[index][1:] != alloy[index][:-1], changeover, 0)])
+        changeovers += int((gap > 0).sum())
+        hold = spec['holding_kw']
+        s, furnace_cost = _schedule_furnace(duration[index], power_kw[index], gap, release[index], due[index], hold, cum_price)
+        if s is None:
+            raise ValueError(f"The heats on furnace {name} do not fit in their windows")
+        starts[index] = s
+
+        # Back to back from each heat's release, same sequence
+        t = 0
+        for k, i in enumerate(index):
+            t = max(t + gap[k], release[i])
+            asap[i] = t
+            t += duration[i]
+        if np.any(asap[index] + duration[index] > due[index]):
+            asap_cost = np.nan
+        melt = power_kw[index] * (cum_price[asap[index] + duration[index]] - cum_price[asap[index]])
+        idle = hold * (cum_price[asap[index][1:]] - cum_price[asap[index][:-1] + duration[index][:-1]])
+        asap_cost += melt.sum() + idle.sum()
+
+        ends = s + duration[index]
+        holding += hold * (cum_price[s[1:]] - cum_price[ends[:-1]]).sum()
+        cost += furnace_cost
+
+    origin = np.datetime64('today' if start is None else start, 'D').astype('datetime64[m]')   # Midnight of day 0
+    slot = np.timedelta64(slot_minutes, 'm')
+    melt_cost = power_kw * (cum_price[starts + duration] - cum_price[starts])
+    schedule = pd.DataFrame({
+        'heat': heats['heat'].to_numpy(),
+        'furnace': heats['furnace'].to_numpy(),
+        'alloy': alloy,
+        'kg': heats['kg'].to_numpy(dtype=float),
+        'start': origin + starts * slot,
+        'end': origin + (starts + duration) * slot,
+        'kwh': kwh,
+        'power_cost': melt_cost,
+        'cost_per_kg': melt_cost / heats['kg'].to_numpy(dtype=float),
+    }).sort_values(['start', 'furnace'], kind='stable').reset_index(drop=True)
+
+    kg = float(heats['kg'].sum())
+    summary = {
+        'kg': kg,
+        'kwh': float(kwh.sum()),
+        'power_cost': float(cost),
+        'holding_cost': float(holding),
+        'elec_cost_per_kg': float(cost / kg) if kg else 0.0,
+        'melt_cost_per_kg': float((cost - holding) / kg) if kg else 0.0,
+        'asap_cost': float(asap_cost),
+        'asap_cost_per_kg': float(asap_cost / kg) if kg else 0.0,
+        'changeovers': changeovers,
+        'days': days,
+    }
+    return schedule, summary
+
+
+def example_week(heats=210, days=7, seed=0, furnaces=None):
+    """ A random week of heats (three brass grades) for demos and benchmarks """
+    import pandas as pd
+    furnaces = furnaces or DEFAULT_FURNACES
+    rng = np.random.default_rng(seed)
+    names = list(furnaces)
+    furnace = np.array(names)[np.arange(heats) % len(names)]       # Spread evenly over the furnaces
+    capacity = np.array([furnaces[f]['capacity_kg'] for f in furnace])
+    return pd.DataFrame({
+        'heat': [f"H{i + 1:03d}" for i in range(heats)],
+        'day': np.arange(heats) * days // heats,
+        'furnace': furnace,
+        'alloy': rng.choice(['CW614N', 'CW617N', 'CW508L'], heats, p=[0.5, 0.3, 0.2]),
+        'kg': np.round(capacity * rng.uniform(0.6, 1.0, heats), -1),
+    }).sort_values(['day', 'heat'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,123 @@
+import threading
+from utils.graph import build_dashboard_graph
+from utils.alloys import ELEMENTS, DEFAULT_ELEMENT_PRICES, Alloy, alloy_from_session, element_prices_from_session, element_loss_from_session
+from utils.routes import DEFAULT_ROUTE, stage_definitions, stage_params
+
+# One shared, memoized evaluation of the Ingot -> Sheet -> Parts -> Financials chain
+# (or another process route, utils/routes.py). The Executive Dashboard and every
+# process view read their costs from here, so a given set of inputs is computed once
+# per server process (across all sessions) and page navigation costs no
+# recomputation. Least recently used entries are evicted.
+
+PIPELINE_CACHE_ENTRIES = 4096
+
+PIPELINE_DEFAULTS = {
+    # Alloy: one value per utils.alloys.ELEMENTS entry (tuples, so they key the cache)
+    'element_prices': tuple(DEFAULT_ELEMENT_PRICES[e] for e in ELEMENTS),
+    'composition': Alloy.cu_zn(100.0).composition_pct(),
+    'element_loss': None,       # None => burn_loss on the whole charge
+    'burn_loss': 2.0,
+    'rate_elec': 8.0,
+    'rate_labor': 3.0,
+    'rate_cons': 2.0,
+    'rate_admin': 2.0,
+    'sheet_yield': 98.0,
+    'sheet_process_cost': 12.0,
+    'sheet_scrap_rate': None,   # None => auto scrap rate
+    'parts_gross_kg': 1.0,
+    'parts_net_kg': None,       # None => gross x parts_yield
+    'parts_yield': 70.0,
+    'parts_scrap_rate': None,   # None => auto scrap rate
+    'p3_machining_cost': 5.0,
+    'interest_rate': 12.0,
+    'holding_period': 45.0,
+    'margin_pct': 10.0,
+}
+
+# Yield stages of the other routes: '<name>_yield' / '_process_cost' / '_scrap_rate'
+for _name, _stage in stage_definitions().items():
+    PIPELINE_DEFAULTS.setdefault(f'{_name}_yield', _stage['yield_pct'])
+    PIPELINE_DEFAULTS.setdefault(f'{_name}_process_cost', _stage['process_cost'])
+    PIPELINE_DEFAULTS.setdefault(f'{_name}_scrap_rate', None)      # None => auto scrap rate
+
+_GRAPHS = {DEFAULT_ROUTE: build_dashboard_graph(max_entries=PIPELINE_CACHE_ENTRIES)}
+_graphs_lock = threading.Lock()
+
+
+def _graph(route):
+    """ The route's graph, built on first use """
+    with _graphs_lock:
+        if route not in _GRAPHS:
+            _GRAPHS[route] = build_dashboard_graph(max_entries=PIPELINE_CACHE_ENTRIES, route=route)
+        return _GRAPHS[route]
+
+
+def auto_scrap_rate(element_prices, composition, scrap_factor):
+    """ Scrap value of the current alloy mix (metal value x recovery factor) """
+    metal_value = 0.0
+    for price, pct in zip(element_prices, composition):
+        metal_value += price * pct / 100
+    return metal_value * scrap_factor
+
+
+def pipeline_inputs_from_session(state, **overrides):
+    """
+    Pipeline inputs for the current session (sidebar rates, process_params, financial
+    targets). Page-local widget values are passed as `overrides`. Scrap rates set on the
+    P2 / P3 pages (p2_ / p3_scrap_rate) apply to the sheet / part stage on every page.
+    """
+    params = state.get('process_params', {})
+    derived = state.get('derived_rates', {})
+    fin = state.get('financial_targets', {})
+
+    prices = element_prices_from_session(state)
+    element_loss = element_loss_from_session(state)
+
+    inputs = dict(PIPELINE_DEFAULTS)
+    inputs.update({
+        'element_prices': tuple(prices[e] for e in ELEMENTS),
+        'composition': alloy_from_session(state).composition_pct(),
+        'element_loss': None if element_loss is None else tuple(float(element_loss[e]) for e in ELEMENTS),
+        'burn_loss': float(params.get('burning_loss', inputs['burn_loss'])),
+        'rate_elec': float(derived.get('elec', inputs['rate_elec'])),
+        'rate_labor': float(derived.get('labor', inputs['rate_labor'])),
+        'rate_cons': float(derived.get('cons', inputs['rate_cons'])),
+        'rate_admin': float(derived.get('overhead', inputs['rate_admin'])),
+        'parts_yield': float(params.get('p3_yield_pct', inputs['parts_yield'])),
+        'p3_machining_cost': float(params.get('machining_cost', inputs['p3_machining_cost'])),
+        'interest_rate': float(fin.get('interest_rate_pa', inputs['interest_rate'])),
+        'holding_period': float(fin.get('holding_days', inputs['holding_period'])),
+        'margin_pct': float(fin.get('margin_pct', inputs['margin_pct'])),
+    })
+    for key, param in (('sheet_scrap_rate', 'p2_scrap_rate'), ('parts_scrap_rate', 'p3_scrap_rate')):
+        if params.get(param) is not None:
+            inputs[key] = float(params[param])
+    for name, stage in stage_definitions().items():
+        yield_param, cost_param = stage_params(stage)
+        inputs[f'{name}_yield'] = float(params.get(yield_param, inputs[f'{name}_yield']))
+        inputs[f'{name}_process_cost'] = float(params.get(cost_param, inputs[f'{name}_process_cost']))
+    unknown = set(overrides) - set(PIPELINE_DEFAULTS)
+    if unknown:
+        raise KeyError(f"Unknown pipeline inputs: {sorted(unknown)}")
+    inputs.update(overrides)
+
+    # Scrap at market prices even when the raw material is at book value
+    market = element_prices_from_session(state, book=False)
+    auto = auto_scrap_rate(tuple(market[e] for e in ELEMENTS), inputs['composition'], float(state.get('scrap_factor', 1.0)))
+    for key in [f'{name}_scrap_rate' for name in stage_definitions()] + ['parts_scrap_rate']:
+        if inputs[key] is None:
+            inputs[key] = auto
+    return inputs
+
+
+def evaluate_pipeline(inputs, route=DEFAULT_ROUTE):
+    """
+    Stage results for `inputs` along `route` ({'ingot', 'sheet', 'parts', 'ingot_fin',
+    'sheet_fin', 'parts_fin'} on the default route) and the list of stages that had to
+    be recomputed. Results are shared between sessions: read them, never mutate them.
+    """
+    return _graph(route).evaluate(inputs)
+
+
+def pipeline_stage_names(route=DEFAULT_ROUTE):
+    return list(_graph(route).nodes)
@@ -0,0 +1,69 @@
+import numpy as np
+from utils.batch import resolve_inputs, chain_inputs_from_session, evaluate_routes
+from utils.routes import ROUTES, compiled_routes, route_from_session
+
+# Closed-loop scrap: P2 trim and P3 swarf go back into the P1 melt instead of being
+# sold at the scrap rate. The returned scrap carries the cost it has built up (sheet
+# or part cost per kg, the same as the good output of its stage), so the ingot cost
+# depends on the sheet and part costs, which depend on the ingot cost.
+#
+# Mass balance per kg of finished parts (y2 = sheet yield, y3 = net / gross,
+# r2 / r3 = share of P2 / P3 scrap returned):
+#   sheet S = 1 / y3,  ingot I = S / y2,  charge C = I / (1 - loss)
+#   returned R2 = r2 (1 - y2) I,  R3 = r3 (1 - y3) S,  virgin metal V = C - R2 - R3
+# Stage costs c1 (ingot), c2 (sheet), c3 (part) are the steady state of
+#   I c1            = V metal + C conversion + R2 c2 + R3 c3
+#   (S + R2) c2     = I c1 + I rolling - (1 - r2) (1 - y2) I scrap_rate
+#   (1 + R3) c3     = S c2 + S machining / gross - (1 - r3) (1 - y3) S scrap_rate
+# solved directly as one linear system per scenario (batched), not by re-running the
+# chain until it settles. With nothing returned it is the open chain. Other process
+# routes (utils/routes.py) get one equation per stage; every stage between the melt
+# and the part stage counts as P2 (utils.batch.evaluate_routes does the solve).
+
+RETURN_DEFAULTS = {
+    'p2_return_pct': 100.0,     # Share of P2 (rolling / drawing) scrap remelted
+    'p3_return_pct': 100.0,     # Share of P3 (machining / stamping) scrap remelted
+}
+
+
+def evaluate_recirculation(inputs, p2_return_pct=100.0, p3_return_pct=100.0, route=None):
+    """
+    Steady-state mass balance (kg per kg finished) and stage costs (₹/kg) for resolved
+    chain inputs (utils.batch.resolve_inputs) on `route` (a name or one per row).
+    Returns a flat dict of broadcast arrays (utils.batch.evaluate_routes columns).
+    """
+    return_pct = {name: p2_return_pct for name in compiled_routes().stages}
+    return_pct['parts'] = p3_return_pct
+    return evaluate_routes(inputs, route=route, return_pct=return_pct)
+
+
+def calculate_recirculation_batch(book=None, p2_return_pct=100.0, p3_return_pct=100.0, **overrides):
+    """
+    evaluate_recirculation for a part book / scenario grid (as calculate_chain_batch).
+    The book may carry p2_return_pct / p3_return_pct / route columns. Returns a DataFrame.
+    """
+    import pandas as pd
+    route = None
+    if book is not None:
+        p2_return_pct = book['p2_return_pct'] if 'p2_return_pct' in book else p2_return_pct
+        p3_return_pct = book['p3_return_pct'] if 'p3_return_pct' in book else p3_return_pct
+        route = np.asarray(book['route'], dtype=object) if 'route' in book else None
+    result = evaluate_recirculation(resolve_inputs(book, **overrides), p2_return_pct, p3_return_pct, route)
+    index = book.index if isinstance(book, pd.DataFrame) else None
+    return pd.DataFrame({k: np.atleast_1d(v) for k, v in result.items()}, index=index)
+
+
+def recirculation_from_session(state):
+    """
+    Closed- and open-loop results for the dashboard inputs on the selected route:
+    (closed, open) dicts of floats, without the stages the route does not pass.
+    """
+    params = state.get('process_params', {})
+    route = route_from_session(state)
+    inputs = resolve_inputs(None, **chain_inputs_from_session(state))
+    returns = {k: params.get(k, v) for k, v in RETURN_DEFAULTS.items()}
+    skip = {f"{name}_{column}" for name in compiled_routes().stages for column in ('cost_per_kg', 'kg')}
+    skip -= {f"{s['name']}_{column}" for s in ROUTES[route]['stages'] for column in ('cost_per_kg', 'kg')}
+    closed = evaluate_recirculation(inputs, route=route, **returns)
+    open_loop = evaluate_recirculation(inputs, 0.0, 0.0, route=route)
+    return tuple({k: float(v) for k, v in result.items() if k not in skip} for result in (closed, open_loop))
@@ -0,0 +1,156 @@
+import numpy as np
+from utils.batch import CHAIN_DEFAULTS, ELEMENT_INPUTS, resolve_inputs, evaluate_chain
+from utils.routes import stage_definitions, stage_input_keys
+
+# Reverse costing: the value of one chain input at which an output (by default the
+# selling price) hits a target - e.g. the highest Cu rate or the lowest sheet yield
+# at which a customer's fixed price still carries our margin.
+#
+# The chain is affine in the prices, conversion costs, margin and financing inputs:
+# for those, two evaluations give the line and the root is exact. Losses, yields and
+# weights enter as divisors; those are solved by bracketed root-finding (Illinois
+# false position) inside SOLVE_BOUNDS. Both paths run on whole part books at once.
+# A solved element share must leave a real alloy: no share (the zinc balance
+# included) below 0% and all shares together at most 100%.
+
+# Inputs the chain output is affine in (holding everything else fixed)
+LINEAR_INPUTS = (
+    'cu_price', 'zn_price', 'cu_pct', 'zn_pct',
+    'elec_cost', 'labor_cost', 'consumable_cost', 'overhead_cost',
+    'sheet_process_cost', 'scrap_factor', 'scrap_rate', 'machining_cost',
+    'interest_rate_pa', 'holding_days', 'margin_pct',
+) + tuple(key for keys in list(ELEMENT_INPUTS.values())[2:] for key in keys)
+
+# Search ranges for the non-linear inputs and valid ranges for the linear ones.
+# Inputs not listed here cannot go negative (prices, costs, days).
+SOLVE_BOUNDS = {
+    'burning_loss_pct': (0.0, 99.0),
+    **{stage_input_keys(name)[0]: (1.0, 100.0) for name in stage_definitions()},
+    'parts_yield_pct': (1.0, 100.0),
+    'gross_weight_kg': (1e-6, 1e3),
+    'net_weight_kg': (1e-6, 1e3),
+    'cu_pct': (0.0, 100.0),
+    'zn_pct': (0.0, 100.0),
+    'margin_pct': (-100.0, np.inf),
+    **{pct_key: (0.0, 100.0) for _, pct_key in ELEMENT_INPUTS.values()},
+}
+
+SHARE_INPUTS = tuple(pct_key for _, pct_key in ELEMENT_INPUTS.values())
+SHARE_TOLERANCE = 1e-9
+
+MAX_ITER = 100
+
+
+def _without(book, key):
+    """ The book minus its column for `key` (the solved input replaces it) """
+    if book is not None and key in book:
+        return book.drop(columns=[key]) if hasattr(book, 'drop') else {k: v for k, v in book.items() if k != key}
+    return book
+
+
+def _valid_composition(key, x, book, overrides):
+    """ Rows where share `key` = x keeps every share (zinc balance too) >= 0% and the total <= 100% """
+    inputs = resolve_inputs(_without(book, key), **{**overrides, key: x})
+    shares = [np.asarray(inputs[k], dtype=float) for k in SHARE_INPUTS]
+    ok = sum(shares) <= 100.0 + SHARE_TOLERANCE
+    for share in shares:
+        ok = ok & (share >= -SHARE_TOLERANCE)
+    return ok
+
+
+def _output_fn(key, output, book, overrides):
+    """ f(x): `output` with input `key` set to x (broadcast against the book) """
+    book = _without(book, key)
+
+    def f(x):
+        return evaluate_chain(resolve_inputs(book, **{**overrides, key: x}))[output]
+    return f
+
+
+def _solve_linear(f, target):
+    f0, f1 = f(0.0), f(1.0)
+    slope = f1 - f0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(slope != 0, (target - f0) / slope, np.nan)
+
+
+def _solve_bracketed(f, target, lo, hi, tol):
+    """ Illinois false position on [lo, hi] per row; NaN where the bracket holds no root """
+    fa, fb = f(lo) - target, f(hi) - target
+    shape = np.broadcast_shapes(np.shape(fa), np.shape(fb))
+    a, b = np.full(shape, lo, dtype=float), np.full(shape, hi, dtype=float)
+    fa, fb, target = np.broadcast_to(fa, shape), np.broadcast_to(fb, shape), np.broadcast_to(target, shape)
+    x = np.where(fa == 0, a, np.where(fb == 0, b, np.nan))
+    active = np.isnan(x) & (np.sign(fa) != np.sign(fb))
+    side = np.zeros(shape, dtype=int)
+    ftol = tol * np.maximum(1.0, np.abs(target))
+
+    for _ in range(MAX_ITER):
+        if not active.any():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = np.where(active, (a * fb - b * fa) / (fb - fa), a)
+        fc = f(c) - target
+
+        done = active & ((np.abs(fc) <= ftol) | (np.abs(b - a) <= tol * np.maximum(1.0, np.abs(c))))
+        x = np.where(done, c, x)
+        active &= ~done
+
+        # Root in [a, c]: move b; root in [c, b]: move a. Halving the stale end's
+        # value when the same end moves twice keeps convergence superlinear.
+        move_b = active & (np.sign(fc) == np.sign(fb))
+        move_a = active & ~move_b
+        fa = np.where(move_b & (side == -1), fa / 2, fa)
+        fb = np.where(move_a & (side == 1), fb / 2, fb)
+        b, fb = np.where(move_b, c, b), np.where(move_b, fc, fb)
+        a, fa = np.where(move_a, c, a), np.where(move_a, fc, fa)
+        side = np.where(move_b, -1, np.where(move_a, 1, side))
+
+    return x
+
+
+def solve_input(key, target, output='selling_price', book=None, bounds=None, tol=1e-10, **overrides):
+    """
+    Value of chain input `key` at which `output` equals `target`, per row.
+
+    `target` is a scalar or one value per part; `book` / `overrides` are as for
+    utils.batch.calculate_chain_batch (a book column for `key` is ignored).
+    Returns an array; NaN where no value in `bounds` (default SOLVE_BOUNDS, or
+    [0, inf)) reaches the target, and for element shares where the solution is no
+    valid composition (a negative zinc balance, or shares over 100% in total).
+    """
+    if key not in CHAIN_DEFAULTS:
+        raise KeyError(f"Unknown chain input: {key}")
+    f = _output_fn(key, output, book, overrides)
+    target = np.asarray(target, dtype=float)
+    lo, hi = bounds or SOLVE_BOUNDS.get(key, (0.0, np.inf))
+
+    if key in LINEAR_INPUTS:
+        x = _solve_linear(f, target)
+        x = np.where((x >= lo) & (x <= hi), x, np.nan)
+    else:
+        x = _solve_bracketed(f, target, lo, hi, tol)
+    if key in SHARE_INPUTS:
+        x = np.where(_valid_composition(key, x, book, overrides), x, np.nan)
+    return np.atleast_1d(x)
+
+
+def reverse_quote(key, target, output='selling_price', book=None, **overrides):
+    """
+    solve_input as a DataFrame: the solved input, its current value, the headroom
+    (solved - current) and the output re-evaluated at the solved value.
+    """
+    import pandas as pd
+    solved = solve_input(key, target, output=output, book=book, **overrides)
+    current = np.broadcast_to(np.asarray(resolve_inputs(book, **overrides)[key], dtype=float), solved.shape)
+    check = np.full(solved.shape, np.nan)
+    ok = ~np.isnan(solved)
+    if ok.any():
+        check[ok] = np.broadcast_to(_output_fn(key, output, book, overrides)(np.where(ok, solved, current)), solved.shape)[ok]
+    index = book.index if isinstance(book, pd.DataFrame) else None
+    return pd.DataFrame({
+        f'solved_{key}': solved,
+        f'current_{key}': current,
+        'headroom': solved - current,
+        f'{output}_at_solved': check,
+    }, index=index)
@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.batch import CHAIN_DEFAULTS, resolve_inputs, evaluate_chain
+
+# Monte Carlo price-risk: simulates Cu/Zn prices at the end of the holding period
+# (correlated geometric Brownian motion) plus burning-loss and yield variability,
+# and prices every draw through the vectorized costing chain.
+
+# Draws are generated in fixed-size chunks, each with its own child seed, so results
+# depend only on (seed, n_draws) - not on how many worker processes were used.
+CHUNK_DRAWS = 250_000
+
+RISK_DEFAULTS = {
+    'cu_vol_pa': 20.0,          # Annualised volatility (%)
+    'zn_vol_pa': 25.0,
+    'cu_drift_pa': 0.0,         # Annualised drift (%)
+    'zn_drift_pa': 0.0,
+    'cu_zn_corr': 0.6,
+    'burning_loss_sd': 0.3,     # Absolute std dev (percentage points)
+    'sheet_yield_sd': 1.5,
+    'parts_yield_sd': 2.0,
+}
+
+PERCENTILES = (5, 50, 95)
+
+
+def _simulate_chunk(base, risk, n, seed):
+    """ Prices `n` random scenarios. Top-level so it can run in a worker process. """
+    rng = np.random.default_rng(seed)
+    t = float(base['holding_days']) / 365.0
+
+    # Correlated normals for Cu and Zn
+    z1 = rng.standard_normal(n)
+    z2 = risk['cu_zn_corr'] * z1 + np.sqrt(1 - risk['cu_zn_corr'] ** 2) * rng.standard_normal(n)
+
+    def gbm(spot, drift_pct, vol_pct, z):
+        mu, sigma = drift_pct / 100, vol_pct / 100
+        return spot * np.exp((mu - 0.5 * sigma ** 2) * t + sigma * np.sqrt(t) * z)
+
+    draws = dict(base)
+    draws['cu_price'] = gbm(base['cu_price'], risk['cu_drift_pa'], risk['cu_vol_pa'], z1)
+    draws['zn_price'] = gbm(base['zn_price'], risk['zn_drift_pa'], risk['zn_vol_pa'], z2)
+    draws['burning_loss_pct'] = np.clip(base['burning_loss_pct'] + risk['burning_loss_sd'] * rng.standard_normal(n), 0.0, 99.0)
+    draws['sheet_yield_pct'] = np.clip(base['sheet_yield_pct'] + risk['sheet_yield_sd'] * rng.standard_normal(n), 1.0, 100.0)
+    draws['parts_yield_pct'] = np.clip(base['parts_yield_pct'] + risk['parts_yield_sd'] * rng.standard_normal(n), 1.0, 100.0)
+
+    result = evaluate_chain(resolve_inputs(**draws))
+    return result['selling_price'], result['total_cost']
+
+
+def run_simulation(n_draws=1_000_000, seed=42, workers=None, risk=None, **chain_inputs):
+    """
+    Runs `n_draws` scenarios split across `workers` processes (default: all CPUs,
+    1 = in-process). `chain_inputs` are scalar CHAIN_DEFAULTS overrides (today's rates).
+
+    Returns percentiles of the selling price, plus margin-at-risk: how much of the
+    quoted profit (quote fixed at today's point estimate) is lost in the P5 scenario.
+    """
+    risk = {**RISK_DEFAULTS, **(risk or {})}
+    unknown = set(risk) - set(RISK_DEFAULTS)
+    if unknown:
+        raise KeyError(f"Unknown risk inputs: {sorted(unknown)}")
+
+    # Derived inputs (scrap rate, net weight) are left unresolved so they follow each draw
+    point = evaluate_chain(resolve_inputs(**chain_inputs))
+    base = {**CHAIN_DEFAULTS, **chain_inputs}
+
+    sizes = [CHUNK_DRAWS] * (n_draws // CHUNK_DRAWS)
+    if n_draws % CHUNK_DRAWS:
+        sizes.append(n_draws % CHUNK_DRAWS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = min(workers or os.cpu_count() or 1, len(sizes))
+    if workers <= 1:
+        chunks = [_simulate_chunk(base, risk, n, s) for n, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_simulate_chunk, [base] * len(sizes), [risk] * len(sizes), sizes, seeds))
+
+    selling_price = np.concatenate([c[0] for c in chunks])
+    total_cost = np.concatenate([c[1] for c in chunks])
+
+    quote = float(point['selling_price'])
+    quoted_margin = quote - float(point['total_cost'])
+    realized_margin = quote - total_cost
+    p5_margin = float(np.percentile(realized_margin, 5))
+
+    return {
+        'n_draws': n_draws,
+        'point_selling_price': quote,
+        'selling_price_pct': dict(zip(PERCENTILES, np.percentile(selling_price, PERCENTILES).tolist())),
+        'selling_price_mean': float(selling_price.mean()),
+        'quoted_margin': quoted_margin,
+        'margin_p5': p5_margin,
+        'margin_at_risk': quoted_margin - p5_margin,
+        'prob_loss': float((realized_margin < 0).mean()),
+        'selling_price': selling_price,
+    }
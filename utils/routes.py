@@ -0,0 +1,153 @@
+# Process routes: the stages between the P1 melt and the finished part. Every route
+# starts with the melt (ingot) and ends with a part stage (net / gross weight,
+# machining per piece); in between are any number of yield stages, each with a
+# yield %, a conversion cost (₹/kg input), a setup cost (₹ per production lot, see
+# utils/lots.py) and a destination for its scrap:
+#   'sell' - credited at the scrap rate (the open chain)
+#   'melt' - returned to the P1 melt at its built-up cost (closed loop, see utils.batch.evaluate_routes)
+#
+# A stage's yield and cost are chain inputs '<name>_yield_pct' / '<name>_process_cost'
+# (defaults below), so part books and the catalog can set them per SKU; '<name>_scrap_rate'
+# (and 'parts_scrap_rate') price a stage's sold scrap apart from the chain's scrap_rate.
+# RoutePlan compiles the definitions into (routes x stage slots) arrays once per process
+# (compiled_routes()); utils.batch.evaluate_routes then prices SKUs on different routes
+# in one batch.
+
+DEFAULT_ROUTE = 'sheet_parts'
+SCRAP_DESTINATIONS = ('sell', 'melt')
+
+# 'params' are the session process_params keys of a stage (default '<name>_yield' / '<name>_cost')
+ROUTES = {
+    'sheet_parts': {
+        'label': "Ingot → Sheet → Machined Parts",
+        'stages': (
+            {'name': 'sheet', 'label': "Sheet", 'yield_pct': 98.0, 'process_cost': 12.0, 'setup_cost': 1500.0,
+             'scrap': 'sell', 'params': ('rolling_yield', 'rolling_cost')},
+        ),
+        'part': {'label': "Machined Parts", 'setup_cost': 3000.0, 'scrap': 'sell'},
+    },
+    'rod_turned': {
+        'label': "Ingot → Rod → Turned Parts",
+        'stages': (
+            {'name': 'rod', 'label': "Rod", 'yield_pct': 90.0, 'process_cost': 18.0, 'setup_cost': 2000.0,
+             'scrap': 'sell'},
+        ),
+        'part': {'label': "Turned Parts", 'setup_cost': 2500.0, 'scrap': 'sell'},
+    },
+    'strip_stamped': {
+        'label': "Ingot → Sheet → Strip → Stamped Parts",
+        'stages': (
+            {'name': 'sheet', 'label': "Sheet", 'yield_pct': 98.0, 'process_cost': 12.0, 'setup_cost': 1500.0,
+             'scrap': 'sell', 'params': ('rolling_yield', 'rolling_cost')},
+            {'name': 'strip', 'label': "Strip", 'yield_pct': 96.0, 'process_cost': 4.0, 'setup_cost': 800.0,
+             'scrap': 'sell'},
+        ),
+        'part': {'label': "Stamped Parts", 'setup_cost': 6000.0, 'scrap': 'sell'},
+    },
+}
+
+
+def stage_names(routes=ROUTES):
+    """ Every intermediate stage name, in first-seen order """
+    return tuple(stage_definitions(routes))
+
+
+def stage_definitions(routes=ROUTES):
+    """ {stage name: definition}; the first definition of a stage wins """
+    stages = {}
+    for route in routes.values():
+        for stage in route['stages']:
+            stages.setdefault(stage['name'], stage)
+    return stages
+
+
+def stage_input_keys(name):
+    """ Chain inputs of a stage: (yield %, conversion cost) """
+    return f'{name}_yield_pct', f'{name}_process_cost'
+
+
+def stage_scrap_key(name):
+    """ Chain input of a stage's scrap rate ('parts' for the part stage); None => the chain's scrap_rate """
+    return f'{name}_scrap_rate'
+
+
+def stage_params(stage):
+    """ Session process_params keys of a stage: (yield %, conversion cost) """
+    return stage.get('params', (f"{stage['name']}_yield", f"{stage['name']}_cost"))
+
+
+def stage_defaults(routes=ROUTES):
+    """ {chain input: default} for the stage inputs """
+    defaults = {}
+    for name, stage in stage_definitions(routes).items():
+        yield_key, cost_key = stage_input_keys(name)
+        defaults[yield_key] = stage['yield_pct']
+        defaults[cost_key] = stage['process_cost']
+    return defaults
+
+
+def validate_routes(routes=ROUTES):
+    for name, route in routes.items():
+        for stage in route['stages'] + (route['part'],):
+            if stage['scrap'] not in SCRAP_DESTINATIONS:
+                raise ValueError(f"Route '{name}': scrap destination must be one of {SCRAP_DESTINATIONS}, not {stage['scrap']!r}")
+            if stage is not route['part'] and stage['name'] == 'parts':
+                raise ValueError(f"Route '{name}': 'parts' is reserved for the part stage")
+
+
+class RoutePlan:
+    """
+    Routes compiled for batch evaluation. Stage slots are padded to the longest route;
+    a padding slot passes the cost through unchanged (stage index -1).
+      stage_index  (routes x slots) index into `stages`, -1 for padding
+      return_pct   (routes x slots) % of the slot's scrap remelted by default
+      part_return_pct (routes,) the same for the part stage's scrap
+    """
+    __slots__ = ('routes', 'index', 'stages', 'stage_index', 'return_pct', 'part_return_pct')
+
+    def __init__(self, routes):
+        import numpy as np
+        validate_routes(routes)
+        self.routes = tuple(routes)
+        self.index = {name: i for i, name in enumerate(self.routes)}
+        self.stages = stage_names(routes)
+        slots = max(len(r['stages']) for r in routes.values())
+        self.stage_index = np.full((len(routes), slots), -1)
+        self.return_pct = np.zeros((len(routes), slots))
+        self.part_return_pct = np.zeros(len(routes))
+        for i, route in enumerate(routes.values()):
+            for k, stage in enumerate(route['stages']):
+                self.stage_index[i, k] = self.stages.index(stage['name'])
+                self.return_pct[i, k] = 100.0 if stage['scrap'] == 'melt' else 0.0
+            self.part_return_pct[i] = 100.0 if route['part']['scrap'] == 'melt' else 0.0
+
+    def route_index(self, route):
+        """ Route name(s) -> index array; None / blank means DEFAULT_ROUTE. Indexes pass through. """
+        import numpy as np
+        if route is None:
+            return np.int64(self.index[DEFAULT_ROUTE])
+        if np.asarray(route).dtype.kind in 'iu':
+            return np.asarray(route)
+        names = np.asarray(route, dtype=object)
+        unique, inverse = np.unique(names.astype(str), return_inverse=True)
+        blank = ('', 'None', 'nan')
+        unknown = [u for u in unique if u not in blank and u not in self.index]
+        if unknown:
+            raise KeyError(f"Unknown routes: {unknown} (known: {', '.join(self.routes)})")
+        lookup = np.array([self.index[DEFAULT_ROUTE if u in blank else u] for u in unique], dtype=np.int64)
+        return lookup[inverse].reshape(names.shape)
+
+
+_compiled = None
+
+
+def compiled_routes():
+    """ ROUTES compiled once per process """
+    global _compiled
+    if _compiled is None:
+        _compiled = RoutePlan(ROUTES)
+    return _compiled
+
+
+def route_from_session(state):
+    return state.get('process_params', {}).get('route') or DEFAULT_ROUTE
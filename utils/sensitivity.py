@@ -0,0 +1,113 @@
+import numpy as np
+from utils.batch import CHAIN_DEFAULTS, resolve_inputs, evaluate_chain
+
+# Sensitivity analysis of the final selling price. Every sweep builds all of its
+# scenarios as one broadcast batch and runs the costing chain once.
+
+SWEEP_PARAMS = {
+    'cu_price': "Copper Price",
+    'zn_price': "Zinc Price",
+    'burning_loss_pct': "P1: Burning Loss %",
+    'elec_cost': "Electricity (₹/kg)",
+    'labor_cost': "Labour (₹/kg)",
+    'consumable_cost': "Consumables (₹/kg)",
+    'overhead_cost': "Overhead (₹/kg)",
+    'sheet_yield_pct': "P2: Sheet Yield %",
+    'sheet_process_cost': "P2: Rolling Cost",
+    'parts_yield_pct': "P3: Parts Yield %",
+    'machining_cost': "P3: Machining Cost",
+    'scrap_factor': "Scrap Recovery Factor",
+    'interest_rate_pa': "Interest Rate %",
+    'holding_days': "Cycle Time (Days)",
+}
+
+# Percentages that cannot go above 100
+_PCT_PARAMS = ('burning_loss_pct', 'sheet_yield_pct', 'parts_yield_pct')
+
+OUTPUT = 'selling_price'
+
+
+def _clip(param, values):
+    values = np.asarray(values, dtype=float)
+    if param in _PCT_PARAMS:
+        return np.clip(values, 0.0, 100.0)
+    return values
+
+
+def _base(base_inputs):
+    """ Scalar chain inputs; derived inputs stay unresolved so they follow the swept values """
+    return {**CHAIN_DEFAULTS, **(base_inputs or {})}
+
+
+def sweep_grid(grid, base_inputs=None, output=OUTPUT):
+    """
+    Evaluates every combination of `grid` ({param: values}) in one broadcast batch.
+    Returns an N-dimensional array of `output`, one axis per grid entry (in order).
+    """
+    inputs = _base(base_inputs)
+    ndim = len(grid)
+    for axis, (param, values) in enumerate(grid.items()):
+        if param not in CHAIN_DEFAULTS:
+            raise KeyError(f"Unknown chain input: {param}")
+        shape = [1] * ndim
+        shape[axis] = -1
+        inputs[param] = _clip(param, values).reshape(shape)
+    # An input the output does not depend on still gets its axis
+    result = evaluate_chain(resolve_inputs(**inputs))[output]
+    return np.broadcast_to(result, tuple(len(inputs[param].reshape(-1)) for param in grid))
+
+
+def sweep_values(param, base_value, span_pct, points):
+    """ `points` values from -span_pct % to +span_pct % of `base_value`, inside the input's valid range """
+    low, high = _clip(param, float(base_value) * np.array([1 - span_pct / 100, 1 + span_pct / 100]))
+    return np.linspace(low, high, points)
+
+
+def sweep(param, values, base_inputs=None, output=OUTPUT):
+    """ One-parameter sweep. Returns a DataFrame of value -> output """
+    import pandas as pd
+    values = _clip(param, values)
+    return pd.DataFrame({param: values, output: sweep_grid({param: values}, base_inputs, output)})
+
+
+def tornado(base_inputs=None, swing_pct=10.0, params=None, output=OUTPUT):
+    """
+    Moves each parameter down / up by `swing_pct` % of its base value (one at a time)
+    and reports the effect on `output`. All 2 x len(params) scenarios run as one batch.
+    Returns a DataFrame sorted by impact (largest range first).
+    """
+    import pandas as pd
+    params = list(params or SWEEP_PARAMS)
+    base = _base(base_inputs)
+    n = len(params)
+
+    # Row 2i = param i low, row 2i+1 = param i high, last row = base case
+    inputs = dict(base)
+    factors = np.array([1 - swing_pct / 100, 1 + swing_pct / 100])
+    low_values, high_values = [], []
+    for i, param in enumerate(params):
+        if base.get(param) is None:
+            raise KeyError(f"Cannot sweep derived or unknown input: {param}")
+        column = np.full(2 * n + 1, float(base[param]))
+        column[2 * i:2 * i + 2] = _clip(param, float(base[param]) * factors)
+        low_values.append(column[2 * i])
+        high_values.append(column[2 * i + 1])
+        inputs[param] = column
+    result = evaluate_chain(resolve_inputs(**inputs))[output]
+
+    base_value = result[-1]
+    low, high = result[0:2 * n:2], result[1:2 * n:2]
+    frame = pd.DataFrame({
+        'param': params,
+        'label': [SWEEP_PARAMS.get(p, p) for p in params],
+        'base_value': [float(base[p]) for p in params],
+        'low_value': low_values,
+        'high_value': high_values,
+        'output_low': low,
+        'output_high': high,
+        'delta_low': low - base_value,
+        'delta_high': high - base_value,
+    })
+    frame['range'] = (frame['delta_high'] - frame['delta_low']).abs()
+    frame.attrs['base_output'] = float(base_value)
+    return frame.sort_values('range', ascending=False, ignore_index=True)
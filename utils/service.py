@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.alloys import GRADES
+from utils.batch import CHAIN_DEFAULTS, ELEMENT_INPUTS, resolve_inputs, evaluate_routes
+from utils.reverse import SOLVE_BOUNDS
+from utils.routes import ROUTES
+
+# Headless JSON costing service (asyncio, standard library only) for the ERP and the
+# quoting portal. A quote is a JSON object of chain inputs; anything left out takes
+# CHAIN_DEFAULTS, which mirror the app's sidebar / process_params defaults.
+#
+# Requests are not priced one by one: a collector takes whatever quotes are waiting
+# (up to MAX_BATCH, waiting at most MAX_WAIT_MS for more) and prices them as one
+# vectorized evaluate_routes call on a bounded worker pool. While every worker is
+# busy the queue keeps filling, so batches grow with load; beyond MAX_PENDING queued
+# quotes the service answers 503 instead of queueing without limit.
+#
+#   GET  /health     {"status": "ok", "pending": ...}
+#   GET  /defaults   chain inputs and their defaults, routes, alloy grades
+#   POST /quote      {"cu_price": 1020, "gross_weight_kg": 0.4, ...}  -> outputs
+#                    {"quotes": [{...}, ...]}                         -> {"quotes": [outputs, ...]}
+# Besides chain inputs a quote may carry "route", "alloy_grade" and an "id" that is echoed back.
+# Inputs outside their valid range (utils.reverse.SOLVE_BOUNDS: yields, losses, shares,
+# weights; nothing else negative), shares over 100% in total and a net weight above the
+# gross weight are answered 400 rather than priced.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8600
+MAX_BATCH = 4096
+MAX_WAIT_MS = 1.0
+MAX_PENDING = 100_000
+MAX_BODY_BYTES = 8 * 1024 * 1024
+WORKERS = 4
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def parse_quote(payload):
+    """ One quote object -> (id, route, {chain input: float}); raises ValueError on bad or impossible input """
+    if not isinstance(payload, dict):
+        raise ValueError("A quote must be a JSON object of chain inputs")
+    payload = dict(payload)
+    quote_id = payload.pop('id', None)
+    route = payload.pop('route', None)
+    if route is not None and route not in ROUTES:
+        raise ValueError(f"Unknown route '{route}' (known: {', '.join(ROUTES)})")
+    grade = payload.pop('alloy_grade', None)
+    unknown = set(payload) - set(CHAIN_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown chain inputs: {sorted(unknown)}")
+
+    inputs = {}
+    if grade is not None:
+        if grade not in GRADES:
+            raise ValueError(f"Unknown alloy grade '{grade}' (known: {', '.join(GRADES)})")
+        inputs = {pct_key: GRADES[grade].get(e, 0.0) for e, (_, pct_key) in ELEMENT_INPUTS.items()}
+    for key, value in payload.items():
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"'{key}' must be a finite number, not {value!r}")
+        lo, hi = SOLVE_BOUNDS.get(key, (0.0, math.inf))
+        if not lo <= value <= hi:
+            limit = f"at least {lo:g}" if hi == math.inf else f"between {lo:g} and {hi:g}"
+            raise ValueError(f"'{key}' must be {limit}, not {value:g}")
+        inputs[key] = float(value)
+
+    merged = {**CHAIN_DEFAULTS, **inputs}
+    shares = sum(merged[pct_key] or 0.0 for _, pct_key in ELEMENT_INPUTS.values())   # zn_pct None => zinc balance
+    if shares > 100.0 + 1e-9:
+        raise ValueError(f"Element shares add up to {shares:g}% (at most 100%; zinc makes up the balance)")
+    if merged['net_weight_kg'] is not None and merged['net_weight_kg'] > merged['gross_weight_kg']:
+        raise ValueError(f"'net_weight_kg' ({merged['net_weight_kg']:g}) cannot exceed 'gross_weight_kg' ({merged['gross_weight_kg']:g})")
+    return quote_id, route, inputs
+
+
+def price_quotes(quotes):
+    """
+    Prices parsed quotes (parse_quote results) in one vectorized pass. Inputs a quote
+    leaves out take the defaults for that quote only. Returns one dict per quote
+    (outputs that are not finite numbers are None, i.e. JSON null).
+    """
+    n = len(quotes)
+    columns = {}
+    for i, (_, _, inputs) in enumerate(quotes):
+        for key, value in inputs.items():
+            if key not in columns:
+                columns[key] = np.full(n, np.nan)
+            columns[key][i] = value
+    route = np.array([q[1] for q in quotes], dtype=object)
+    with np.errstate(over='ignore', invalid='ignore'):       # Overflowing quotes come back as null
+        result = evaluate_routes(resolve_inputs(columns), route=route)
+
+    keys = list(result)
+    rows = zip(*(np.broadcast_to(result[k], (n,)).tolist() for k in keys))
+    priced = []
+    for (quote_id, _, _), row in zip(quotes, rows):
+        out = {k: (v if math.isfinite(v) else None) for k, v in zip(keys, row)}    # NaN (stage off the route), overflow -> null
+        if quote_id is not None:
+            out = {'id': quote_id, **out}
+        priced.append(out)
+    return priced
+
+
+class MicroBatcher:
+    """
+    Groups concurrently submitted work items into batches for `evaluate(list) -> list`,
+    run on a pool of `workers` threads (one batch per worker at a time).
+    """
+
+    def __init__(self, evaluate, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, workers=WORKERS, max_pending=MAX_PENDING):
+        self.evaluate = evaluate
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.batches = self.items = 0
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='quote')
+        self._slots = asyncio.Semaphore(workers)
+        self._queue = asyncio.Queue()
+        self._pending = 0
+        self._collector = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def submit(self, items):
+        """ Evaluates `items` (a list) as part of some batch; raises OverflowError when the queue is full """
+        if self._pending + len(items) > self.max_pending:
+            raise OverflowError("Too many quotes waiting")
+        if self._collector is None:
+            self._collector = asyncio.create_task(self._collect())
+        future = asyncio.get_running_loop().create_future()
+        self._pending += len(items)
+        self._queue.put_nowait((items, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+                size += len(batch[-1][0])
+            await self._slots.acquire()         # Bounded pool: wait for a free worker
+            asyncio.create_task(self._run(batch, size))
+
+    async def _run(self, batch, size):
+        loop = asyncio.get_running_loop()
+        try:
+            flat = [item for items, _ in batch for item in items]
+            results = await loop.run_in_executor(self._pool, self.evaluate, flat)
+            start = 0
+            for items, future in batch:
+                if not future.done():
+                    future.set_result(results[start:start + len(items)])
+                start += len(items)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            self._pending -= size
+            self.batches += 1
+            self.items += size
+            self._slots.release()
+
+    async def close(self):
+        if self._collector is not None:
+            self._collector.cancel()
+        self._pool.shutdown(wait=False)
+
+
+class CostService:
+    """ HTTP/1.1 front end (keep-alive, JSON bodies) over a MicroBatcher of price_quotes """
+
+    def __init__(self, **batching):
+        self.batcher = MicroBatcher(price_quotes, **batching)
+        self.server = None
+        self._connections = {}      # Handler task -> writer of each open connection
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self.server.wait_closed()
+        await self.batcher.close()
+
+    async def handle(self, method, path, body):
+        """ (status, JSON-able payload) for one request """
+        if path == '/health':
+            return 200, {'status': 'ok', 'pending': self.batcher.pending,
+                         'batches': self.batcher.batches, 'quotes': self.batcher.items}
+        if path == '/defaults':
+            return 200, {'inputs': CHAIN_DEFAULTS, 'routes': {k: r['label'] for k, r in ROUTES.items()}, 'alloy_grades': GRADES}
+        if path != '/quote':
+            return 404, {'error': f"No such endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST with a JSON body"}
+        try:
+            payload = json.loads(body or b'{}')
+            many = isinstance(payload, dict) and 'quotes' in payload
+            raw = payload['quotes'] if many else [payload]
+            if not isinstance(raw, list):
+                raise ValueError("'quotes' must be a list")
+            quotes = []
+            for i, quote in enumerate(raw):
+                try:
+                    quotes.append(parse_quote(quote))
+                except ValueError as exc:
+                    raise ValueError(f"Quote {i}: {exc}" if many else str(exc)) from None
+        except ValueError as exc:       # Includes malformed JSON
+            return 400, {'error': str(exc)}
+        if not quotes:
+            return 200, {'quotes': []}
+        try:
+            priced = await self.batcher.submit(quotes)
+        except OverflowError as exc:
+            return 503, {'error': str(exc)}
+        return 200, ({'quotes': priced} if many else priced[0])
+
+    async def _connection(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if len(parts) != 3:
+                    await self._respond(writer, 400, {'error': "Malformed request line"}, keep_alive=False)
+                    break
+                method, target, version = parts
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'error': "Malformed Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': f"Body over {MAX_BODY_BYTES} bytes"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                try:
+                    status, payload = await self.handle(method, target.split('?', 1)[0], body)
+                except Exception as exc:
+                    status, payload = 500, {'error': f"{type(exc).__name__}: {exc}"}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.pop(asyncio.current_task(), None)
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        try:
+            data = json.dumps(payload, allow_nan=False).encode()      # Strict JSON: no NaN / Infinity
+        except ValueError as exc:
+            status, data = 500, json.dumps({'error': f"Response not serializable: {exc}"}).encode()
+        connection = "" if keep_alive else "Connection: close\r\n"
+        writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n{connection}\r\n".encode() + data)
+        await writer.drain()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, **batching):
+    service = CostService(**batching)
+    port = await service.start(host, port)
+    print(f"Costing service on http://{host}:{port} (POST /quote, GET /defaults, GET /health)")
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless JSON costing service with request micro-batching.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Interface to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Batches priced at the same time")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most quotes per vectorized call")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Longest wait for a batch to fill")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+    return 0
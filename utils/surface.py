@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.batch import CHAIN_DEFAULTS, resolve_inputs, evaluate_chain
+from utils.sensitivity import sweep_grid
+
+# Precomputed selling-price surface over a (Cu price x Zn price) grid for one
+# alloy / route configuration. The grid is stored as a .npy file and memory-mapped,
+# so quotes are answered by bilinear interpolation without re-running the chain.
+#
+# The cache file name is a hash of every non-metal input (process_params, conversion
+# rates, financials) plus the grid spec, so any change there selects a new file and
+# the stale one is pruned - no manual invalidation needed.
+
+SURFACE_VERSION = 1
+SURFACE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'surfaces')
+MAX_CACHED_FILES = 8
+MAX_LOADED = 8
+
+# (cache dir, key) -> CostSurface, least recently used first. Every sidebar change makes
+# a new key, so the open maps are bounded like the files; an evicted map closes once
+# no session holds its surface.
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def surface_key(base_inputs, cu_range, zn_range, points, output):
+    inputs = {**CHAIN_DEFAULTS, **(base_inputs or {})}
+    inputs.pop('cu_price')
+    inputs.pop('zn_price')
+    spec = {
+        'version': SURFACE_VERSION,
+        'inputs': {k: (None if v is None else float(v)) for k, v in sorted(inputs.items())},
+        'cu_range': [float(x) for x in cu_range],
+        'zn_range': [float(x) for x in zn_range],
+        'points': int(points),
+        'output': output,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:20]
+
+
+class CostSurface:
+    """ Interpolated quote surface. Use CostSurface.get(...) to build or reuse the cache. """
+
+    def __init__(self, values, cu_range, zn_range, error_bound, base_inputs, output):
+        self.values = values
+        self.cu_lo, self.cu_hi = cu_range
+        self.zn_lo, self.zn_hi = zn_range
+        self.error_bound = error_bound
+        self.base_inputs = dict(base_inputs or {})
+        self.output = output
+
+    @classmethod
+    def get(cls, base_inputs=None, cu_range=(500.0, 1500.0), zn_range=(150.0, 450.0), points=401,
+            output='selling_price', cache_dir=SURFACE_DIR):
+        key = surface_key(base_inputs, cu_range, zn_range, points, output)
+        with _loaded_lock:
+            surface = _loaded.get((cache_dir, key))
+            if surface is not None:
+                _loaded.move_to_end((cache_dir, key))
+                return surface
+
+        data_path = os.path.join(cache_dir, f"surface_{key}.npy")
+        meta_path = os.path.join(cache_dir, f"surface_{key}.json")
+
+        def load():
+            with open(meta_path) as f:
+                meta = json.load(f)
+            return cls(np.load(data_path, mmap_mode='r'), cu_range, zn_range, meta['error_bound'], base_inputs, output)
+
+        try:
+            surface = load()
+        except OSError:
+            # Not built yet, or pruned by another session since it was written
+            cls._build(base_inputs, cu_range, zn_range, points, output, data_path, meta_path)
+            _prune(cache_dir)
+            surface = load()
+        with _loaded_lock:
+            _loaded[(cache_dir, key)] = surface
+            while len(_loaded) > MAX_LOADED:
+                _loaded.popitem(last=False)
+        return surface
+
+    @staticmethod
+    def _build(base_inputs, cu_range, zn_range, points, output, data_path, meta_path):
+        cu_axis = np.linspace(*cu_range, points)
+        zn_axis = np.linspace(*zn_range, points)
+        values = sweep_grid({'cu_price': cu_axis, 'zn_price': zn_axis}, base_inputs, output)
+
+        # Bilinear error <= (hx^2 max|f_xx| + hy^2 max|f_yy|) / 8; the grid second
+        # differences already carry the h^2 factor. Also check every cell midpoint.
+        curvature = 0.0
+        if points > 2:
+            curvature = (np.abs(np.diff(values, 2, axis=0)).max() + np.abs(np.diff(values, 2, axis=1)).max()) / 8
+        mid_cu = (cu_axis[:-1] + cu_axis[1:]) / 2
+        mid_zn = (zn_axis[:-1] + zn_axis[1:]) / 2
+        exact_mid = sweep_grid({'cu_price': mid_cu, 'zn_price': mid_zn}, base_inputs, output)
+        interp_mid = (values[:-1, :-1] + values[1:, :-1] + values[:-1, 1:] + values[1:, 1:]) / 4
+        midpoint_error = np.abs(exact_mid - interp_mid).max()
+        # Floor at a few ulps of the surface so an affine surface still reports a sane bound
+        error_bound = float(max(curvature, midpoint_error, 8 * np.finfo(float).eps * np.abs(values).max()))
+
+        # Unique temp files, renamed into place: concurrent builds of one key never share a file
+        cache_dir = os.path.dirname(data_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, prefix='.surface_', suffix='.npy', delete=False) as f:
+            np.save(f, values)
+        os.replace(f.name, data_path)
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir, prefix='.surface_', suffix='.json', delete=False) as f:
+            json.dump({'error_bound': error_bound, 'cu_range': list(cu_range), 'zn_range': list(zn_range), 'points': points}, f)
+        os.replace(f.name, meta_path)
+
+    def quote(self, cu_price, zn_price):
+        """
+        Interpolated `output` at the given metal prices (scalars or arrays).
+        Points outside the grid are evaluated exactly through the chain instead.
+        """
+        cu, zn = np.broadcast_arrays(np.asarray(cu_price, dtype=float), np.asarray(zn_price, dtype=float))
+        n_cu, n_zn = self.values.shape
+        fx = (cu - self.cu_lo) / (self.cu_hi - self.cu_lo) * (n_cu - 1)
+        fy = (zn - self.zn_lo) / (self.zn_hi - self.zn_lo) * (n_zn - 1)
+        inside = (fx >= 0) & (fx <= n_cu - 1) & (fy >= 0) & (fy <= n_zn - 1)
+
+        i = np.clip(np.floor(fx).astype(int), 0, n_cu - 2)
+        j = np.clip(np.floor(fy).astype(int), 0, n_zn - 2)
+        tx, ty = fx - i, fy - j
+        v = self.values
+        result = ((1 - tx) * (1 - ty) * v[i, j] + tx * (1 - ty) * v[i + 1, j]
+                  + (1 - tx) * ty * v[i, j + 1] + tx * ty * v[i + 1, j + 1])
+
+        if not inside.all():
+            exact = evaluate_chain(resolve_inputs(**{**self.base_inputs, 'cu_price': cu[~inside], 'zn_price': zn[~inside]}))
+            result = np.where(inside, result, 0.0)
+            result[~inside] = exact[self.output]
+        return result
+
+
+def _prune(cache_dir):
+    """ Keeps only the most recently written surfaces """
+    def mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:         # Already removed by another session
+            return 0.0
+
+    files = sorted(
+        (os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.startswith('surface_') and f.endswith('.npy')),
+        key=mtime, reverse=True
+    )
+    for path in files[MAX_CACHED_FILES:]:
+        for stale in (path, path[:-4] + '.json'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
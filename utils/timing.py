@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Opt-in hot-path instrumentation. Set COSTAPP_PROFILE=1 to record how long each
+# section of a rerun takes. Samples are kept process-wide (all sessions) in bounded
+# ring buffers, so p50/p99 reflect the most recent reruns of every user.
+# When disabled, timed()/start()/stop() do nothing.
+
+ENABLED = os.environ.get('COSTAPP_PROFILE', '') == '1'
+RING_SIZE = 2048            # Samples kept per section
+
+_lock = threading.Lock()
+_samples = {}               # section -> deque[(unix_ts, seconds)]
+_counts = {}                # section -> (total count, total seconds) since process start
+_local = threading.local()  # Current rerun (Streamlit runs each session's script in its own thread)
+
+
+def begin_rerun():
+    """ Starts a new per-rerun record for the calling session thread """
+    _local.rerun = []
+    _local.open = {}
+
+
+def _record(section, seconds):
+    with _lock:
+        _samples.setdefault(section, deque(maxlen=RING_SIZE)).append((time.time(), seconds))
+        count, total = _counts.get(section, (0, 0.0))
+        _counts[section] = (count + 1, total + seconds)
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is not None:
+        rerun.append((section, seconds))
+
+
+@contextmanager
+def timed(section):
+    if not ENABLED:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(section, time.perf_counter() - t)
+
+
+def start(section):
+    """ For long script blocks where a `with` would force re-indenting; pair with stop() """
+    if ENABLED:
+        if not hasattr(_local, 'open'):
+            _local.open = {}
+        _local.open[section] = time.perf_counter()
+
+
+def stop(section):
+    if ENABLED:
+        t = getattr(_local, 'open', {}).pop(section, None)
+        if t is not None:
+            _record(section, time.perf_counter() - t)
+
+
+def current_rerun():
+    """ [(section, seconds)] recorded so far in this session's rerun """
+    return list(getattr(_local, 'rerun', []))
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summary():
+    """ {section: {'count', 'p50', 'p99', 'window'}} over the ring buffers """
+    with _lock:
+        snapshot = {s: sorted(v for _, v in d) for s, d in _samples.items()}
+        counts = dict(_counts)
+    return {
+        s: {'count': counts[s][0], 'p50': _quantile(v, 0.50), 'p99': _quantile(v, 0.99), 'window': len(v)}
+        for s, v in sorted(snapshot.items())
+    }
+
+
+def prometheus_text():
+    """ Prometheus exposition format (summary per section) """
+    lines = [
+        "# HELP costapp_section_seconds Wall time of one section of a Streamlit rerun.",
+        "# TYPE costapp_section_seconds summary",
+    ]
+    stats = summary()
+    with _lock:
+        counts = dict(_counts)
+    for section, s in stats.items():
+        label = section.replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'costapp_section_seconds{{section="{label}",quantile="0.5"}} {s["p50"]:.6f}')
+        lines.append(f'costapp_section_seconds{{section="{label}",quantile="0.99"}} {s["p99"]:.6f}')
+        lines.append(f'costapp_section_seconds_sum{{section="{label}"}} {counts[section][1]:.6f}')
+        lines.append(f'costapp_section_seconds_count{{section="{label}"}} {counts[section][0]}')
+    return "\n".join(lines) + "\n"
+
+
+def jsonl():
+    """ Every buffered sample as one JSON object per line """
+    with _lock:
+        rows = [(ts, s, v) for s, d in _samples.items() for ts, v in d]
+    rows.sort()
+    return "".join(json.dumps({'ts': ts, 'section': s, 'seconds': v}) + "\n" for ts, s, v in rows)
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _counts.clear()
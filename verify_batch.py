@@ -0,0 +1,553 @@
+import sys
+import os
+import asyncio
+import json
+import tempfile
+
+sys.path.append(os.getcwd())
+import numpy as np
+import pandas as pd
+from utils.calculations import CostCalculator
+from utils.batch import CHAIN_DEFAULTS, calculate_chain_batch, chain_inputs_from_session, resolve_inputs, evaluate_chain, evaluate_routes
+from utils.pipeline import evaluate_pipeline, pipeline_inputs_from_session
+from utils.routes import ROUTES
+from utils.gradients import price_gradient
+from utils.sensitivity import sweep_grid
+from utils.surface import CostSurface
+from utils.reverse import solve_input
+from utils.alloys import ELEMENTS, GRADES, DEFAULT_ELEMENT_PRICES, Alloy, grade_costs
+from utils.charge import ChargeMaterial, optimize_charge
+from utils.recirculation import calculate_recirculation_batch, evaluate_recirculation
+from utils.history import RateHistory, recost_history
+from utils.service import CostService
+from utils.lots import SETUP_DEFAULTS, price_breaks
+from utils.capacity import conversion_rates, utilization_sweep
+from utils.melt import schedule_heats
+from utils.inventory import InventoryLedger, value_fifo
+from utils.bulk import price_book_file
+from utils.catalog import PartCatalog
+
+def test_batch():
+    print("--- Testing Batch vs Scalar ---")
+
+    # Part book: 3 parts, one shared metal price (broadcast)
+    book = pd.DataFrame({
+        'gross_weight_kg': [0.050, 1.0, 2.5],
+        'net_weight_kg': [0.035, 0.7, 0.0],
+        'machining_cost': [5.0, 5.0, 12.0],
+    })
+    priced = calculate_chain_batch(book, cu_price=750.0, zn_price=240.0, cu_pct=63.0)
+
+    for i, row in book.iterrows():
+        p1 = CostCalculator.calculate_ingot_cost(750.0, 240.0, 63.0, 37.0, 2.0, 8.0, 3.0, 2.0, 2.0)
+        scrap = (750.0 * 0.63 + 240.0 * 0.37)
+        p2 = CostCalculator.calculate_sheet_cost(p1['final_cost_per_kg'], 98.0, scrap, 12.0)
+        p3 = CostCalculator.calculate_part_cost(p2['final_cost_per_kg'], row['net_weight_kg'], row['gross_weight_kg'], scrap, row['machining_cost'])
+        fin = CostCalculator.calculate_financials(p3['effective_cost_per_kg_finished'], 12.0, 45, 10.0)
+
+        ok = np.isclose(priced.loc[i, 'selling_price'], fin['selling_price'])
+        print(f"  Part {i}: Batch {priced.loc[i, 'selling_price']:.4f} | Scalar {fin['selling_price']:.4f} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    # Records leave Python as plain dicts: nested scalar results and batch arrays alike
+    ingot = json.loads(json.dumps(CostCalculator.calculate_ingot_cost(750.0, 240.0, 63.0, 37.0, 2.0, 8.0).to_dict()))
+    batch = json.loads(json.dumps(CostCalculator.calculate_financials_batch(np.array([100.0, 200.0]), 12.0, 45, 10.0).to_dict()))
+    ok = ingot['breakdown']['electricity'] == 8.0 and np.allclose(batch['base_cost'], [100.0, 200.0])
+    print(f"  JSON: ingot breakdown {ingot['breakdown']} | batch base_cost {batch['base_cost']} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_bulk():
+    print("--- Testing Bulk Pricing (multi-chunk CSV -> Parquet) ---")
+
+    # The first chunk has no routes at all (a blank text column), the second has them
+    book = pd.DataFrame({
+        'sku': [f'P{i}' for i in range(6)],
+        'gross_weight_kg': [1.0, 0.5, 2.0, 1.0, 0.4, 1.5],
+        'net_weight_kg': [0.7, 0.35, 1.6, 0.7, 0.3, 1.0],
+        'route': [None, None, None, 'rod_turned', 'strip_stamped', None],
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = os.path.join(tmp, 'book.csv'), os.path.join(tmp, 'priced.parquet')
+        book.to_csv(src, index=False)
+        rows = price_book_file(src, out, chunksize=3, cu_pct=63.0)
+        priced = pd.read_parquet(out)
+    expected = calculate_chain_batch(book, cu_pct=63.0)['selling_price']
+    ok = rows == len(book) and np.allclose(priced['selling_price'], expected, rtol=1e-12) and list(priced['sku']) == list(book['sku'])
+    print(f"  {rows} rows in chunks of 3: {np.round(priced['selling_price'].values, 4)} | Whole book {np.round(expected.values, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_catalog():
+    print("--- Testing Part Catalog (incremental reprice) ---")
+
+    book = pd.DataFrame({
+        'sku': ['CU-1', 'BR-1', 'ROD-1'],
+        'alloy': ['Copper', 'CW614N', None],
+        'route': [None, None, 'rod_turned'],
+        'gross_weight_kg': [1.0, 0.5, 0.4],
+        'net_weight_kg': [0.7, 0.3, 0.3],
+    })
+    rates = {'zn_price': 300.0, 'rod_yield_pct': 90.0}
+    with PartCatalog(':memory:') as catalog:
+        catalog.upsert(book)
+        first = catalog.reprice(rates)
+        again = catalog.reprice(rates)
+        zinc = catalog.reprice({**rates, 'zn_price': 320.0})                      # Only the brass part has zinc
+        rod = catalog.reprice({**rates, 'zn_price': 320.0, 'rod_yield_pct': 85.0})  # Only the rod part passes the rod stage
+        priced = catalog.find().set_index('sku')
+        brass = catalog.get('BR-1')
+
+    # The grade name sets the brass part's element shares
+    shares = {'cu_pct': [np.nan, 58.0, np.nan], 'zn_pct': [np.nan, 39.0, np.nan], 'pb_pct': [np.nan, 3.0, np.nan]}
+    expected = calculate_chain_batch(book.drop(columns=['sku', 'alloy']).assign(**shares), zn_price=320.0, rod_yield_pct=85.0)
+    ok = (first, again, zinc, rod) == (3, 0, 1, 1) and brass['pb_pct'] == 3.0 \
+        and np.allclose(priced.loc[book['sku'], 'selling_price'], expected['selling_price'], rtol=1e-12)
+    print(f"  Repriced rows: first {first}, unchanged {again}, Zn price {zinc}, rod yield {rod} | "
+          f"Prices {np.round(priced.loc[book['sku'], 'selling_price'].values, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_gradients():
+    print("--- Testing Gradients vs Finite Differences ---")
+
+    base = {**CHAIN_DEFAULTS, 'cu_pct': 63.0}
+    grad = price_gradient(cu_pct=63.0).iloc[0]
+    h = 1e-6
+    for col in grad.index[1:]:
+        key = col[2:]
+        up = calculate_chain_batch(**{**base, key: base[key] + h})
+        down = calculate_chain_batch(**{**base, key: base[key] - h})
+        numeric = (up['selling_price'][0] - down['selling_price'][0]) / (2 * h)
+
+        ok = np.isclose(numeric, grad[col], rtol=1e-5, atol=1e-4)
+        print(f"  {key}: Exact {grad[col]:.4f} | Numeric {numeric:.4f} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    # Stage scrap rates given apart from the chain's scrap rate
+    base = {**CHAIN_DEFAULTS, 'sheet_scrap_rate': 500.0, 'parts_scrap_rate': 650.0}
+    grad = price_gradient(sheet_scrap_rate=500.0, parts_scrap_rate=650.0).iloc[0]
+    assert 'd_scrap_rate' not in grad and 'd_rod_scrap_rate' not in grad
+    for key in ('sheet_scrap_rate', 'parts_scrap_rate', 'scrap_factor'):
+        up = calculate_chain_batch(**{**base, key: base[key] + h})
+        down = calculate_chain_batch(**{**base, key: base[key] - h})
+        numeric = (up['selling_price'][0] - down['selling_price'][0]) / (2 * h)
+        ok = np.isclose(numeric, grad[f'd_{key}'], rtol=1e-5, atol=1e-4)
+        print(f"  {key} (stage scrap): Exact {grad[f'd_{key}']:.4f} | Numeric {numeric:.4f} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    # Mixed routes and blank cells: stages off a row's route and derived blanks are NaN
+    book = pd.DataFrame({
+        'route': ['sheet_parts', 'rod_turned', 'strip_stamped'],
+        'cu_pct': [63.0, np.nan, 60.0],
+        'net_weight_kg': [0.4, np.nan, 0.3],
+    })
+    grad = price_gradient(book, gross_weight_kg=0.5)
+    assert np.allclose(grad['selling_price'], calculate_chain_batch(book, gross_weight_kg=0.5)['selling_price'])
+    assert np.isnan(grad['d_sheet_yield_pct'][1]) and np.isnan(grad['d_rod_yield_pct'][[0, 2]]).all()
+    assert np.isnan(grad['d_net_weight_kg'][1])
+    base = {**CHAIN_DEFAULTS, 'gross_weight_kg': 0.5}
+    for col in ('d_cu_pct', 'd_rod_yield_pct', 'd_strip_process_cost', 'd_gross_weight_kg'):
+        key = col[2:]
+        up = calculate_chain_batch(book, **{**base, key: base[key] + h})
+        down = calculate_chain_batch(book, **{**base, key: base[key] - h})
+        numeric = ((up['selling_price'] - down['selling_price']) / (2 * h)).values
+        rows = ~np.isnan(grad[col].values)
+        if key == 'cu_pct':
+            rows = book['cu_pct'].isna().values     # The override only moves the blank row
+        ok = np.allclose(numeric[rows], grad[col].values[rows], rtol=1e-5, atol=1e-4)
+        print(f"  {key} (routes): {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    print("--- Test Complete ---")
+
+def test_reverse():
+    print("--- Testing Reverse Solver (price -> input -> price) ---")
+
+    book = pd.DataFrame({'cu_pct': [100.0, 63.0], 'gross_weight_kg': [1.0, 0.4], 'net_weight_kg': [0.7, 0.3]})
+    for key in ['cu_price', 'machining_cost', 'sheet_yield_pct', 'burning_loss_pct']:
+        current = resolve_inputs(book)[key]
+        target = calculate_chain_batch(book, **{key: current * 0.95})['selling_price'].values
+        solved = solve_input(key, target, book=book)
+
+        ok = np.allclose(solved, np.broadcast_to(current * 0.95, solved.shape), rtol=1e-7)
+        print(f"  {key}: Solved {np.round(solved, 4)} | Expected {np.round(np.broadcast_to(current * 0.95, solved.shape), 4)} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    # Shares must stay a real alloy: Sn on top of Cu 100 (zinc balance < 0) or Zn above it (> 100%) is no answer
+    target = calculate_chain_batch(book)['selling_price'].values * 1.05
+    sn, zn = solve_input('sn_pct', target, book=book), solve_input('zn_pct', target, book=book.assign(zn_pct=[0.0, 37.0]))
+    ok = np.isnan(sn[0]) and 0 < sn[1] <= 37.0 and np.isnan(zn).all()
+    print(f"  Shares: Sn {np.round(sn, 4)} | Zn {np.round(zn, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_alloys():
+    print("--- Testing Alloy Model (two-metal, grades batch vs scalar) ---")
+
+    # A Cu/Zn mix must cost exactly what the two-metal calculator gives
+    legacy = CostCalculator.calculate_ingot_cost(750.0, 240.0, 63.0, 37.0, 2.0, elec_cost=10.0)['final_cost_per_kg']
+    alloy = CostCalculator.calculate_alloy_ingot_cost([750.0, 240.0], [63.0, 37.0], 2.0, elec_cost=10.0)['final_cost_per_kg']
+    print(f"  Cu/Zn: Two-metal {legacy:.6f} | Alloy {alloy:.6f} | {'OK' if legacy == alloy else 'MISMATCH'}")
+    assert legacy == alloy
+
+    # Every grade under two Cu prices in one pass
+    cu = np.array([950.0, 1050.0])
+    batch = grade_costs(element_prices={'Cu': cu}, burning_loss_pct=2.0, elec_cost=10.0)['final_cost_per_kg']
+    for g, grade in enumerate(GRADES):
+        for s, cu_price in enumerate(cu):
+            prices = {**DEFAULT_ELEMENT_PRICES, 'Cu': cu_price}
+            scalar = CostCalculator.calculate_alloy_ingot_cost(
+                [prices[e] for e in ELEMENTS], Alloy.grade(grade).composition_pct(), 2.0, elec_cost=10.0
+            )['final_cost_per_kg']
+            assert np.isclose(batch[s, g], scalar), (grade, cu_price)
+    print(f"  {len(GRADES)} grades x {len(cu)} Cu prices: Batch matches scalar | OK")
+
+    # Pure copper (Zn 0%): a zinc price axis is kept, flat, for sweeps and the quote surface
+    grid = sweep_grid({'cu_price': np.linspace(900.0, 1100.0, 5), 'zn_price': np.linspace(200.0, 400.0, 4)}, {'cu_pct': 100.0})
+    with tempfile.TemporaryDirectory() as tmp:
+        surface = CostSurface.get({'cu_pct': 100.0}, points=5, cache_dir=tmp)
+    ok = grid.shape == (5, 4) and np.all(grid == grid[:, :1]) and surface.values.shape == (5, 5)
+    print(f"  Cu 100%: grid {grid.shape}, surface {surface.values.shape} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_charge():
+    print("--- Testing Charge Mix Optimizer ---")
+
+    # Virgin metal only, exact composition: the same cost as the ingot calculator
+    target = Alloy.grade('C26000')
+    virgin = [ChargeMaterial("Cu", {'Cu': 100.0}, 750.0), ChargeMaterial("Zn", {'Zn': 100.0}, 240.0)]
+    mix = optimize_charge(target, virgin, heat_kg=1.0, burning_loss_pct=2.0, tolerance_pct=0.0, conversion_cost=10.0)
+    expected = CostCalculator.calculate_alloy_ingot_cost([750.0, 240.0], [70.0, 30.0], 2.0, elec_cost=10.0)['final_cost_per_kg']
+    ok = np.isclose(mix['cost_per_kg_melt'][0], expected)
+    print(f"  Virgin only: Optimizer {mix['cost_per_kg_melt'][0]:.4f} | Calculator {expected:.4f} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Cheap scrap in limited stock is used up first; the melt stays inside the band
+    scrap = ChargeMaterial("Brass scrap", {'Cu': 65.0, 'Zn': 35.0}, 500.0, available_kg=400.0)
+    mix = optimize_charge(target, virgin + [scrap], heat_kg=1000.0, burning_loss_pct=2.0)
+    ok = np.isclose(mix['charge_kg'][0][2], 400.0) and abs(mix['melt_composition'][0][0] - 70.0) <= 0.5 + 1e-9
+    print(f"  With scrap: Charge {np.round(mix['charge_kg'][0], 1)} kg | Melt Cu {mix['melt_composition'][0][0]:.2f}% | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_recirculation():
+    print("--- Testing Scrap Recirculation (direct solve vs repeated passes) ---")
+
+    book = pd.DataFrame({'cu_pct': [100.0, 63.0], 'gross_weight_kg': [1.0, 0.4], 'net_weight_kg': [0.7, 0.3]})
+    open_chain = calculate_chain_batch(book, scrap_factor=0.9)
+    no_return = calculate_recirculation_batch(book, p2_return_pct=0.0, p3_return_pct=0.0, scrap_factor=0.9)
+    ok = np.allclose(no_return['part_cost_per_kg'], open_chain['part_cost_per_kg'], rtol=1e-12)
+    print(f"  Nothing returned: {np.round(no_return['part_cost_per_kg'].values, 4)} | Chain {np.round(open_chain['part_cost_per_kg'].values, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Fixed point the slow way: remelt at last pass's sheet / part cost until it settles
+    inputs = resolve_inputs(book, scrap_factor=0.9)
+    direct = evaluate_recirculation(inputs, 80.0, 60.0)
+    c2 = c3 = 0.0
+    for _ in range(200):
+        m = direct
+        c1 = (m['virgin_metal_kg'] * (inputs['cu_price'] * inputs['cu_pct'] / 100 + inputs['zn_price'] * inputs['zn_pct'] / 100)
+              + m['charge_kg'] * 15.0 + 0.8 * (1 - 0.98) * m['ingot_kg'] * c2 + 0.6 * (m['sheet_kg'] - 1) * c3) / m['ingot_kg']
+        r2, r3 = 0.8 * 0.02 * m['ingot_kg'], 0.6 * (m['sheet_kg'] - 1)
+        c2 = (m['ingot_kg'] * (c1 + 12.0) - (0.02 * m['ingot_kg'] - r2) * inputs['scrap_rate']) / (m['sheet_kg'] + r2)
+        c3 = (m['sheet_kg'] * (c2 + 5.0 / inputs['gross_weight_kg']) - (m['sheet_kg'] - 1 - r3) * inputs['scrap_rate']) / (1 + r3)
+    ok = np.allclose(direct['part_cost_per_kg'], c3, rtol=1e-9)
+    print(f"  80% / 60% returned: Direct {np.round(direct['part_cost_per_kg'], 4)} | Iterated {np.round(c3, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_routes():
+    print("--- Testing Process Routes (mixed book vs one route at a time) ---")
+
+    book = pd.DataFrame({'gross_weight_kg': [1.0, 0.4, 2.0, 1.5], 'net_weight_kg': [0.7, 0.3, 1.6, 1.0],
+                         'route': ['sheet_parts', 'rod_turned', 'strip_stamped', None]})
+    inputs = resolve_inputs(book.drop(columns='route'), scrap_factor=0.9)
+    chain, default = evaluate_chain(inputs), evaluate_routes(inputs)
+    ok = all(np.array_equal(chain[k], default[k]) for k in chain)
+    print(f"  Default route vs chain: {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    mixed = calculate_chain_batch(book, scrap_factor=0.9)
+    single = [evaluate_routes(inputs, route=r or 'sheet_parts')['selling_price'][i] for i, r in enumerate(book['route'])]
+    ok = np.allclose(mixed['selling_price'], single, rtol=1e-12)
+    print(f"  Mixed book: {np.round(mixed['selling_price'].values, 4)} | One route at a time {np.round(single, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Rod: same formula as the sheet with the rod's yield / cost
+    rod = evaluate_routes(inputs, route='rod_turned')
+    expected = (chain['ingot_cost_per_kg'] + 18.0 - 0.10 * inputs['scrap_rate']) / 0.90
+    ok = np.allclose(rod['rod_cost_per_kg'], expected, rtol=1e-12) and np.isnan(rod['sheet_cost_per_kg']).all()
+    print(f"  Rod stage: {np.round(rod['rod_cost_per_kg'], 4)} | Expected {np.round(expected, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # P2 / P3 page scrap rate overrides: batch engines price what the dashboard pipeline shows
+    state = {'process_params': {'alloy_cu': 63.0, 'p2_scrap_rate': 500.0, 'p3_scrap_rate': 650.0}, 'scrap_factor': 0.9}
+    for route in ROUTES:
+        stages, _ = evaluate_pipeline(pipeline_inputs_from_session(state), route=route)
+        batch = calculate_chain_batch(pd.DataFrame({'route': [route]}), **chain_inputs_from_session(state))
+        ok = np.isclose(batch['selling_price'][0], stages['parts_fin']['selling_price'], rtol=1e-12)
+        print(f"  Scrap overrides, {route}: Batch {batch['selling_price'][0]:.4f} | Pipeline {stages['parts_fin']['selling_price']:.4f} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    print("--- Test Complete ---")
+
+def test_history():
+    print("--- Testing Rate History (daily re-costing vs chain at the rates in force) ---")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateHistory(tmp)
+        store.append('2025-03-01T09:00', cu_price=1000.0, zn_price=300.0, exp_power=500000.0, capacity_kg=50000.0)
+        store.append('2025-03-01T15:00', cu_price=1020.0)               # Intraday: the later price wins for the day
+        store.append('2025-03-03T10:00', zn_price=280.0)                # Cu carried forward
+        days, rates = store.daily('2025-02-28', '2025-03-04')
+        ok = (np.isnan(rates['cu_price'][0]) and list(rates['cu_price'][1:]) == [1020.0] * 4
+              and list(rates['zn_price'][1:]) == [300.0, 300.0, 280.0, 280.0])
+        print(f"  As of end of day: Cu {rates['cu_price']} | Zn {rates['zn_price']} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+        book = pd.DataFrame({'sku': ['A', 'B'], 'gross_weight_kg': [1.0, 0.4], 'cu_pct': [63.0, 100.0]})
+        daily = recost_history(book, '2025-02-28', '2025-03-04', store=store, cu_price=900.0)
+        cu = np.where(np.isnan(rates['cu_price']), 900.0, rates['cu_price'])
+        zn = np.where(np.isnan(rates['zn_price']), 300.0, rates['zn_price'])
+        elec = np.where(np.isnan(rates['exp_power']), 8.0, 10.0)
+        expected = np.column_stack([
+            calculate_chain_batch(gross_weight_kg=g, cu_pct=p, cu_price=cu, zn_price=zn, elec_cost=elec)['selling_price'].values
+            for g, p in zip(book['gross_weight_kg'], book['cu_pct'])
+        ])
+        ok = np.allclose(daily.values, expected, rtol=1e-12) and list(daily.columns) == ['A', 'B']
+        print(f"  Book x days: {daily.shape} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    print("--- Test Complete ---")
+
+def test_breaks():
+    print("--- Testing Price Breaks (setup amortized over the lot vs chain) ---")
+
+    book = pd.DataFrame({'sku': ['A', 'B', 'C'], 'gross_weight_kg': [1.0, 0.4, 0.2],
+                         'route': ['sheet_parts', 'rod_turned', 'strip_stamped']})
+    chain = calculate_chain_batch(book)
+    no_setup = price_breaks(book, [1, 1000], **{k: 0.0 for k in SETUP_DEFAULTS})
+    ok = np.allclose(no_setup.values, chain['selling_price_per_piece'].values[:, None], rtol=1e-12)
+    print(f"  No setup = chain price at every lot size: {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Melt 4000 + route stages + part setup, spread over the lot
+    lots = [100, 2500]
+    per_lot = {'A': 4000 + 1500 + 3000, 'B': 4000 + 2000 + 2500, 'C': 4000 + 1500 + 800 + 6000}
+    for (_, part), setup in zip(book.iterrows(), per_lot.values()):
+        table = price_breaks(quantities=lots, route=part['route'], gross_weight_kg=part['gross_weight_kg'])
+        ok = np.allclose(table['setup_cost_per_piece'].values, [setup / q for q in lots], rtol=1e-12)
+        ok &= np.allclose(table['cost_per_piece'] - table['setup_cost_per_piece'], table['run_cost_per_piece'], rtol=1e-12)
+        print(f"  {part['sku']} ({part['route']}): setup ₹{setup:,.0f}/lot -> {table['setup_cost_per_piece'].round(2).tolist()} ₹/pc"
+              f" | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    sheet = price_breaks(book, lots)
+    single = price_breaks(quantities=lots, route='rod_turned', gross_weight_kg=0.4)['selling_price_per_piece']
+    ok = np.allclose(sheet.loc['B'].values, single.values, rtol=1e-12) and sheet.shape == (3, 2)
+    print(f"  Sheet row = single part: {sheet.loc['B'].round(2).tolist()} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_capacity():
+    print("--- Testing Capacity Utilization (fixed / variable overheads vs chain) ---")
+
+    expenses = {'exp_power': 400000.0, 'exp_labor': 150000.0, 'exp_cons': 100000.0, 'exp_admin': 100000.0}
+    full = conversion_rates(expenses, 50000.0)
+    ok = full == {'elec_cost': 8.0, 'labor_cost': 3.0, 'consumable_cost': 2.0, 'overhead_cost': 2.0}
+    half = conversion_rates(expenses, 50000.0, 25000.0, {'exp_power': 50.0})
+    ok &= abs(half['elec_cost'] - (200000 / 25000 + 200000 / 50000)) < 1e-12
+    print(f"  Rates at capacity {full} | power 50% fixed at half volume {half['elec_cost']:.2f} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    book = pd.DataFrame({'route': ['sheet_parts', 'rod_turned'], 'gross_weight_kg': [1.0, 0.4]})
+    utilization = np.array([50.0, 80.0, 100.0])
+    result = utilization_sweep(book, [[1, 0], [1, 3]], utilization, expenses, 50000.0, 40000.0)
+    chain = calculate_chain_batch(book, **conversion_rates(expenses, 50000.0, 25000.0))
+    ok = np.allclose(result['product_cost'][0], chain['total_cost'].values, rtol=1e-12)
+    ok &= np.allclose(result['margin_pct'][1], CHAIN_DEFAULTS['margin_pct'], rtol=1e-12)   # Quoted at the planned 80%
+    ok &= np.all(np.diff(result['margin_pct'], axis=0) > 0)
+    mix = (chain['total_cost'].values * [0.25, 0.75]).sum()
+    ok &= np.isclose(result['cost_per_kg'][0, 1], mix, rtol=1e-12)
+    print(f"  Margin % by utilization {utilization}: {result['margin_pct'][:, 1].round(3)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Scheduled melt power replaces the budget's variable electricity in the quote and the sweep
+    scheduled = {'exp_power': 4.5}
+    result = utilization_sweep(book, [[1, 0]], utilization, expenses, 50000.0, 40000.0, variable=scheduled)
+    quoted = calculate_chain_batch(book, **conversion_rates(expenses, 50000.0, 40000.0, variable=scheduled))
+    swept = calculate_chain_batch(book, **conversion_rates(expenses, 50000.0, 25000.0, variable=scheduled))
+    ok = np.isclose(result['price_per_kg'][0, 0], quoted['selling_price'][0], rtol=1e-12)
+    ok &= np.allclose(result['product_cost'][0], swept['total_cost'].values, rtol=1e-12)
+    print(f"  Scheduled power: quoted {result['price_per_kg'][0, 0]:.4f} | Chain {quoted['selling_price'][0]:.4f} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_melt():
+    print("--- Testing Melt Schedule (cheapest power vs every feasible timing) ---")
+
+    # One furnace, 1 h slots, a day with a cheap night and a peak; three heats, one alloy change
+    furnaces = {'F1': {'capacity_kg': 1000.0, 'melt_rate_kg_h': 500.0, 'kwh_per_kg': 0.5, 'holding_kw': 20.0}}
+    tariff = [4.0] * 6 + [10.0] * 12 + [7.0] * 6
+    heats = pd.DataFrame({'furnace': ['F1'] * 3, 'alloy': ['A', 'B', 'A'], 'kg': [1000.0, 500.0, 1000.0], 'release_h': 6.0})
+    schedule, summary = schedule_heats(heats, tariff, furnaces, days=1, changeover_h=1.0, slot_minutes=60, start='2025-01-06')
+
+    # Sequence A, A, B (campaign): durations 2, 2, 1 h, changeover before B, nothing before 06:00
+    price = np.asarray(tariff)
+    best = np.inf
+    for s1 in range(6, 24):
+        for s2 in range(s1 + 2, 23):
+            for s3 in range(s2 + 3, 24):
+                melt = 250 * (price[s1:s1 + 2].sum() + price[s2:s2 + 2].sum()) + 250 * price[s3]
+                hold = 20 * (price[s1 + 2:s2].sum() + price[s2 + 2:s3].sum())
+                best = min(best, melt + hold)
+    ok = np.isclose(summary['power_cost'], best) and summary['changeovers'] == 1
+    ok &= list(schedule['alloy']) == ['A', 'A', 'B'] and summary['power_cost'] < summary['asap_cost']
+    print(f"  Power ₹{summary['power_cost']:.2f} (best ₹{best:.2f}), back to back ₹{summary['asap_cost']:.2f}"
+          f" | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    # Scheduled melting ₹/kg replaces the variable part of the power bill; holding stays in the fixed part
+    expenses = {'exp_power': 400000.0, 'exp_labor': 150000.0, 'exp_cons': 100000.0, 'exp_admin': 100000.0}
+    rates = conversion_rates(expenses, 50000.0, 50000.0, {'exp_power': 30.0}, variable={'exp_power': summary['melt_cost_per_kg']})
+    ok = np.isclose(rates['elec_cost'], 120000.0 / 50000.0 + (summary['power_cost'] - summary['holding_cost']) / 2500.0)
+    ok &= summary['holding_cost'] > 0
+    print(f"  Electricity rate with schedule: ₹{rates['elec_cost']:.2f}/kg | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+def test_inventory():
+    print("--- Testing Inventory Valuation (FIFO vs lot queue, moving average by hand) ---")
+
+    # FIFO against a plain queue of lots over random receipts and issues
+    rng = np.random.default_rng(1)
+    kg = np.where(rng.random(500) < 0.2, rng.uniform(100.0, 1000.0, 500), -rng.uniform(10.0, 120.0, 500))
+    kg[0] = 5000.0
+    price = rng.uniform(900.0, 1100.0, 500)
+    lots, expected = [], []
+    for q, p in zip(kg, price):
+        if q > 0:
+            lots.append([q, p])
+            expected.append(0.0)
+            continue
+        need, cost = -q, 0.0
+        while need > 1e-12:
+            take = min(need, lots[0][0])
+            cost += take * lots[0][1]
+            lots[0][0] -= take
+            need -= take
+            if lots[0][0] <= 1e-12:
+                lots.pop(0)
+        expected.append(cost)
+    issue_cost, on_hand, value = value_fifo(kg, price)
+    ok = np.allclose(issue_cost, expected, rtol=1e-9) and np.isclose(value[-1], sum(q * p for q, p in lots))
+    print(f"  FIFO: issue cost total ₹{issue_cost.sum():,.2f} (queue ₹{sum(expected):,.2f}) | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = InventoryLedger(tmp)
+        ledger.receive('2025-03-01', 'Cu', 1000.0, 900.0)
+        ledger.receive('2025-03-02', 'Cu', 1000.0, 1000.0)
+        ledger.issue('2025-03-10', 'Cu', 1500.0)
+        ledger.receive('2025-04-01', 'Cu', 500.0, 1200.0)
+        ledger.issue('2025-04-05', 'Cu', 600.0)
+
+        # March issue: 1000 @ 900 + 500 @ 1000; April issue: 500 @ 1000 + 100 @ 1200
+        fifo = ledger.book_prices('fifo', '2025-03-01', '2025-03-31')['Cu'], ledger.book_prices('fifo', '2025-04-01', '2025-04-30')['Cu']
+        # Average 950 for March; April receipt: (500 x 950 + 500 x 1200) / 1000 = 1075
+        average = ledger.book_prices('moving_average', '2025-03-01', '2025-03-31')['Cu'], ledger.book_prices('moving_average', '2025-04-01', '2025-04-30')['Cu']
+        ok = np.allclose(fifo, [1400000 / 1500, 620000 / 600]) and np.allclose(average, [950.0, 1075.0])
+        closing = ledger.valuation('fifo')
+        ok &= np.isclose(closing.loc['Cu', 'closing_kg'], 400.0) and np.isclose(closing.loc['Cu', 'closing_value'], 400 * 1200.0)
+        print(f"  Book Cu ₹/kg Mar, Apr: FIFO {np.round(fifo, 2)} | Moving average {np.round(average, 2)} | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+        try:
+            ledger.issue('2025-04-06', 'Cu', 500.0)
+            ok = False
+        except ValueError:
+            ok = len(ledger) == 5
+        print(f"  Issue beyond stock refused | {'OK' if ok else 'MISMATCH'}")
+        assert ok
+
+    print("--- Test Complete ---")
+
+def test_service():
+    print("--- Testing Costing Service (HTTP quotes vs chain) ---")
+
+    async def post(port, body):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        data = json.dumps(body).encode()
+        writer.write(f"POST /quote HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(payload, parse_constant=lambda c: c)   # Infinity / NaN stay text
+
+    async def raw(port, request):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        response = await reader.read()
+        writer.close()
+        return int(response.split()[1]) if response else None
+
+    async def run():
+        service = CostService(max_wait_ms=5.0)
+        port = await service.start('127.0.0.1', 0)
+        quotes = [{'id': i, 'gross_weight_kg': g} for i, g in enumerate([0.5, 1.0, 2.0])] + [{'id': 3, 'alloy_grade': 'CW614N', 'route': 'rod_turned'}]
+        single = await asyncio.gather(*(post(port, q) for q in quotes))
+        batches = service.batcher.batches
+        many = await post(port, {'quotes': quotes})
+        bad = await post(port, {'cu_price': 'high'})
+        impossible = [await post(port, q) for q in ({'sheet_yield_pct': 0}, {'net_weight_kg': 2.0}, {'sn_pct': 2.0})]
+        overflow = await post(port, {'cu_price': 1e308})
+        bad_length = await raw(port, b"POST /quote HTTP/1.1\r\nContent-Length: ten\r\n\r\n{}")
+        await service.close()
+        return single, many, bad, impossible, overflow, bad_length, batches
+
+    single, many, bad, impossible, overflow, bad_length, batches = asyncio.run(run())
+    expected = calculate_chain_batch(pd.DataFrame({'gross_weight_kg': [0.5, 1.0, 2.0]}))['selling_price'].values
+    got = [body['selling_price'] for _, body in single[:3]]
+    ok = np.allclose(got, expected, rtol=1e-12) and [q['selling_price'] for q in many[1]['quotes']] == [b['selling_price'] for _, b in single]
+    print(f"  4 concurrent quotes in {batches} batch(es): {np.round(got, 4)} | Chain {np.round(expected, 4)} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+    ok = bad[0] == 400 and 'cu_price' in bad[1]['error']
+    print(f"  Bad input: {bad[0]} {bad[1]['error']} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+    ok = all(status == 400 for status, _ in impossible)
+    print(f"  Impossible inputs (0% yield, net > gross, Sn on Cu 100): {[s for s, _ in impossible]} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+    ok = overflow[0] == 200 and overflow[1]['selling_price'] is None and bad_length == 400
+    print(f"  Overflowing input: {overflow[0]} selling_price {overflow[1]['selling_price']} | Bad Content-Length: {bad_length} | {'OK' if ok else 'MISMATCH'}")
+    assert ok
+
+    print("--- Test Complete ---")
+
+if __name__ == "__main__":
+    test_batch()
+    test_bulk()
+    test_catalog()
+    test_gradients()
+    test_reverse()
+    test_alloys()
+    test_charge()
+    test_recirculation()
+    test_routes()
+    test_history()
+    test_breaks()
+    test_capacity()
+    test_melt()
+    test_inventory()
+    test_service()
@@ -0,0 +1,26 @@
+import streamlit as st
+from utils import timing
+
+def render_timing_panel():
+    st.markdown("---")
+    st.markdown("## ⏱️ Rerun Timings (Admin)")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**This Rerun**")
+        st.markdown("| Section | ms |\n|---|---|\n" + "\n".join(
+            f"| {section} | {seconds * 1000:.2f} |" for section, seconds in timing.current_rerun()
+        ))
+
+    with col2:
+        st.markdown(f"**All Sessions (last {timing.RING_SIZE} samples per section)**")
+        stats = timing.summary()
+        st.markdown("| Section | Count | p50 ms | p99 ms |\n|---|---|---|---|\n" + "\n".join(
+            f"| {section} | {s['count']} | {s['p50'] * 1000:.2f} | {s['p99'] * 1000:.2f} |" for section, s in stats.items()
+        ))
+
+    d1, d2, d3 = st.columns(3)
+    d1.download_button("⬇️ Prometheus", timing.prometheus_text(), file_name="costapp_metrics.prom", mime="text/plain")
+    d2.download_button("⬇️ JSONL", timing.jsonl(), file_name="costapp_timings.jsonl", mime="application/x-ndjson")
+    if d3.button("🗑️ Reset"):
+        timing.reset()
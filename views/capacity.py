@@ -0,0 +1,76 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from utils.batch import chain_inputs_from_session
+from utils.capacity import EXPENSE_LABELS, EXPENSE_RATES, break_even_utilization, capacity_from_session, utilization_sweep
+from utils.routes import ROUTES
+
+def render_capacity_view():
+    st.markdown("## 🏭 Capacity Planning")
+    st.caption("Cost and margin over plant utilization for different product mixes. Products are quoted at the "
+               "sidebar's planned volume; fixed expenses are then spread over each utilization level.")
+
+    expenses, capacity_kg, volume_kg, fixed_pct, variable = capacity_from_session(st.session_state)
+    if capacity_kg <= 0 or volume_kg <= 0 or not expenses:
+        st.warning("Set the installed capacity, planned volume and monthly expenses in the sidebar.")
+        return
+
+    # 1. Where the monthly budget goes
+    st.markdown("### 1. Fixed vs Variable Expenses")
+    split = pd.DataFrame({
+        "Expense": [EXPENSE_LABELS[k] for k in EXPENSE_RATES],
+        "Monthly ₹": [expenses[k] for k in EXPENSE_RATES],
+        "Fixed %": [fixed_pct[k] for k in EXPENSE_RATES],
+        "Fixed ₹": [expenses[k] * fixed_pct[k] / 100 for k in EXPENSE_RATES],
+        "Variable ₹/kg": [variable[k] if k in variable else expenses[k] * (1 - fixed_pct[k] / 100) / capacity_kg
+                          for k in EXPENSE_RATES],
+    })
+    st.dataframe(split.style.format({"Monthly ₹": "{:,.0f}", "Fixed %": "{:.0f}", "Fixed ₹": "{:,.0f}", "Variable ₹/kg": "{:.2f}"}),
+                 hide_index=True)
+    st.caption(f"Installed {capacity_kg:,.0f} kg/mo · planned {volume_kg:,.0f} kg/mo "
+               f"({volume_kg / capacity_kg * 100:.0f}% utilization)"
+               + (" · variable electricity from the P1 melt schedule" if variable else ""))
+
+    # 2. Product mixes: share of finished kg on each route (the current part specs)
+    st.markdown("### 2. Product Mixes")
+    routes = list(ROUTES)
+    default_mixes = pd.DataFrame(
+        [[100.0 if r == route else 0.0 for r in routes] for route in routes] + [[100.0 / len(routes)] * len(routes)],
+        index=[ROUTES[r]['part']['label'] + " only" for r in routes] + ["Even split"],
+        columns=[ROUTES[r]['part']['label'] for r in routes],
+    )
+    mixes = st.data_editor(default_mixes, num_rows="dynamic", key='capacity_mixes')
+    mixes = mixes.fillna(0.0)
+    mixes = mixes[mixes.sum(axis=1) > 0]
+    if mixes.empty:
+        st.warning("Give at least one mix a share above 0.")
+        return
+
+    lo, hi = st.slider("Utilization Range (%)", 10, 150, (30, 120), 5)
+    utilization = np.linspace(lo, hi, (hi - lo) * 2 + 1)
+    result = utilization_sweep(
+        pd.DataFrame({'route': routes}), mixes.to_numpy(), utilization,
+        expenses, capacity_kg, volume_kg, fixed_pct, variable, **chain_inputs_from_session(st.session_state)
+    )
+    names = [str(name) for name in mixes.index]
+
+    # 3. Margin and profit curves
+    st.markdown("### 3. Margin vs Utilization")
+    st.line_chart(pd.DataFrame(result['margin_pct'], index=pd.Index(utilization, name="Utilization %"), columns=names))
+    st.caption("Margin on cost (%) at the prices quoted for the planned volume.")
+    st.markdown("**Profit per Month (₹)**")
+    st.line_chart(pd.DataFrame(result['profit'], index=pd.Index(utilization, name="Utilization %"), columns=names))
+
+    break_even = break_even_utilization(utilization, result['margin_pct'])
+    at_plan = int(np.abs(utilization - volume_kg / capacity_kg * 100).argmin())
+    st.dataframe(pd.DataFrame({
+        "Mix": names,
+        "Price ₹/kg": result['price_per_kg'][0],
+        f"Cost ₹/kg @ {utilization[0]:.0f}%": result['cost_per_kg'][0],
+        f"Cost ₹/kg @ {utilization[at_plan]:.0f}%": result['cost_per_kg'][at_plan],
+        f"Cost ₹/kg @ {utilization[-1]:.0f}%": result['cost_per_kg'][-1],
+        f"Finished kg @ {utilization[at_plan]:.0f}%": result['finished_kg'][at_plan],
+        "Break-even Utilization": [
+            "never" if np.isnan(b) else (f"≤ {b:.0f}%" if b == utilization[0] else f"{b:.1f}%") for b in break_even
+        ],
+    }).style.format(precision=2, thousands=","), hide_index=True)
@@ -0,0 +1,221 @@
+import streamlit as st
+from utils import timing
+from utils.pipeline import evaluate_pipeline, pipeline_inputs_from_session, pipeline_stage_names
+from utils.alloys import GRADES, alloy_from_session, element_prices_from_session, element_loss_from_session
+from utils.routes import DEFAULT_ROUTE, ROUTES, stage_params, route_from_session
+
+# The dashboard body is a fragment: editing its inputs reruns only this function, not the
+# sidebar. Sidebar values are read back from session state. A composition change reruns
+# the whole app, since the sidebar prices the auto scrap rate for the alloy.
+@st.fragment
+def render_dashboard_view():
+    scrap_factor = st.session_state.scrap_factor
+    margin_pct = st.session_state.financial_targets['margin_pct']
+    composition = alloy_from_session(st.session_state).composition_pct()
+
+    st.title("🏭 Shanghai Metals Cost Analysis")
+    st.markdown("### 1. Product Composition")
+    
+    col_in1, col_in2, col_in3 = st.columns(3)
+    with col_in1:
+        st.markdown("**Alloy Mix**")
+        grades = [None] + list(GRADES)
+        grade = st.selectbox("Alloy Grade", grades, index=grades.index(st.session_state.process_params.get('alloy_grade')),
+                             format_func=lambda g: g or "Custom (Cu/Zn)")
+        st.session_state.process_params['alloy_grade'] = grade
+
+        if grade is None:
+            # Get default
+            def_cu = st.session_state.process_params.get('alloy_cu', 63.0)
+            cu_pct = st.number_input("Copper %", value=def_cu, step=0.5, min_value=0.0, max_value=100.0)
+            st.session_state.process_params['alloy_cu'] = cu_pct
+            
+            zn_pct = 100.0 - cu_pct
+            st.caption(f"Zinc Balance: {zn_pct:.1f}%")
+            st.session_state.process_params['alloy_zn'] = zn_pct
+        else:
+            st.caption(" · ".join(f"{e} {pct:g}%" for e, pct in GRADES[grade].items()))
+    if alloy_from_session(st.session_state).composition_pct() != composition:
+        st.rerun()      # App scope: indicative_scrap_rate and the sidebar's Auto Scrap Rate follow the alloy
+        
+    with col_in2:
+        st.markdown("**Process Efficiency**")
+        routes = list(ROUTES)
+        route = st.selectbox("Process Route", routes, index=routes.index(route_from_session(st.session_state)),
+                             format_func=lambda r: ROUTES[r]['label'])
+        st.session_state.process_params['route'] = None if route == DEFAULT_ROUTE else route
+        
+        # P1 Loss
+        element_loss = element_loss_from_session(st.session_state)
+        if element_loss is not None:
+            burn_loss = round(alloy_from_session(st.session_state).melt_loss_pct(element_loss), 2)
+            st.caption(f"P1: Burning Loss {burn_loss}% (per element, set on the P1: Ingot page)")
+        else:
+            burn_loss = st.number_input("P1: Burning Loss %", value=st.session_state.process_params.get('burning_loss', 1.5), step=0.1)
+            st.session_state.process_params['burning_loss'] = burn_loss
+        
+        # P2 Yield, per stage of the route
+        stage_yields = {}
+        for stage in ROUTES[route]['stages']:
+            yield_param = stage_params(stage)[0]
+            def_yield = st.session_state.process_params.get(yield_param, stage['yield_pct'])
+            stage_yields[stage['name']] = st.number_input(f"P2: {stage['label']} Yield %", value=def_yield, step=1.0)
+            st.session_state.process_params[yield_param] = stage_yields[stage['name']]
+        
+        # P3 Yield
+        # Initialize if missing (default 65% based on 1.0/0.65 request)
+        if 'p3_yield_pct' not in st.session_state.process_params:
+            st.session_state.process_params['p3_yield_pct'] = 65.0
+            
+        def_parts_yield = st.session_state.process_params.get('p3_yield_pct', 65.0)
+        parts_yield = st.number_input("P3: Parts Yield %", value=def_parts_yield, step=1.0)
+        st.session_state.process_params['p3_yield_pct'] = parts_yield
+        
+    with col_in3:
+        st.markdown("**Scrap Recovery**")
+        # Auto Calculate Scrap specific to this alloy
+        weighted_metal_cost = alloy_from_session(st.session_state).metal_value(element_prices_from_session(st.session_state, book=False))
+        auto_scrap_rate = weighted_metal_cost * scrap_factor
+        
+        st.metric("Auto Scrap Rate (₹/kg)", f"₹{auto_scrap_rate:.2f}", delta="Linked to Sidebar")
+
+
+    # --- CALCULATIONS ---
+    # Ingot -> route stages -> Parts -> Financials come from the shared pipeline: stages are
+    # memoized on their inputs (across sessions), so only what changed is recomputed
+    # (e.g. margin => financials only) and the process views reuse the same results.
+    stages, recomputed = evaluate_pipeline(pipeline_inputs_from_session(st.session_state), route=route)
+    parts_res, fin_res = stages['parts'], stages['parts_fin']
+
+    # Use Effective Cost per Kg Finished as key metric
+    p3_final_cost_per_kg = parts_res['effective_cost_per_kg_finished']
+
+    # Use Parts Cost for Final Selling Price
+    final_base_cost = p3_final_cost_per_kg
+
+    # --- DISPLAY ---
+    timing.start('render.cards')
+    
+    st.markdown("### 2. Stage-wise Cost (Per Kg)")
+    
+    # One card per stage of the route: ingot, yield stages, parts
+    cards = [('Ingot', stages['ingot']['final_cost_per_kg'], f"Loss: {burn_loss}%", stages['ingot_fin'])]
+    for stage in ROUTES[route]['stages']:
+        name = stage['name']
+        cards.append((stage['label'], stages[name]['final_cost_per_kg'], f"Yield: {stage_yields[name]}%", stages[f'{name}_fin']))
+    cards.append(('Parts', p3_final_cost_per_kg, f"Yield: {parts_yield}%", fin_res))
+
+    columns = st.columns(len(cards) + 1)
+    for i, (col, (label, cost, note, fin)) in enumerate(zip(columns, cards), start=1):
+        with col:
+            st.markdown(f"""
+        <div class="card">
+            <div class="card-header">{i}. {label} Cost</div>
+            <div class="metric-value">₹{cost:.2f}</div>
+            <div class="metric-label">{note}</div>
+            <div style="border-top: 1px solid #eee; margin-top: 5px; padding-top: 5px;">
+                <div style="font-size: 0.8em; color: #666;">+ Interest: ₹{fin['interest_cost']:.2f}</div>
+                <div style="font-size: 0.9em; color: #666;">Selling Price</div>
+                <div style="font-weight: bold; color: #2ecc71;">₹{fin['selling_price']:.2f}</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+    with columns[-1]:
+        st.markdown(f"""
+        <div class="card" style="border: 2px solid #2980b9;">
+            <div class="card-header" style="color: #2980b9;">Selling Price</div>
+            <div class="metric-value">₹{fin_res['selling_price']:.2f}</div>
+            <div class="metric-label">Margin: {margin_pct}%</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    timing.stop('render.cards')
+
+    # Cost Breakdown
+    st.markdown("### 3. Financial Breakdown")
+    
+    # Markdown table: avoids loading pandas just for four rows
+    st.markdown(f"""
+| Component | Value (₹/kg) |
+|---|---|
+| Net Mfg Cost (Parts) | ₹{final_base_cost:.2f} |
+| + Interest Cost | ₹{fin_res['interest_cost']:.2f} |
+| + Profit Margin | ₹{fin_res['profit_margin']:.2f} |
+| = Final Selling Price | **₹{fin_res['selling_price']:.2f}** |
+""")
+
+    render_recirculation(route)
+    render_cost_history(route)
+
+    with st.expander("🔍 Recompute Log (Debug)"):
+        for node in pipeline_stage_names(route):
+            st.caption(f"{'🔄 recomputed' if node in recomputed else '✅ cached'} — {node}")
+
+
+def render_recirculation(route):
+    """ Closed-loop mode: P2/P3 scrap remelted in P1 instead of sold (steady state) """
+    st.markdown("### 4. Scrap Recirculation")
+    if not st.toggle("Closed loop: return P2/P3 scrap to the P1 melt", key='dash_recirculation'):
+        return
+    from utils.recirculation import RETURN_DEFAULTS, recirculation_from_session
+
+    params = st.session_state.process_params
+    r1, r2 = st.columns(2)
+    params['p2_return_pct'] = r1.number_input("P2 Scrap Returned %", value=params.get('p2_return_pct', RETURN_DEFAULTS['p2_return_pct']),
+                                              step=5.0, min_value=0.0, max_value=100.0)
+    params['p3_return_pct'] = r2.number_input("P3 Scrap Returned %", value=params.get('p3_return_pct', RETURN_DEFAULTS['p3_return_pct']),
+                                              step=5.0, min_value=0.0, max_value=100.0)
+    closed, open_loop = recirculation_from_session(st.session_state)
+
+    rows = [('Ingot', 'ingot_cost_per_kg')]
+    rows += [(stage['label'], f"{stage['name']}_cost_per_kg") for stage in ROUTES[route]['stages']]
+    rows.append(('Parts', 'part_cost_per_kg'))
+    table = "".join(f"| {label} | ₹{open_loop[key]:.2f} | ₹{closed[key]:.2f} | {closed[key] - open_loop[key]:+.2f} |\n"
+                    for label, key in rows)
+    st.markdown(f"""
+| Stage (₹/kg) | Scrap Sold | Closed Loop | Change |
+|---|---|---|---|
+{table}| Selling Price | ₹{open_loop['selling_price']:.2f} | **₹{closed['selling_price']:.2f}** | {closed['selling_price'] - open_loop['selling_price']:+.2f} |
+""")
+    st.markdown(f"""
+**Steady-state mass balance (kg per kg of finished parts)**
+
+| Charge | Virgin Metal | Returned Scrap | Sold Scrap | Melt Loss |
+|---|---|---|---|---|
+| {closed['charge_kg']:.3f} | {closed['virgin_metal_kg']:.3f} | {closed['returned_scrap_kg']:.3f} | {closed['sold_scrap_kg']:.3f} | {closed['melt_loss_kg']:.3f} |
+""")
+    st.caption("Returned scrap is remelted at the cost it has built up, so it only pays off when it sells below "
+               "its metal value (Scrap Recov % under 100).")
+
+
+def render_cost_history(route):
+    """ What the dashboard part cost on each day of a date range, at the rates recorded then """
+    st.markdown("### 5. Cost History")
+    if not st.toggle("Re-cost this part over past rates", key='dash_history'):
+        return
+    import numpy as np
+    from utils.batch import chain_inputs_from_session
+    from utils.history import shared_history, recost_history
+
+    store = shared_history()
+    span = store.span()
+    if span is None:
+        st.info("No rates recorded yet. Use 💾 Record Today's Rates in the sidebar, or import past rates "
+                "with python rate_history.py import rates.csv.")
+        return
+    today = np.datetime64('today', 'D')
+    h1, h2 = st.columns(2)
+    start = h1.date_input("From", value=(today - 365).item(), key='dash_history_from')
+    end = h2.date_input("To", value=today.item(), key='dash_history_to')
+    if start > end:
+        st.warning("'From' is after 'To'.")
+        return
+
+    history = recost_history(None, start, end, route=route, store=store, **chain_inputs_from_session(st.session_state))
+    st.line_chart(history[['ingot_cost_per_kg', 'part_cost_per_kg', 'selling_price']].rename(columns={
+        'ingot_cost_per_kg': "Ingot ₹/kg", 'part_cost_per_kg': "Parts ₹/kg", 'selling_price': "Selling Price ₹/kg"}))
+    first, last = (np.datetime_as_string(t, unit='D') for t in span)
+    st.caption(f"{len(store):,} rate records ({first} to {last}); each day uses the last rates recorded by its end. "
+               "Days before the first record use the sidebar values.")
+
@@ -1,5 +1,9 @@
 import streamlit as st
-from utils.calculations import CostCalculator
+from utils.pipeline import evaluate_pipeline, pipeline_inputs_from_session
+from utils.alloys import (
+    GRADES, ELEMENT_NAMES, DEFAULT_ELEMENT_PRICES, DEFAULT_ELEMENT_LOSS,
+    alloy_from_session, element_prices_from_session, element_loss_from_session,
+)
 
 def render_ingot_view():
     st.markdown("## 🏗️ Process 1: Ingot Casting")
@@ -20,20 +24,46 @@ def render_ingot_view():
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Alloy Mix")
-        alloy_cu = st.session_state.process_params['alloy_cu']
-        
-        # Interactive Inputs
-        new_cu = st.number_input("Copper %", value=alloy_cu, step=0.5, min_value=0.0, max_value=100.0)
-        new_zn = 100.0 - new_cu
-        st.caption(f"Zinc Balance: {new_zn:.1f}%")
-        
-        # Update State
-        st.session_state.process_params['alloy_cu'] = new_cu
-        st.session_state.process_params['alloy_zn'] = new_zn
+        grades = [None] + list(GRADES)
+        grade = st.selectbox("Alloy Grade", grades, index=grades.index(st.session_state.process_params.get('alloy_grade')),
+                             format_func=lambda g: g or "Custom (Cu/Zn)")
+        st.session_state.process_params['alloy_grade'] = grade
+
+        if grade is None:
+            alloy_cu = st.session_state.process_params['alloy_cu']
+            
+            # Interactive Inputs
+            new_cu = st.number_input("Copper %", value=alloy_cu, step=0.5, min_value=0.0, max_value=100.0)
+            new_zn = 100.0 - new_cu
+            st.caption(f"Zinc Balance: {new_zn:.1f}%")
+            
+            # Update State
+            st.session_state.process_params['alloy_cu'] = new_cu
+            st.session_state.process_params['alloy_zn'] = new_zn
+        alloy = alloy_from_session(st.session_state)
+        if grade is not None:
+            st.caption(" · ".join(f"{ELEMENT_NAMES[e]} {pct:g}%" for e, pct in alloy.elements().items()))
+
+        # Prices of the alloying elements other than Cu / Zn (sidebar rates)
+        others = [e for e in alloy.elements() if e not in ('Cu', 'Zn')]
+        if others:
+            prices = st.session_state.setdefault('element_prices', {})
+            for e in others:
+                prices[e] = st.number_input(f"{ELEMENT_NAMES[e]} Price (₹/kg)", value=prices.get(e, DEFAULT_ELEMENT_PRICES[e]), step=1.0)
         
         st.subheader("Process Efficiency")
-        burning_loss = st.number_input("Burning Loss %", value=st.session_state.process_params['burning_loss'], step=0.1)
-        st.session_state.process_params['burning_loss'] = burning_loss
+        per_element = st.toggle("Per-element burning loss", value=st.session_state.process_params.get('per_element_loss', False),
+                                help="Zinc and phosphorus burn off far faster than copper: lose each element at its own rate.")
+        st.session_state.process_params['per_element_loss'] = per_element
+        if per_element:
+            losses = st.session_state.setdefault('element_loss', {})
+            for e in alloy.elements():
+                losses[e] = st.number_input(f"{ELEMENT_NAMES[e]} Loss %", value=losses.get(e, DEFAULT_ELEMENT_LOSS[e]), step=0.1)
+            burning_loss = alloy.melt_loss_pct(element_loss_from_session(st.session_state))
+            st.caption(f"Effective Burning Loss: {burning_loss:.2f}% of charge")
+        else:
+            burning_loss = st.number_input("Burning Loss %", value=st.session_state.process_params['burning_loss'], step=0.1)
+            st.session_state.process_params['burning_loss'] = burning_loss
 
     with col2:
         st.subheader("Conversion Costs (₹/kg)")
@@ -53,29 +83,12 @@ def render_ingot_view():
         
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # 2. Calculation
-    rates = st.session_state.rm_rates
-    result = CostCalculator.calculate_ingot_cost(
-        cu_price=rates['cu'],
-        zn_price=rates['zn'],
-        cu_pct=new_cu,
-        zn_pct=new_zn,
-        burning_loss_pct=burning_loss,
-        elec_cost=elec,
-        labor_cost=labor,
-        consumable_cost=cons,
-        overhead_cost=over
-    )
-
-    # Financials
-    st.markdown("### 💰 Pricing")
-    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p1_margin')
-    
-    selling_price = result['final_cost_per_kg'] * (1 + margin_pct/100)
-    
-    # Store Result globally for next stages
-    st.session_state.calculated_costs = st.session_state.get('calculated_costs', {})
-    st.session_state.calculated_costs['ingot_per_kg'] = result['final_cost_per_kg']
+    # 2. Calculation (shared pipeline, with this page's conversion costs)
+    stages, _ = evaluate_pipeline(pipeline_inputs_from_session(
+        st.session_state,
+        rate_elec=elec, rate_labor=labor, rate_cons=cons, rate_admin=over
+    ))
+    result = stages['ingot']
 
     # 3. Results Display
     st.markdown("### 📊 Cost Analysis")
@@ -109,6 +122,21 @@ def render_ingot_view():
         </div>
         """, unsafe_allow_html=True)
         
+    render_ingot_pricing(result['final_cost_per_kg'])
+    render_grade_library(dict(elec_cost=elec, labor_cost=labor, consumable_cost=cons, overhead_cost=over))
+    render_charge_optimizer(total_conv)
+    render_melt_schedule()
+    render_metal_inventory()
+
+
+# Fragment: editing the margin reruns only the pricing section
+@st.fragment
+def render_ingot_pricing(final_cost_per_kg):
+    st.markdown("### 💰 Pricing")
+    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p1_margin')
+    
+    selling_price = final_cost_per_kg * (1 + margin_pct/100)
+    
     st.markdown(f"""
     <div class="card" style="border: 1px solid #FFD700; margin-top: 10px;">
         <div class="card-header" style="color: #FFD700;">Selling Price (Ingot)</div>
@@ -116,3 +144,202 @@ def render_ingot_view():
         <div class="metric-label">Per Kg @ {margin_pct}% Margin</div>
     </div>
     """, unsafe_allow_html=True)
+
+
+# Every grade costed at once under a band of copper prices (one vectorized pass)
+@st.fragment
+def render_grade_library(conversion):
+    st.markdown("### 📚 Grade Library")
+    if not st.toggle("Compare all grades", key='p1_grade_library'):
+        return
+    import numpy as np
+    import pandas as pd
+    from utils.alloys import grade_costs
+
+    prices = element_prices_from_session(st.session_state)
+    steps = np.array([-10.0, -5.0, 0.0, 5.0, 10.0])
+    scenarios = {**prices, 'Cu': prices['Cu'] * (1 + steps / 100)}
+    result = grade_costs(
+        element_prices=scenarios,
+        burning_loss_pct=st.session_state.process_params['burning_loss'],
+        element_loss_pct=element_loss_from_session(st.session_state),
+        **conversion,
+    )
+    table = pd.DataFrame(result['final_cost_per_kg'].T, index=list(GRADES),
+                         columns=[f"Cu ₹{p:,.0f}" for p in scenarios['Cu']])
+    table.index.name = "Grade"
+    st.caption("Ingot cost (₹/kg output) per grade, with the copper price moved ±10% around the sidebar rate.")
+    st.dataframe(table.style.format("₹{:.2f}"), width="stretch")
+
+
+# Least-cost furnace charge from virgin metal, own return scrap and bought-in scrap
+@st.fragment
+def render_charge_optimizer(conversion_cost):
+    st.markdown("### 🔥 Charge Mix Optimizer")
+    if not st.toggle("Optimize the furnace charge", key='p1_charge_mix'):
+        return
+    import numpy as np
+    import pandas as pd
+    from utils.charge import DEFAULT_TOLERANCE_PCT, charge_materials_from_session, composition_band, optimize_charge_from_session
+
+    c1, c2 = st.columns(2)
+    heat_kg = c1.number_input("Heat Size (kg melt)", value=1000.0, step=100.0, min_value=1.0, key='p1_heat_kg')
+    tolerance = c2.number_input("Composition Tolerance (± %)", value=DEFAULT_TOLERANCE_PCT, step=0.1, min_value=0.0, key='p1_charge_tol')
+
+    materials = charge_materials_from_session(st.session_state, heat_kg)
+    stock = st.data_editor(pd.DataFrame({
+        'Material': [m.name for m in materials],
+        'Composition': [" · ".join(f"{e} {pct:g}%" for e, pct in m.alloy.elements().items()) for m in materials],
+        'Price (₹/kg)': [m.price for m in materials],
+        'In Stock (kg)': [m.available_kg for m in materials],
+    }), disabled=['Material', 'Composition'], hide_index=True, width="stretch", key='p1_charge_stock')
+    st.caption("Virgin metal is unlimited (inf). Own P2/P3 scrap is what one heat returns through rolling and machining, at the auto scrap rate.")
+
+    # Two heats in one batch: the current stock, and virgin metal only for comparison
+    available = stock['In Stock (kg)'].to_numpy(dtype=float)
+    virgin = np.array([m.name.endswith("(virgin)") for m in materials])
+    result = optimize_charge_from_session(
+        st.session_state, heat_kg, materials,
+        prices=stock['Price (₹/kg)'].to_numpy(dtype=float),
+        available=np.stack([available, np.where(virgin, np.inf, 0.0)]),
+        tolerance_pct=tolerance, conversion_cost=conversion_cost,
+    )
+    if result['status'][0] != 'optimal':
+        st.error("The stock cannot meet the target composition: add virgin metal or widen the tolerance.")
+        return
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Optimized Cost (₹/kg melt)", f"₹{result['cost_per_kg_melt'][0]:.2f}",
+              f"{result['cost_per_kg_melt'][0] - result['cost_per_kg_melt'][1]:+.2f} vs virgin only", delta_color="inverse")
+    m2.metric("Charge Weight", f"{result['total_charge_kg'][0]:,.1f} kg")
+    m3.metric("Effective Burning Loss", f"{result['burning_loss_pct'][0]:.2f}%")
+
+    charge = result['charge_kg'][0]
+    used = charge > 1e-6
+    st.dataframe(pd.DataFrame({
+        'Material': [m.name for m, u in zip(materials, used) if u],
+        'Charge (kg)': charge[used],
+        'Share %': charge[used] / charge.sum() * 100,
+    }).style.format({'Charge (kg)': "{:,.1f}", 'Share %': "{:.1f}%"}), hide_index=True, width="stretch")
+
+    from utils.alloys import ELEMENTS, alloy_from_session
+    target = alloy_from_session(st.session_state)
+    lo, hi = composition_band(target, tolerance)
+    shown = [i for i, e in enumerate(ELEMENTS) if target.pct[i] or result['melt_composition'][0][i] > 1e-6]
+    st.dataframe(pd.DataFrame({
+        'Element': [ELEMENTS[i] for i in shown],
+        'Target %': [target.pct[i] for i in shown],
+        'Allowed %': [f"{lo[i]:.2f} - {hi[i]:.2f}" for i in shown],
+        'Melt %': [result['melt_composition'][0][i] for i in shown],
+    }).style.format({'Target %': "{:.2f}", 'Melt %': "{:.3f}"}), hide_index=True, width="stretch")
+
+
+# Fragment: editing heats / tariff reruns only the scheduler; using its power cost reruns the app
+@st.fragment
+def render_melt_schedule():
+    st.markdown("### ⏱️ Melt Schedule (Time-of-Day Power)")
+    if not st.toggle("Schedule heats against the power tariff", key='p1_melt_schedule'):
+        return
+    import pandas as pd
+    from utils.melt import CHANGEOVER_H, DEFAULT_FURNACES, DEFAULT_TARIFF, example_week, schedule_heats
+
+    with st.expander("Furnaces and Tariff"):
+        furnaces = st.data_editor(pd.DataFrame(DEFAULT_FURNACES).T.rename_axis('Furnace').rename(columns={
+            'capacity_kg': 'Capacity (kg)', 'melt_rate_kg_h': 'Melt Rate (kg/h)', 'kwh_per_kg': 'kWh/kg', 'holding_kw': 'Holding (kW)'
+        }), key='p1_furnaces')
+        tariff = st.data_editor(pd.DataFrame({'Hour': range(24), '₹/kWh': DEFAULT_TARIFF}), hide_index=True,
+                                disabled=['Hour'], key='p1_tariff')
+        changeover_h = st.number_input("Alloy Changeover (h)", value=CHANGEOVER_H, step=0.25, min_value=0.0, key='p1_changeover')
+
+    upload = st.file_uploader("Heats (CSV: furnace, alloy, kg, optional heat, day, release_h, due_h)", type=['csv'], key='p1_heats_upload')
+    heats = pd.read_csv(upload) if upload is not None else example_week()
+    if upload is None:
+        st.caption(f"Example week: {len(heats)} heats. Upload a CSV to schedule your own; 'day' (0 = first day) is the day a heat must be melted in.")
+
+    specs = {name: {'capacity_kg': row['Capacity (kg)'], 'melt_rate_kg_h': row['Melt Rate (kg/h)'],
+                    'kwh_per_kg': row['kWh/kg'], 'holding_kw': row['Holding (kW)']} for name, row in furnaces.iterrows()}
+    try:
+        schedule, summary = schedule_heats(heats, tariff['₹/kWh'].to_numpy(dtype=float), specs, changeover_h=changeover_h)
+    except (ValueError, KeyError) as exc:
+        st.error(f"Cannot schedule: {exc}")
+        return
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Scheduled Power (₹/kg)", f"₹{summary['elec_cost_per_kg']:.2f}",
+              f"{summary['elec_cost_per_kg'] - summary['asap_cost_per_kg']:+.2f} vs back to back", delta_color="inverse")
+    m2.metric("Power Bill", f"₹{summary['power_cost']:,.0f}", f"holding ₹{summary['holding_cost']:,.0f}", delta_color="off")
+    m3.metric("Melted", f"{summary['kg'] / 1000:,.1f} t", f"{summary['days']} days", delta_color="off")
+    m4.metric("Alloy Changeovers", f"{summary['changeovers']}")
+
+    load = pd.Series(0.0, index=pd.date_range(schedule['start'].min().floor('D'), periods=summary['days'] * 24, freq='h'))
+    for row in schedule.itertuples():
+        hours = pd.date_range(row.start.floor('h'), row.end, freq='h', inclusive='left')
+        load[load.index.isin(hours)] += row.kwh / max(len(hours), 1)
+    st.area_chart(load.rename("kWh per hour"))
+    st.dataframe(schedule.style.format({'kg': "{:,.0f}", 'kwh': "{:,.0f}", 'power_cost': "₹{:,.0f}", 'cost_per_kg': "₹{:.2f}"}),
+                 hide_index=True)
+
+    use = st.checkbox("Use the scheduled power cost in costing", value=st.session_state.get('scheduled_elec_cost') is not None,
+                      key='p1_use_schedule',
+                      help=f"Replaces the variable part of the electricity bill (sidebar) with the scheduled melting power, "
+                           f"₹{summary['melt_cost_per_kg']:.2f}/kg; holding power stays in the bill's fixed share")
+    current = st.session_state.get('scheduled_elec_cost')
+    wanted = round(summary['melt_cost_per_kg'], 4) if use else None
+    if wanted != current:
+        st.session_state.scheduled_elec_cost = wanted
+        st.rerun(scope='app')
+
+
+# Fragment: recording transactions reruns only the ledger; with book valuation on, the app reruns for the new prices
+@st.fragment
+def render_metal_inventory():
+    st.markdown("### 📦 Metal Inventory (Book Value)")
+    if not st.toggle("Show the metal inventory ledger", key='p1_inventory'):
+        return
+    import numpy as np
+    from utils.inventory import MATERIALS, METHODS, import_ledger, shared_ledger
+
+    ledger = shared_ledger()
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        material = st.selectbox("Material", MATERIALS, key='p1_inv_material')
+    with c2:
+        kind = st.radio("Type", ["Receipt", "Issue"], horizontal=True, key='p1_inv_type')
+    with c3:
+        kg = st.number_input("Quantity (kg)", value=1000.0, step=100.0, min_value=0.0, key='p1_inv_kg')
+    with c4:
+        price = st.number_input("Price (₹/kg)", value=0.0, step=1.0, min_value=0.0, key='p1_inv_price',
+                                disabled=kind == "Issue", help="Purchase price of the lot (receipts only)")
+
+    b1, b2 = st.columns(2)
+    changed = False
+    with b1:
+        if st.button("Record Transaction", key='p1_inv_record'):
+            try:
+                if kind == "Receipt":
+                    ledger.receive(np.datetime64('now', 's'), material, kg, price)
+                else:
+                    ledger.issue(np.datetime64('now', 's'), material, kg)
+                changed = True
+            except ValueError as exc:
+                st.error(str(exc))
+    with b2:
+        upload = st.file_uploader("Import Transactions (CSV: timestamp, material, kg, price)", type=['csv'], key='p1_inv_upload')
+        if upload is not None and st.button("Import", key='p1_inv_import'):
+            try:
+                import_ledger(upload, ledger)
+                changed = True
+            except (ValueError, KeyError) as exc:
+                st.error(f"Cannot import: {exc}")
+    if changed and st.session_state.get('metal_valuation'):
+        st.rerun(scope='app')
+
+    if not len(ledger):
+        st.info("No transactions yet. Record purchase lots and consumptions, or import them.")
+        return
+    st.caption(f"{len(ledger):,} transactions. Stock report for this month (issue cost = book value used in costing).")
+    month = np.datetime64('today', 'M')
+    for method, tab in zip(METHODS, st.tabs(["FIFO", "Moving Average"])):
+        with tab:
+            report = ledger.valuation(method, start=month, end=np.datetime64('now', 's'))
+            st.dataframe(report.style.format(precision=2, thousands=",", na_rep="—"))
@@ -1,28 +1,32 @@
 import streamlit as st
-from utils.calculations import CostCalculator
+from utils.pipeline import evaluate_pipeline, pipeline_inputs_from_session
+from utils.routes import ROUTES, route_from_session
 
 def render_parts_view():
     st.markdown("## ⚙️ Process 3: Parts Machining")
     
-    # Retrieve Input Cost
-    prev_cost = st.session_state.get('calculated_costs', {}).get('sheet_per_kg', 0.0)
-    
-    if prev_cost == 0:
-        st.warning("⚠️ Sheet Cost not calculated yet. Using provisional market rate.")
-        prev_cost = 650.0 
+    # Retrieve Input Cost (shared pipeline - always current, never a fallback) from the
+    # last yield stage of the dashboard's route
+    route = route_from_session(st.session_state)
+    feed = ROUTES[route]['stages'][-1]
+    stages, _ = evaluate_pipeline(pipeline_inputs_from_session(st.session_state), route=route)
+    prev_cost = stages[feed['name']]['final_cost_per_kg']
         
     st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown(f'<div class="card-header">INPUT: Sheet Cost @ ₹{prev_cost:.2f}/kg</div>', unsafe_allow_html=True)
+    st.markdown(f'<div class="card-header">INPUT: {feed["label"]} Cost @ ₹{prev_cost:.2f}/kg</div>', unsafe_allow_html=True)
+    
+    # Optional: start from a catalog part instead of typing its specs
+    part = load_catalog_part()
     
     c1, c2 = st.columns(2)
     with c1:
         st.subheader("Part Specs (in KG)")
         # Example Part
-        gross_w = st.number_input("Gross Weight (Input Sheet per part) [KG]", value=1.000, step=0.001, format="%.3f")
+        gross_w = st.number_input("Gross Weight (Input Sheet per part) [KG]", value=_spec(part, 'gross_weight_kg', 1.000), step=0.001, format="%.3f")
         
         # Default Net Weight based on Dashboard Yield if available
         p3_yield = st.session_state.process_params.get('p3_yield_pct', 65.0)
-        default_net = gross_w * (p3_yield / 100.0)
+        default_net = _spec(part, 'net_weight_kg', gross_w * (p3_yield / 100.0))
         
         net_w = st.number_input("Net Weight (Finished Part) [KG]", value=default_net, step=0.001, format="%.3f")
         
@@ -31,37 +35,26 @@ def render_parts_view():
 
     with c2:
         st.subheader("Machining parameters")
-        machining_cost = st.number_input("Machining/Labor Cost (₹/piece)", value=st.session_state.process_params['machining_cost'])
+        machining_cost = st.number_input("Machining/Labor Cost (₹/piece)", value=_spec(part, 'machining_cost', st.session_state.process_params['machining_cost']))
         
         default_scrap = st.session_state.get('indicative_scrap_rate', 350.0)
-        scrap_rate = st.number_input("Scrap Recovery (₹/kg)", value=default_scrap, help=f"Auto-calculated: ₹{default_scrap:.2f}")
+        scrap_rate = st.number_input("Scrap Recovery (₹/kg)", value=st.session_state.process_params.get('p3_scrap_rate') or default_scrap,
+                                     help=f"Auto-calculated: ₹{default_scrap:.2f}")
         
         if abs(scrap_rate - default_scrap) < 1.0:
             st.caption("🔗 Linked to Auto Rate")
         
         st.session_state.process_params['machining_cost'] = machining_cost
-        st.session_state.process_params['p3_scrap_rate'] = scrap_rate
+        st.session_state.process_params['p3_scrap_rate'] = None if abs(scrap_rate - default_scrap) < 1.0 else scrap_rate
 
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Calculate
-    result = CostCalculator.calculate_part_cost(
-        sheet_cost_per_kg=prev_cost,
-        part_weight_kg=net_w,
-        gross_weight_kg=gross_w,
-        scrap_recovery_price=scrap_rate,
-        machining_cost_per_part=machining_cost
-    )
-    
-    # Financials
-    st.markdown("### 💰 Pricing")
-    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p3_margin')
-    
-    selling_price_part = result['total_cost_per_part'] * (1 + margin_pct/100)
-    selling_price_kg = result['effective_cost_per_kg_finished'] * (1 + margin_pct/100)
-    
-    # Store
-    st.session_state.calculated_costs['part_unit_cost'] = result['total_cost_per_part']
+    # Calculate (machining cost is synced to process_params above)
+    stages, _ = evaluate_pipeline(pipeline_inputs_from_session(
+        st.session_state,
+        parts_gross_kg=gross_w, parts_net_kg=net_w, parts_scrap_rate=scrap_rate
+    ), route=route)
+    result = stages['parts']
     
     # Results
     st.markdown("### 🏆 Final Product Pricing")
@@ -94,6 +87,24 @@ def render_parts_view():
         </div>
         """, unsafe_allow_html=True)
 
+    render_parts_pricing(result['total_cost_per_part'], result['effective_cost_per_kg_finished'])
+        
+    st.markdown(f"**Effective Rate on Finished Weight:** ₹{result['effective_cost_per_kg_finished']:.2f} / kg")
+
+    render_quantity_breaks(gross_w, net_w, machining_cost, scrap_rate)
+
+    render_part_catalog()
+
+
+# Fragment: editing the margin reruns only the pricing section
+@st.fragment
+def render_parts_pricing(total_cost_per_part, effective_cost_per_kg_finished):
+    st.markdown("### 💰 Pricing")
+    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p3_margin')
+    
+    selling_price_part = total_cost_per_part * (1 + margin_pct/100)
+    selling_price_kg = effective_cost_per_kg_finished * (1 + margin_pct/100)
+    
     st.markdown(f"""
     <div class="card" style="border: 1px solid #FFD700; margin-top: 10px;">
         <div class="card-header" style="color: #FFD700;">Selling Price (Finished)</div>
@@ -102,5 +113,160 @@ def render_parts_view():
         <div class="metric-label" style="font-size: 0.8em; color: #666;">(₹{selling_price_part:.2f} / piece)</div>
     </div>
     """, unsafe_allow_html=True)
-        
-    st.markdown(f"**Effective Rate on Finished Weight:** ₹{result['effective_cost_per_kg_finished']:.2f} / kg")
+
+
+# Fragment: setup costs and break quantities rerun only the price-break table
+@st.fragment
+def render_quantity_breaks(gross_w, net_w, machining_cost, scrap_rate):
+    st.markdown("### 📦 Quantity Breaks")
+    if not st.toggle("Show price breaks by lot size", key='p3_breaks'):
+        return
+    from utils.batch import chain_inputs_from_session
+    from utils.lots import price_breaks, resolve_setup, setup_from_session
+
+    route = route_from_session(st.session_state)
+    overrides = st.session_state.process_params.setdefault('setup_costs', {}).setdefault(route, {})
+    defaults = resolve_setup(route=route, **setup_from_session(st.session_state, route))
+    st.caption("Setup costs are paid once per lot (₹): furnace heat-up, coil / die changeover, tool setup.")
+    setup_keys = ['melt_setup_cost'] + [f"{s['name']}_setup_cost" for s in ROUTES[route]['stages']] + ['part_setup_cost']
+    labels = ["P1: Melt"] + [f"P2: {s['label']}" for s in ROUTES[route]['stages']] + [f"P3: {ROUTES[route]['part']['label']}"]
+    cols = st.columns(len(setup_keys))
+    for col, key, label in zip(cols, setup_keys, labels):
+        with col:
+            overrides[key] = st.number_input(f"{label} Setup", value=float(defaults[key]), step=100.0, key=f'p3_{route}_{key}')
+
+    text = st.text_input("Lot Quantities (pieces)", value=", ".join(str(q) for q in (100, 500, 1000, 5000, 10_000, 50_000, 100_000)),
+                         key='p3_break_quantities')
+    try:
+        quantities = sorted({int(float(q)) for q in text.replace(';', ',').split(',') if q.strip()})
+    except ValueError:
+        st.error("Lot quantities must be whole numbers separated by commas.")
+        return
+    if not quantities or quantities[0] <= 0:
+        st.error("Lot quantities must be positive.")
+        return
+
+    # Same route and stage scrap rates as the Unit Cost card (P2 override included via the session)
+    inputs = chain_inputs_from_session(st.session_state)
+    inputs.update(gross_weight_kg=gross_w, net_weight_kg=net_w, machining_cost=machining_cost, parts_scrap_rate=scrap_rate)
+    table = price_breaks(quantities=quantities, route=route, **inputs, **setup_from_session(st.session_state, route))
+    st.dataframe(
+        table.rename(columns={
+            'setup_cost_per_piece': 'Setup ₹/pc', 'run_cost_per_piece': 'Run ₹/pc', 'cost_per_piece': 'Cost ₹/pc',
+            'cost_per_kg': 'Cost ₹/kg', 'selling_price': 'Price ₹/kg', 'selling_price_per_piece': 'Price ₹/pc'
+        }).rename_axis("Lot (pcs)").style.format("{:.2f}"),
+    )
+    st.caption("Prices include the sidebar interest and margin targets.")
+
+
+# Catalog inputs the calculator takes over; the part's other inputs are only reported
+APPLIED_SPECS = ('gross_weight_kg', 'net_weight_kg', 'machining_cost')
+
+
+def _spec(part, key, default):
+    """ Catalog value for a spec input, or the usual default when the part has none """
+    if part is None or part.get(key) is None:
+        return float(default)
+    return float(part[key])
+
+
+def load_catalog_part():
+    from utils.catalog import shared_catalog
+    sku = st.text_input("Load Part by SKU (optional)", key='p3_sku', placeholder="e.g. P0001234").strip()
+    if not sku:
+        return None
+    part = shared_catalog().get(sku)
+    if part is None:
+        st.warning(f"SKU '{sku}' is not in the catalog.")
+    else:
+        st.caption(f"Loaded {sku} · Customer: {part['customer'] or '-'} · Alloy: {part['alloy'] or '-'}")
+        _note_unapplied(part)
+    return part
+
+
+def _note_unapplied(part):
+    """ Says which stored inputs of a loaded part the calculator does not apply (route, alloy, yields, ...) """
+    from utils.batch import ELEMENT_INPUTS
+    from utils.catalog import INPUTS
+    from utils.routes import DEFAULT_ROUTE
+    absent = {pct_key for _, pct_key in ELEMENT_INPUTS.values() if part.get(pct_key) == 0}     # 0% element shares
+    stored = [f"{key} {part[key]:g}" for key in INPUTS
+              if key not in APPLIED_SPECS and key not in absent and part.get(key) is not None]
+    route = part['route'] if part.get('route') in ROUTES else DEFAULT_ROUTE
+    if route != route_from_session(st.session_state):
+        stored.insert(0, f"route {ROUTES[route]['label']}")
+    if not stored:
+        return
+    price = "" if part.get('selling_price') is None else f" The catalog price (₹{part['selling_price']:.2f}/kg, last reprice) includes them."
+    st.info("Only gross / net weight and machining cost are loaded; the calculator prices the dashboard's route, "
+            f"alloy and rates. Not applied here: {', '.join(stored)}.{price}")
+
+
+# Fragment: searching / importing / repricing the catalog does not rerun the calculator above
+@st.fragment
+def render_part_catalog():
+    import pandas as pd
+    from utils.batch import chain_inputs_from_session
+    from utils.catalog import shared_catalog
+
+    st.markdown("---")
+    st.markdown("### 📚 Part Catalog")
+    catalog = shared_catalog()
+    inputs = chain_inputs_from_session(st.session_state)
+
+    with st.expander("Import Parts (CSV / Parquet)"):
+        st.caption("Columns: sku (required), customer, alloy, route (sheet_parts, rod_turned, strip_stamped) and any chain input "
+                   "(gross_weight_kg, net_weight_kg, machining_cost, cu_pct, sheet_yield_pct, rod_yield_pct, ...). "
+                   "Blank inputs follow the dashboard values. An alloy grade name (CW614N, C26000, ...) sets the blank "
+                   "element shares; other alloy labels are for search only. Existing SKUs are replaced.")
+        upload = st.file_uploader("Part book", type=['csv', 'parquet'], key='p3_catalog_upload')
+        if upload is not None and st.button("Import", key='p3_catalog_import'):
+            book = pd.read_parquet(upload) if upload.name.endswith('.parquet') else pd.read_csv(upload)
+            if 'sku' not in book.columns:
+                st.error("The file needs an 'sku' column.")
+            else:
+                st.success(f"Imported {catalog.upsert(book):,} parts.")
+
+    m1, m2, m3 = st.columns(3)
+    with m3:
+        if st.button("🔄 Reprice Changed Parts", key='p3_catalog_reprice', help="Prices only new/edited parts and parts that depend on a rate changed since the last reprice"):
+            with st.spinner("Repricing..."):
+                st.caption(f"Repriced {catalog.reprice(inputs):,} parts.")
+    m1.metric("Parts", f"{catalog.count():,}")
+    m2.metric("Need Repricing", f"{catalog.pending(inputs):,}")
+
+    f1, f2, f3 = st.columns(3)
+    with f1:
+        sku_prefix = st.text_input("SKU starts with", key='p3_catalog_sku')
+    with f2:
+        customer = st.selectbox("Customer", ["All"] + catalog.distinct('customer'), key='p3_catalog_customer')
+    with f3:
+        alloy = st.selectbox("Alloy", ["All"] + catalog.distinct('alloy'), key='p3_catalog_alloy')
+
+    found = catalog.find(
+        sku_prefix=sku_prefix.strip() or None,
+        customer=None if customer == "All" else customer,
+        alloy=None if alloy == "All" else alloy,
+    )
+    st.dataframe(
+        found[['sku', 'customer', 'alloy', 'gross_weight_kg', 'net_weight_kg', 'machining_cost',
+               'part_cost_per_piece', 'selling_price', 'selling_price_per_piece']].rename(columns={
+            'gross_weight_kg': 'Gross kg', 'net_weight_kg': 'Net kg', 'machining_cost': 'Machining ₹',
+            'part_cost_per_piece': 'Cost ₹/pc', 'selling_price': 'Price ₹/kg',
+            'selling_price_per_piece': 'Price ₹/pc'
+        }),
+        hide_index=True
+    )
+    st.caption("Showing up to 500 parts. Prices are as of the last reprice.")
+
+    if found.empty or not st.toggle("Price-break sheet (₹/piece by lot size)", key='p3_catalog_breaks'):
+        return
+    from utils.catalog import catalog_routes
+    from utils.lots import DEFAULT_BREAKS, price_breaks, setup_columns_from_session
+    routes = catalog_routes(found['route'])
+    sheet = price_breaks(found.assign(**setup_columns_from_session(st.session_state, routes)), DEFAULT_BREAKS,
+                         route=routes, **inputs)
+    st.dataframe(sheet.style.format("{:.2f}"))
+    st.download_button("Download Sheet (CSV)", sheet.to_csv().encode(), file_name="price_breaks.csv",
+                       mime="text/csv", key='p3_catalog_breaks_csv')
+    st.caption("Current rates; each part takes the setup costs set above for its own route. Lot sizes in pieces.")
@@ -0,0 +1,34 @@
+import streamlit as st
+from utils.batch import chain_inputs_from_session
+from utils.surface import CostSurface
+
+def render_quote_view():
+    st.markdown("## ⚡ Quick Quote")
+    st.caption("Instant Parts selling price at any Cu/Zn price for the current alloy, yields and conversion rates. "
+               "Answers come from a precomputed surface that is rebuilt automatically when any of those change.")
+
+    inputs = chain_inputs_from_session(st.session_state)
+    surface = CostSurface.get(inputs)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        cu = st.number_input("Copper Price (₹/kg)", value=float(inputs.get('cu_price', 1000.0)), step=1.0, key='quote_cu')
+    with col2:
+        zn = st.number_input("Zinc Price (₹/kg)", value=float(inputs.get('zn_price', 300.0)), step=1.0, key='quote_zn')
+
+    price = float(surface.quote(cu, zn))
+    in_grid = surface.cu_lo <= cu <= surface.cu_hi and surface.zn_lo <= zn <= surface.zn_hi
+
+    st.markdown(f"""
+    <div class="card" style="border: 2px solid #2980b9;">
+        <div class="card-header" style="color: #2980b9;">Selling Price (Parts)</div>
+        <div class="metric-value">₹{price:.2f}</div>
+        <div class="metric-label">Per Kg @ Cu ₹{cu:.0f} / Zn ₹{zn:.0f}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if in_grid:
+        st.caption(f"Interpolated · guaranteed within ±₹{surface.error_bound:.2e}/kg · "
+                   f"grid Cu ₹{surface.cu_lo:.0f}–{surface.cu_hi:.0f}, Zn ₹{surface.zn_lo:.0f}–{surface.zn_hi:.0f}")
+    else:
+        st.caption("Outside the precomputed grid — calculated exactly.")
@@ -0,0 +1,52 @@
+import streamlit as st
+import numpy as np
+from utils.batch import CHAIN_DEFAULTS, chain_inputs_from_session, calculate_chain_batch
+from utils.sensitivity import SWEEP_PARAMS
+from utils.reverse import LINEAR_INPUTS, reverse_quote
+
+SOLVE_PARAMS = {**SWEEP_PARAMS, 'margin_pct': "Profit Margin %"}
+
+def render_reverse_view():
+    st.markdown("## 🎯 Target Price (Reverse Costing)")
+    st.caption("The customer fixes the selling price: find the value of one input at which the Parts "
+               "selling price (₹/kg finished) exactly meets it, with every other input as on the dashboard.")
+
+    inputs = chain_inputs_from_session(st.session_state)
+    base = {**CHAIN_DEFAULTS, **inputs}
+    current_price = float(calculate_chain_batch(**inputs)['selling_price'].iloc[0])
+
+    labels = list(SOLVE_PARAMS.values())
+    keys = list(SOLVE_PARAMS)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        target = st.number_input("Target Selling Price (₹/kg)", value=round(current_price, 2), step=1.0, key='reverse_target')
+    with col2:
+        key = keys[labels.index(st.selectbox("Solve For", labels, index=keys.index('cu_price'), key='reverse_param'))]
+
+    result = reverse_quote(key, target, **inputs).iloc[0]
+    solved = result[f'solved_{key}']
+    label = SOLVE_PARAMS[key]
+
+    if np.isnan(solved):
+        st.error(f"No value of {label} reaches ₹{target:.2f}/kg with the other inputs unchanged.")
+        return
+
+    st.markdown(f"""
+    <div class="card" style="border: 2px solid #8e44ad;">
+        <div class="card-header" style="color: #8e44ad;">Break-even {label}</div>
+        <div class="metric-value">{solved:,.2f}</div>
+        <div class="metric-label">Current: {base[key]:,.2f} · Headroom: {result['headroom']:+,.2f}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    m1, m2 = st.columns(2)
+    m1.metric("Current Selling Price", f"₹{current_price:.2f}")
+    m2.metric("Selling Price at Break-even", f"₹{result['selling_price_at_solved']:.2f}", f"{result['selling_price_at_solved'] - current_price:+.2f}")
+
+    # Every input moves the price one way, so the break-even value is a limit
+    rising = float(calculate_chain_batch(**{**inputs, key: base[key] * 1.01 + 0.01})['selling_price'].iloc[0]) > current_price
+    limit = "Highest" if rising else "Lowest"
+    st.caption(f"{limit} {label} at which the target price still covers cost, interest and margin. "
+               + ("Solved exactly (the price is linear in this input)." if key in LINEAR_INPUTS
+                  else "Solved numerically within the valid range of this input."))
@@ -0,0 +1,81 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+from utils.batch import chain_inputs_from_session
+from utils.risk import RISK_DEFAULTS, run_simulation
+
+def render_risk_view():
+    st.markdown("## 🎲 Metal Price Risk (Monte Carlo)")
+    st.caption("Simulates Cu/Zn prices over the Cycle Time plus burning-loss and yield variability, "
+               "and prices every scenario through the full Ingot → Sheet → Parts chain.")
+
+    inputs = chain_inputs_from_session(st.session_state)
+
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown('<div class="card-header">🛠️ Simulation Settings</div>', unsafe_allow_html=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.subheader("Metal Volatility")
+        cu_vol = st.number_input("Copper Volatility (% p.a.)", value=RISK_DEFAULTS['cu_vol_pa'], step=1.0)
+        zn_vol = st.number_input("Zinc Volatility (% p.a.)", value=RISK_DEFAULTS['zn_vol_pa'], step=1.0)
+        corr = st.slider("Cu/Zn Correlation", -1.0, 1.0, RISK_DEFAULTS['cu_zn_corr'], 0.05)
+
+    with col2:
+        st.subheader("Process Variability (± pts)")
+        loss_sd = st.number_input("Burning Loss Std Dev", value=RISK_DEFAULTS['burning_loss_sd'], step=0.1)
+        sheet_sd = st.number_input("Sheet Yield Std Dev", value=RISK_DEFAULTS['sheet_yield_sd'], step=0.5)
+        parts_sd = st.number_input("Parts Yield Std Dev", value=RISK_DEFAULTS['parts_yield_sd'], step=0.5)
+
+    with col3:
+        st.subheader("Run")
+        n_draws = st.select_slider("Scenarios", options=[100_000, 1_000_000, 2_000_000, 5_000_000], value=1_000_000)
+        seed = st.number_input("Random Seed", value=42, step=1)
+        run = st.button("▶️ Run Simulation", type="primary")
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    if run:
+        with st.spinner(f"Simulating {n_draws:,} scenarios..."):
+            st.session_state.risk_result = run_simulation(
+                n_draws=n_draws, seed=int(seed),
+                risk={
+                    'cu_vol_pa': cu_vol, 'zn_vol_pa': zn_vol, 'cu_zn_corr': corr,
+                    'burning_loss_sd': loss_sd, 'sheet_yield_sd': sheet_sd, 'parts_yield_sd': parts_sd
+                },
+                **inputs
+            )
+
+    result = st.session_state.get('risk_result')
+    if result is None:
+        st.info("Set the assumptions and press Run. Rates and yields are taken from the sidebar and Dashboard.")
+        return
+
+    # Results
+    st.markdown("### 📊 Selling Price Distribution (₹/kg)")
+    pct = result['selling_price_pct']
+
+    r1, r2, r3, r4 = st.columns(4)
+    for col, label, value in [
+        (r1, "Point Estimate", result['point_selling_price']),
+        (r2, "P5", pct[5]),
+        (r3, "P50", pct[50]),
+        (r4, "P95", pct[95]),
+    ]:
+        with col:
+            st.markdown(f"""
+            <div class="card">
+                <div class="card-header">{label}</div>
+                <div class="metric-value">₹{value:.2f}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+    st.markdown("### ⚠️ Margin at Risk (Quote fixed at Point Estimate)")
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Quoted Margin", f"₹{result['quoted_margin']:.2f}")
+    m2.metric("Margin at Risk (95%)", f"₹{result['margin_at_risk']:.2f}", delta=f"P5 margin ₹{result['margin_p5']:.2f}", delta_color="off")
+    m3.metric("Probability of Loss", f"{result['prob_loss']*100:.1f}%")
+
+    counts, edges = np.histogram(result['selling_price'], bins=60)
+    st.bar_chart(pd.DataFrame({"Scenarios": counts}, index=[f"{e:.0f}" for e in edges[:-1]]))
+    st.caption(f"{result['n_draws']:,} scenarios")
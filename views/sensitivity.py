@@ -0,0 +1,82 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import altair as alt
+from utils.batch import CHAIN_DEFAULTS, chain_inputs_from_session
+from utils.sensitivity import SWEEP_PARAMS, tornado, sweep_grid, sweep_values
+from utils.gradients import price_gradient
+
+def render_sensitivity_view():
+    st.markdown("## 🌪️ Sensitivity Analysis")
+    st.caption("Effect of each input on the final Parts selling price (₹/kg). All scenarios are evaluated in one batch.")
+
+    inputs = chain_inputs_from_session(st.session_state)
+    base = {**CHAIN_DEFAULTS, **inputs}
+
+    # 1. Tornado
+    st.markdown("### 1. Tornado (one input at a time)")
+    swing = st.slider("Swing (± % of current value)", 1.0, 50.0, 10.0, 1.0)
+    frame = tornado(inputs, swing_pct=swing)
+
+    st.metric("Base Selling Price", f"₹{frame.attrs['base_output']:.2f}")
+    chart_data = pd.DataFrame({
+        f"-{swing:.0f}%": frame['delta_low'].values,
+        f"+{swing:.0f}%": frame['delta_high'].values,
+    }, index=frame['label'])
+    st.bar_chart(chart_data, horizontal=True, stack=False)
+
+    with st.expander("Tornado Table"):
+        st.dataframe(frame[['label', 'low_value', 'high_value', 'output_low', 'output_high', 'range']], hide_index=True)
+
+    # 2. Exact marginal sensitivities
+    st.markdown("### 2. Marginal Sensitivities (exact)")
+    grad = price_gradient(**inputs).iloc[0]
+    st.dataframe(pd.DataFrame({
+        "Input": [SWEEP_PARAMS[k] for k in SWEEP_PARAMS if f'd_{k}' in grad],
+        "Current Value": [base[k] for k in SWEEP_PARAMS if f'd_{k}' in grad],
+        "₹/kg Price Change per +1 Unit": [grad[f'd_{k}'] for k in SWEEP_PARAMS if f'd_{k}' in grad],
+    }), hide_index=True)
+    st.caption("Units: per ₹1 for prices and costs, per 1 percentage point for % inputs, per day for Cycle Time.")
+
+    # 3. Two-way grid
+    st.markdown("### 3. Two-way Grid")
+    labels = list(SWEEP_PARAMS.values())
+    keys = list(SWEEP_PARAMS)
+
+    g1, g2, g3 = st.columns(3)
+    with g1:
+        x_param = keys[labels.index(st.selectbox("X Axis", labels, index=keys.index('cu_price')))]
+        x_span = st.number_input("X Range (± %)", value=20.0, step=5.0)
+    with g2:
+        y_param = keys[labels.index(st.selectbox("Y Axis", labels, index=keys.index('sheet_yield_pct')))]
+        y_span = st.number_input("Y Range (± %)", value=10.0, step=5.0)
+    with g3:
+        points = st.select_slider("Points per Axis", options=[20, 50, 100, 500, 1000], value=50)
+
+    if x_param == y_param:
+        st.warning("Pick two different inputs.")
+        return
+
+    # Yields / losses stop at 100%: the axes show the values actually priced
+    x_values = sweep_values(x_param, base[x_param], x_span, points)
+    y_values = sweep_values(y_param, base[y_param], y_span, points)
+    grid = sweep_grid({x_param: x_values, y_param: y_values}, inputs)
+    st.caption(f"{grid.size:,} scenarios · min ₹{grid.min():.2f} · max ₹{grid.max():.2f}")
+
+    # Charting a 1000x1000 grid is not useful; show at most 50x50 cells
+    step = max(1, points // 50)
+    xs, ys = np.meshgrid(x_values[::step], y_values[::step], indexing='ij')
+    heat = pd.DataFrame({
+        'x': xs.ravel().round(2),
+        'y': ys.ravel().round(2),
+        'price': grid[::step, ::step].ravel(),
+    })
+    st.altair_chart(
+        alt.Chart(heat).mark_rect().encode(
+            x=alt.X('x:O', title=SWEEP_PARAMS[x_param]),
+            y=alt.Y('y:O', title=SWEEP_PARAMS[y_param], sort='descending'),
+            color=alt.Color('price:Q', title='₹/kg', scale=alt.Scale(scheme='redyellowgreen', reverse=True)),
+            tooltip=['x', 'y', alt.Tooltip('price:Q', format='.2f')]
+        ),
+        width="stretch"
+    )
@@ -1,15 +1,12 @@
 import streamlit as st
-from utils.calculations import CostCalculator
+from utils.pipeline import evaluate_pipeline, pipeline_inputs_from_session
 
 def render_sheet_view():
     st.markdown("## 📜 Process 2: Sheet Rolling")
     
-    # Retrieve Input Cost
-    prev_cost = st.session_state.get('calculated_costs', {}).get('ingot_per_kg', 0.0)
-    
-    if prev_cost == 0:
-        st.warning("⚠️ Ingot Cost not calculated yet. Using provisional market rate.")
-        prev_cost = 600.0 # Fallback
+    # Retrieve Input Cost (shared pipeline - always current, never a fallback)
+    stages, _ = evaluate_pipeline(pipeline_inputs_from_session(st.session_state))
+    prev_cost = stages['ingot']['final_cost_per_kg']
         
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown(f'<div class="card-header">INPUT: Ingot Cost @ ₹{prev_cost:.2f}/kg</div>', unsafe_allow_html=True)
@@ -30,7 +27,8 @@ def render_sheet_view():
         default_scrap = st.session_state.get('indicative_scrap_rate', 400.0)
         
         # Display as default, but allow override
-        scrap_rate = st.number_input("Scrap Recovery (₹/kg)", value=default_scrap, help=f"Auto-calculated: ₹{default_scrap:.2f}")
+        scrap_rate = st.number_input("Scrap Recovery (₹/kg)", value=st.session_state.process_params.get('p2_scrap_rate') or default_scrap,
+                                     help=f"Auto-calculated: ₹{default_scrap:.2f}")
         
         if abs(scrap_rate - default_scrap) < 1.0:
             st.caption("🔗 Linked to Auto Rate")
@@ -38,27 +36,15 @@ def render_sheet_view():
             st.caption("✏️ Custom Override")
         
         st.session_state.process_params['rolling_cost'] = proc_cost
-        st.session_state.process_params['p2_scrap_rate'] = scrap_rate
+        # Only a custom rate is kept: linked to auto, the other pages follow the sidebar
+        st.session_state.process_params['p2_scrap_rate'] = None if abs(scrap_rate - default_scrap) < 1.0 else scrap_rate
         
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Calculate
-    result = CostCalculator.calculate_sheet_cost(
-        ingot_cost_per_kg=prev_cost,
-        yield_pct=yield_pct,
-        scrap_recovery_price=scrap_rate,
-        process_cost_per_kg=proc_cost
-    )
+    # Calculate (yield & rolling cost are synced to process_params above)
+    stages, _ = evaluate_pipeline(pipeline_inputs_from_session(st.session_state, sheet_scrap_rate=scrap_rate))
+    result = stages['sheet']
 
-    # Financials
-    st.markdown("### 💰 Pricing")
-    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p2_margin')
-    
-    selling_price = result['final_cost_per_kg'] * (1 + margin_pct/100)
-    
-    # Store
-    st.session_state.calculated_costs['sheet_per_kg'] = result['final_cost_per_kg']
-    
     # Display
     st.markdown("### 📊 Cost Analysis")
     
@@ -76,6 +62,17 @@ def render_sheet_view():
         </div>
         """, unsafe_allow_html=True)
 
+    render_sheet_pricing(result['final_cost_per_kg'])
+
+
+# Fragment: editing the margin reruns only the pricing section
+@st.fragment
+def render_sheet_pricing(final_cost_per_kg):
+    st.markdown("### 💰 Pricing")
+    margin_pct = st.number_input("Profit Margin (%)", value=10.0, step=0.5, key='p2_margin')
+    
+    selling_price = final_cost_per_kg * (1 + margin_pct/100)
+    
     st.markdown(f"""
     <div class="card" style="border: 1px solid #FFD700; margin-top: 10px;">
         <div class="card-header" style="color: #FFD700;">Selling Price (Sheet)</div>